@@ -1,10 +1,10 @@
 import streamlit as st
-import pandas as pd
-import joblib
 import os
-import numpy as np
+import sys
 import plotly.graph_objects as go
-import plotly.express as px
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from sleep_core import load_artifacts, encode, analyze
 
 # Set page config
 st.set_page_config(
@@ -80,55 +80,12 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# Load model and encoder
+# Load model and encoders
 @st.cache_resource
 def load_model():
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    model_path = os.path.join(base_dir, 'models', 'sleep_model_fast.pkl')
-    le_path = os.path.join(base_dir, 'models', 'label_encoder.pkl')
-    
-    if not os.path.exists(model_path):
-        return None, None
-        
-    model = joblib.load(model_path)
-    le = joblib.load(le_path)
-    return model, le
-
-def get_recommendations(duration, quality, stress, activity, bmi, heart_rate):
-    recommendations = []
-    
-    # Sleep Duration
-    if duration < 6.0:
-        recommendations.append("⚠️ **Increase Sleep Duration**: Aim for at least 7 hours of sleep. Consistent lack of sleep increases health risks.")
-    elif duration > 9.0:
-        recommendations.append("ℹ️ **Regulate Sleep Pattern**: Oversleeping can sometimes indicate underlying issues. Try to stick to a consistent 7-8 hour schedule.")
-        
-    # Sleep Quality
-    if quality < 6:
-        recommendations.append("🌙 **Improve Sleep Hygiene**: Your sleep quality is low. Avoid screens before bed, keep your room cool, and limit caffeine.")
-        
-    # Stress
-    if stress > 6:
-        recommendations.append("🧘 **Manage Stress**: High stress negatively impacts sleep. Consider meditation, deep breathing exercises, or yoga.")
-        
-    # Physical Activity
-    if activity < 30:
-        recommendations.append("🏃 **Get Moving**: Regular physical activity (at least 30 mins/day) promotes deeper sleep.")
-        
-    # BMI
-    if bmi != 'Normal':
-        recommendations.append("🍎 **Watch Your Weight**: Maintaining a healthy weight can significantly reduce the risk of sleep apnea and insomnia.")
-        
-    # Heart Rate
-    if heart_rate > 80:
-        recommendations.append("❤️ **Monitor Heart Rate**: Your resting heart rate is slightly high. Regular cardio and stress reduction can help.")
-        
-    if not recommendations:
-        recommendations.append("✅ **Keep it up!**: Your habits seem conducive to good sleep health.")
-        
-    return recommendations
+    return load_artifacts()
 
-model, le = load_model()
+model, le, occupation_encoder = load_model()
 
 # --- Header Section ---
 col1, col2 = st.columns([3, 1])
@@ -153,6 +110,11 @@ with col_input:
         
         gender = st.selectbox('Gender', ['Male', 'Female'])
         age = st.slider('Age', 10, 100, 30)
+        occupation = st.selectbox('Occupation', [
+            'Software Engineer', 'Doctor', 'Sales Representative', 'Teacher',
+            'Nurse', 'Engineer', 'Accountant', 'Scientist', 'Lawyer',
+            'Salesperson', 'Manager', 'Student', 'Other'
+        ])
         bmi_category = st.selectbox('BMI Category', ['Normal', 'Overweight', 'Obese'])
         
         st.markdown("---")
@@ -173,23 +135,18 @@ with col_input:
             bp_diastolic = st.number_input('Diastolic BP', 50, 130, 80)
 
 # Preprocess inputs
-gender_val = 0 if gender == 'Male' else 1
-bmi_map = {'Normal': 0, 'Overweight': 1, 'Obese': 2}
-bmi_val = bmi_map[bmi_category]
-
-input_data = pd.DataFrame({
-    'Gender': [gender_val],
-    'Age': [age],
-    'Sleep Duration': [sleep_duration],
-    'Quality of Sleep': [quality_of_sleep],
-    'Physical Activity Level': [physical_activity],
-    'Stress Level': [stress_level],
-    'BMI Category': [bmi_val],
-    'Heart Rate': [heart_rate],
-    'Daily Steps': [daily_steps],
-    'BP_Systolic': [bp_systolic],
-    'BP_Diastolic': [bp_diastolic]
-})
+input_data = encode(
+    gender, age, occupation, sleep_duration, quality_of_sleep, physical_activity,
+    stress_level, bmi_category, heart_rate, daily_steps, bp_systolic, bp_diastolic,
+    occupation_encoder
+)
+user_data = {
+    'Gender': gender, 'Age': age, 'Occupation': occupation, 'BMI': bmi_category,
+    'Sleep Duration': sleep_duration, 'Quality of Sleep': quality_of_sleep,
+    'Physical Activity': physical_activity, 'Stress Level': stress_level,
+    'Heart Rate': heart_rate, 'Daily Steps': daily_steps,
+    'BP': f"{bp_systolic}/{bp_diastolic}"
+}
 
 with col_viz:
     st.subheader(" Health Analysis Dashboard")
@@ -237,8 +194,8 @@ with col_viz:
     
     if st.button('Analyze Risk', width="stretch"):
         if model:
-            prediction = model.predict(input_data)
-            prediction_label = le.inverse_transform(prediction)[0]
+            result = analyze(model, le, input_data, user_data)
+            prediction_label = result['prediction']
             
             # Result Display
             result_container = st.container()
@@ -272,12 +229,8 @@ with col_viz:
                 </div>
             """, unsafe_allow_html=True)
             
-            # Gauge Chart for Risk (Simulated based on label)
-            risk_val = 0
-            if prediction_label == 'Healthy': risk_val = 20
-            elif prediction_label == 'Insomnia': risk_val = 60
-            elif prediction_label == 'Sleep Apnea': risk_val = 90
-            
+            # Gauge Chart for Risk
+            risk_val = result['risk']
             fig_gauge = go.Figure(go.Indicator(
                 mode = "gauge+number",
                 value = risk_val,
@@ -297,43 +250,17 @@ with col_viz:
             
             # --- Smart Recommendations ---
             st.markdown("### AI Health Insights")
-            recommendations = get_recommendations(sleep_duration, quality_of_sleep, stress_level, physical_activity, bmi_category, heart_rate)
-            
+            recommendations = result['recommendations']
+
             with st.expander("View Personalized Recommendations", expanded=True):
                 for rec in recommendations:
                     st.markdown(f"- {rec}")
             
             # --- Download Report ---
-            import datetime
-            report_text = f"""
-            SLEEP HEALTH ANALYSIS REPORT
-            Date: {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-            ----------------------------------------
-            USER PROFILE:
-            - Gender: {gender}
-            - Age: {age}
-            - BMI Category: {bmi_category}
-            - Sleep Duration: {sleep_duration} hrs
-            - Sleep Quality: {quality_of_sleep}/10
-            - Stress Level: {stress_level}/10
-            - Physical Activity: {physical_activity} mins/day
-            - Heart Rate: {heart_rate} bpm
-            - Daily Steps: {daily_steps}
-            - Blood Pressure: {bp_systolic}/{bp_diastolic}
-            ----------------------------------------
-            ANALYSIS RESULT:
-            Prediction: {prediction_label}
-            Risk Level: {risk_val}/100
-            ----------------------------------------
-            RECOMMENDATIONS:
-            """
-            for rec in recommendations:
-                report_text += f"\n{rec.replace('**', '').replace('⚠️ ', '').replace('ℹ️ ', '').replace('🌙 ', '').replace('🧘 ', '').replace('🏃 ', '').replace('🍎 ', '').replace('❤️ ', '').replace('✅ ', '')}"
-            
             st.download_button(
                 label="Download Full Report",
-                data=report_text,
-                file_name=f"Sleep_Health_Report_{datetime.datetime.now().strftime('%Y%m%d')}.txt",
+                data=result['report'],
+                file_name=f"Sleep_Health_Report_{result['timestamp'].strftime('%Y%m%d')}.txt",
                 mime="text/plain",
             )
             
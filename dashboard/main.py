@@ -1,10 +1,19 @@
 import streamlit as st
 import plotly.graph_objects as go
 from styles import get_css
-from utils import load_model, preprocess_input, get_recommendations, generate_report
+from utils import (load_model_router, load_candidate_model, load_feature_profile,
+                   simulate_watch_sync, run_analysis, load_cohort_cube)
+import sleep_core
+from trend_features import TrendTracker
+from drift import DriftMonitor
+from shadow import ShadowScorer
+from jobs import JobRunner
+from early_exit import EarlyExitForest
+from session_store import SessionStore
+from counterfactual import CounterfactualSearch, describe
 import datetime
+import uuid
 import pandas as pd
-import numpy as np
 
 # Page Config
 st.set_page_config(
@@ -17,12 +26,66 @@ st.set_page_config(
 # Inject CSS
 st.markdown(get_css(), unsafe_allow_html=True)
 
-# Load Model
-model, le, occupation_encoder = load_model()
+# Models per clinic/device, loaded lazily and shared by all sessions
+@st.cache_resource
+def get_model_router():
+    return load_model_router()
 
-# Initialize session state for history
-if 'history' not in st.session_state:
-    st.session_state['history'] = []
+model_router = get_model_router()
+# Default model until the sidebar picks a tenant
+model, le, occupation_encoder = model_router.route() if model_router else (None, None, None)
+
+# One drift monitor shared by all sessions (population-level view)
+@st.cache_resource
+def get_drift_monitor():
+    profile = load_feature_profile()
+    return DriftMonitor(profile) if profile else None
+
+drift_monitor = get_drift_monitor()
+
+# Candidate model scored in the background on live traffic, if one is staged
+@st.cache_resource
+def get_shadow_scorer():
+    candidate = load_candidate_model()
+    return ShadowScorer(candidate, le.classes_) if candidate is not None and le is not None else None
+
+shadow_scorer = get_shadow_scorer()
+
+# Background jobs (sync, analysis) shared across sessions so reruns never block
+@st.cache_resource
+def get_job_runner():
+    return JobRunner(max_workers=4)
+
+job_runner = get_job_runner()
+
+@st.fragment(run_every=0.5)
+def show_job_progress(job_key, label):
+    """Polls a background job; triggers a full rerun once it finishes."""
+    job = st.session_state.get(job_key)
+    if job is None:
+        return
+    if job.done():
+        st.rerun()
+    st.progress(job.progress, text=job.message or label)
+
+# Per-session history, synced night, results and trends, kept compact and
+# within memory budgets (idle sessions spill to data/sessions/)
+@st.cache_resource
+def get_session_store():
+    return SessionStore(new_trends=TrendTracker)
+
+session_store = get_session_store()
+
+if 'session_id' not in st.session_state:
+    st.session_state['session_id'] = uuid.uuid4().hex
+
+def current_session():
+    return session_store.get(st.session_state['session_id'])
+
+def save_session(session):
+    session_store.commit(st.session_state['session_id'], session)
+
+session = current_session()
 
 # --- Sidebar ---
 with st.sidebar:
@@ -37,45 +100,52 @@ with st.sidebar:
     # Initialize connection state
     if 'watch_connected' not in st.session_state:
         st.session_state['watch_connected'] = False
-    if 'watch_syncing' not in st.session_state:
-        st.session_state['watch_syncing'] = False
+    
+    # Collect a finished sync job
+    sync_job = st.session_state.get('sync_job')
+    if sync_job is not None and sync_job.done():
+        del st.session_state['sync_job']
+        try:
+            synced = sync_job.result()
+        except Exception as e:
+            st.error(f"Sync failed: {e}")
+        else:
+            session.set_synced(synced)
+            # Multi-night trends, updated once per synced night
+            session.trends.update(synced['sleep_duration'], synced['heart_rate'], synced['steps'])
+            save_session(session)
+            st.success("Data synced successfully!")
     
     # Device selection
     device_options = ['Samsung Galaxy Watch', 'Apple Watch', 'Fitbit', 'Garmin', 'Other']
     selected_device = st.selectbox('Select Device', device_options, disabled=st.session_state['watch_connected'])
     
+    def start_sync():
+        st.session_state['sync_job'] = job_runner.submit(
+            ('sync', st.session_state['session_id']), simulate_watch_sync
+        )
+    
     # Connection button
     if not st.session_state['watch_connected']:
         if st.button("Connect to Smartwatch", width="stretch"):
-            st.session_state['watch_syncing'] = True
             st.session_state['watch_connected'] = True
+            start_sync()
             st.rerun()
     else:
         st.success(f"Connected: {selected_device}")
         if st.button("Disconnect", width="stretch"):
             st.session_state['watch_connected'] = False
-            st.session_state['watch_syncing'] = False
+            st.session_state.pop('sync_job', None)
             st.rerun()
         
         # Sync data button
-        if st.button("Sync Data", width="stretch"):
-            st.session_state['watch_syncing'] = True
+        if st.button("Sync Data", width="stretch", disabled='sync_job' in st.session_state):
+            start_sync()
             st.rerun()
     
-    # Show syncing animation
-    if st.session_state.get('watch_syncing', False):
-        with st.spinner('Syncing data from smartwatch...'):
-            import time
-            time.sleep(2)  # Simulate sync delay
-            st.session_state['watch_syncing'] = False
-            st.session_state['synced_data'] = {
-                'heart_rate': np.random.randint(60, 85),
-                'steps': np.random.randint(4000, 12000),
-                'sleep_duration': round(np.random.uniform(6.0, 8.5), 1),
-                'sleep_quality': np.random.randint(6, 9)
-            }
-            st.success("Data synced successfully!")
-            st.rerun()
+    # Sync progress (runs in the background; the rest of the page stays usable)
+    if 'sync_job' in st.session_state:
+        show_job_progress('sync_job', 'Syncing data from smartwatch...')
     
     st.markdown("---")
     
@@ -92,13 +162,17 @@ with st.sidebar:
     st.markdown("### Sleep & Activity")
     
     # Use synced data if available
-    synced_data = st.session_state.get('synced_data', {})
+    synced_data = session.synced_data
     default_sleep = synced_data.get('sleep_duration', 7.0)
     default_quality = synced_data.get('sleep_quality', 6)
     default_steps = synced_data.get('steps', 5000)
     
     sleep_duration = st.slider('Sleep Duration (Hours)', 0.0, 12.0, float(default_sleep), 0.1)
     quality_of_sleep = st.slider('Quality of Sleep (1-10)', 1, 10, default_quality)
+    if 'sleep_metrics' in synced_data:
+        night = synced_data['sleep_metrics']
+        st.caption(f"From last night's hypnogram: efficiency {night['Sleep_Efficiency']:.0f}%, "
+                   f"latency {night['Sleep_Latency']:.0f} min, WASO {night['WASO']:.0f} min")
     physical_activity = st.slider('Physical Activity (mins/day)', 0, 120, 30)
     daily_steps = st.number_input('Daily Steps', 0, 20000, default_steps, step=100)
     
@@ -116,6 +190,15 @@ with st.sidebar:
     with col_bp2:
         bp_diastolic = st.number_input('Diastolic', 50, 130, 80, key='dia')
 
+    st.markdown("### Inference")
+    fast_inference = st.toggle('Early-exit inference', value=False,
+                               help="Stop evaluating trees once the vote is settled at 99% confidence")
+
+# Route to the clinic's (?clinic=<id>) or connected device's model, if one is registered
+tenant_args = (st.query_params.get('clinic'), selected_device if st.session_state['watch_connected'] else None)
+if model_router:
+    model, le, occupation_encoder = model_router.route(*tenant_args)
+
 # --- Main Content ---
 st.title("Sleep Health Analysis Dashboard")
 st.markdown("### AI-Powered Clinical Support System")
@@ -126,57 +209,44 @@ if st.session_state.get('watch_connected', False):
     with col_status1:
         st.info(f"📱 **Device Connected:** {selected_device}")
     with col_status2:
-        if 'synced_data' in st.session_state:
+        if synced_data:
             st.success("✅ Data Synced")
         else:
             st.warning("⏳ No Data Yet")
     with col_status3:
         last_sync = datetime.datetime.now().strftime("%H:%M")
         st.caption(f"Last sync: {last_sync}")
+        trends = session.trends
+        if trends.nights:
+            st.caption(f"{trends.nights} nights tracked | Sleep debt: {trends.sleep_debt:.1f}h")
 
 if not model:
     st.error(" Model not found. Please train the model first.")
     st.stop()
 
 # Calculate Sleep Score (0-100)
-def calculate_sleep_score(duration, quality, stress, activity, heart_rate):
-    score = 0
-    # Duration (30 points)
-    if 7 <= duration <= 9:
-        score += 30
-    elif 6 <= duration < 7 or 9 < duration <= 10:
-        score += 20
-    else:
-        score += 10
-    
-    # Quality (25 points)
-    score += (quality / 10) * 25
-    
-    # Stress (20 points)
-    score += ((10 - stress) / 10) * 20
-    
-    # Activity (15 points)
-    if activity >= 30:
-        score += 15
-    else:
-        score += (activity / 30) * 15
-    
-    # Heart Rate (10 points)
-    if 60 <= heart_rate <= 80:
-        score += 10
-    else:
-        score += max(0, 10 - abs(heart_rate - 70) / 5)
-    
-    return min(100, round(score))
+sleep_score = sleep_core.sleep_score(sleep_duration, quality_of_sleep, stress_level, physical_activity, heart_rate)
 
-sleep_score = calculate_sleep_score(sleep_duration, quality_of_sleep, stress_level, physical_activity, heart_rate)
+# Hypnogram metrics (from a synced night) and trend features are only passed to models trained with them
+model_features = set(getattr(model, 'feature_names_in_', []))
+sleep_metrics_input = {k: v for k, v in synced_data.get('sleep_metrics', {}).items() if k in model_features}
+trend_input = {k: v for k, v in session.trends.features().items() if k in model_features}
 
 # Prepare Input
-input_df = preprocess_input(
-    gender, age, occupation, sleep_duration, quality_of_sleep, physical_activity, 
-    stress_level, bmi_category, heart_rate, daily_steps, bp_systolic, bp_diastolic,
-    occupation_encoder
+patient = dict(
+    gender=gender, age=age, occupation=occupation, sleep_duration=sleep_duration,
+    quality_of_sleep=quality_of_sleep, physical_activity=physical_activity, stress_level=stress_level,
+    bmi_category=bmi_category, heart_rate=heart_rate, daily_steps=daily_steps,
+    bp_systolic=bp_systolic, bp_diastolic=bp_diastolic,
 )
+input_df = sleep_core.encode(**patient, occupation_encoder=occupation_encoder,
+                             trend_features=trend_input, sleep_metrics=sleep_metrics_input)
+if occupation_encoder is not None and not occupation_encoder.known([occupation])[0]:
+    if occupation_encoder.has_other:
+        st.caption(f"'{occupation}' is uncommon in the training data; it is scored in the shared 'other occupation' group.")
+    else:
+        st.caption(f"'{occupation}' is not in the deployed model's training data; it is scored as "
+                   f"'{occupation_encoder.categories_[0]}'. Retrain to give the model an 'other occupation' group.")
 
 # Top Metrics Row
 col_m1, col_m2, col_m3, col_m4 = st.columns(4)
@@ -197,42 +267,83 @@ with col_m4:
 
 st.markdown("---")
 
-# Layout: 2 Columns
-col_left, col_right = st.columns([1, 1], gap="large")
+user_data_dict = {
+    'Gender': gender, 'Age': age, 'Occupation': occupation, 'BMI': bmi_category,
+    'Sleep Duration': sleep_duration, 'Quality of Sleep': quality_of_sleep,
+    'Physical Activity': physical_activity, 'Stress Level': stress_level,
+    'Heart Rate': heart_rate, 'Daily Steps': daily_steps,
+    'BP': f"{bp_systolic}/{bp_diastolic}"
+}
+
+# Collect a finished analysis job (its progress fragment triggers this full rerun)
+analysis_job = st.session_state.get('analysis_job')
+if analysis_job is not None and analysis_job.done():
+    del st.session_state['analysis_job']
+    analysis_score = st.session_state.pop('analysis_score', sleep_score)
+    try:
+        analysis = analysis_job.result()
+    except Exception as e:
+        # e.g. a bundle that fails verification or a model/feature mismatch
+        st.error(f"Analysis failed: {e}")
+    else:
+        # The result is shared by every session that submitted the same inputs: read, never modify
+        cohort = analysis['cohort']
+        session.set_analysis({k: v for k, v in analysis.items() if k != 'cohort'})
 
-with col_left:
-    st.subheader("Analysis Results")
-    
-    if st.button("Run Analysis", width="stretch"):
-        # Prediction
-        prediction = model.predict(input_df)
-        prediction_label = le.inverse_transform(prediction)[0]
-        
-        # Validation Layer - Override model if obvious issues detected
-        if sleep_duration < 5:
-            prediction_label = 'Insomnia'
-        elif sleep_duration > 10:
-            prediction_label = 'Sleep Apnea'
-        elif stress_level >= 9 and quality_of_sleep <= 3:
-            prediction_label = 'Insomnia'
-        elif heart_rate > 100 or heart_rate < 50:
-            if prediction_label == 'Healthy':
-                prediction_label = 'Sleep Apnea'
-        
-        # Risk Calculation
-        risk_val = 0
-        if prediction_label == 'Healthy': risk_val = 15
-        elif prediction_label == 'Insomnia': risk_val = 65
-        elif prediction_label == 'Sleep Apnea': risk_val = 92
-        
         # Store in history
-        st.session_state['history'].append({
-            'timestamp': datetime.datetime.now(),
-            'prediction': prediction_label,
-            'risk': risk_val,
-            'score': sleep_score
-        })
-        
+        session.add_history(analysis['timestamp'], analysis['prediction'], analysis['risk'], analysis_score)
+        save_session(session)
+        # Population view (Cohort Analytics page)
+        cohort_cube = load_cohort_cube()
+        # Appended as a delta file: the cube file itself is only rewritten by src/cohort_cube.py
+        cohort_cube.record(*cohort, analysis['prediction'], analysis_score, analysis['timestamp'])
+
+# --- Panels ---
+# Each panel with its own widgets is a fragment: clicking or sliding inside
+# it reruns just that panel. Sidebar inputs still rerun the whole page and
+# reach the panels as arguments.
+
+# Display names for the model's feature columns
+FEATURE_LABELS = {'Physical Activity Level': 'Physical Activity', 'BP_Systolic': 'BP Systolic',
+                  'BP_Diastolic': 'BP Diastolic'}
+
+@st.cache_data(show_spinner=False)
+def feature_importance(route_key, _model):
+    """Importances of the routed model, sorted ascending; computed once per model."""
+    return pd.DataFrame({
+        'Feature': [FEATURE_LABELS.get(f, f) for f in _model.feature_names_in_],
+        'Importance': _model.feature_importances_
+    }).sort_values('Importance', ascending=True)
+
+@st.cache_resource(max_entries=8)
+def get_counterfactual_search(route_key, _model, _le):
+    return CounterfactualSearch(_model, _le)
+
+@st.cache_data(show_spinner=False, max_entries=512)
+def counterfactuals(route_key, _model, _le, input_df):
+    """Smallest lifestyle changes to Healthy for this patient, per routed model."""
+    return get_counterfactual_search(route_key, _model, _le).search(input_df)
+
+@st.fragment
+def analysis_panel(model, le, input_df, user_data, sleep_score, route_key, fast_inference):
+    st.subheader("Analysis Results")
+
+    if st.button("Run Analysis", width="stretch", disabled='analysis_job' in st.session_state):
+        # Identical in-flight analyses (from any session) share one job
+        job_key = ('analysis', route_key, fast_inference,
+                   tuple(user_data.items()), tuple(input_df.iloc[0].tolist()))
+        early_exit = EarlyExitForest(model) if fast_inference and hasattr(model, 'estimators_') else None
+        st.session_state['analysis_job'] = job_runner.submit(
+            job_key, run_analysis, model, le, input_df, user_data, drift_monitor, shadow_scorer, early_exit
+        )
+        st.session_state['analysis_score'] = sleep_score
+
+    analysis = current_session().analysis
+    if 'analysis_job' in st.session_state:
+        show_job_progress('analysis_job', 'Running analysis...')
+    elif analysis is not None:
+        prediction_label = analysis['prediction']
+
         # Display Result
         if prediction_label == 'Healthy':
             st.success(f"### Diagnosis: {prediction_label}\nPatient shows no signs of sleep disorders.")
@@ -240,42 +351,168 @@ with col_left:
             st.error(f"### Diagnosis: {prediction_label}\nHigh probability of Sleep Apnea. Clinical consultation recommended.")
         else:
             st.warning(f"### Diagnosis: {prediction_label}\nSymptoms consistent with Insomnia. Monitor sleep hygiene.")
-        
+        if analysis.get('trees_used'):
+            st.caption(f"Early exit: decided by {analysis['trees_used']} of {len(model.estimators_)} trees")
+
         # Recommendations
         st.markdown("#### AI Recommendations")
-        recs = get_recommendations(sleep_duration, quality_of_sleep, stress_level, physical_activity, bmi_category, heart_rate)
-        
         with st.expander("View Personalized Recommendations", expanded=True):
-            for rec in recs:
+            for rec in analysis['recommendations']:
                 st.info(rec)
-        
-        # Generate Report
-        user_data_dict = {
-            'Gender': gender, 'Age': age, 'Occupation': occupation, 'BMI': bmi_category,
-            'Sleep Duration': sleep_duration, 'Quality of Sleep': quality_of_sleep,
-            'Physical Activity': physical_activity, 'Stress Level': stress_level,
-            'Heart Rate': heart_rate, 'Daily Steps': daily_steps,
-            'BP': f"{bp_systolic}/{bp_diastolic}"
-        }
-        report_txt = generate_report(user_data_dict, prediction_label, risk_val, recs)
-        
+
         st.download_button(
             label="Download Clinical Report",
-            data=report_txt,
-            file_name=f"Clinical_Report_{datetime.datetime.now().strftime('%Y%m%d')}.txt",
+            data=analysis['report'],
+            file_name=f"Clinical_Report_{analysis['timestamp'].strftime('%Y%m%d')}.txt",
             mime="text/plain",
         )
-        
-        st.session_state['risk_val'] = risk_val
-        st.session_state['prediction'] = prediction_label
-        st.session_state['run'] = True
+
+def clear_history():
+    session = current_session()
+    session.clear_history()
+    save_session(session)
+
+@st.fragment
+def history_panel():
+    session = current_session()
+    if not len(session.history):
+        return
+    st.markdown("---")
+    st.subheader("Historical Analysis")
+
+    col_h1, col_h2 = st.columns([2, 1])
+
+    with col_h1:
+        # Trend Chart
+        history_df = session.history_frame()
+
+        fig_trend = go.Figure()
+        fig_trend.add_trace(go.Scatter(
+            x=history_df['timestamp'],
+            y=history_df['score'],
+            mode='lines+markers',
+            name='Sleep Score',
+            line=dict(color='#00D9FF', width=3),
+            marker=dict(size=8)
+        ))
+
+        fig_trend.update_layout(
+            title="Sleep Score Trend",
+            xaxis_title="Time",
+            yaxis_title="Score",
+            height=250,
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#FAFAFA'),
+            xaxis=dict(gridcolor='#2D3139'),
+            yaxis=dict(gridcolor='#2D3139')
+        )
+
+        st.plotly_chart(fig_trend, width="stretch")
+
+    with col_h2:
+        st.markdown("**Analysis Summary**")
+        st.metric("Average Score", f"{history_df['score'].mean():.1f}/100")
+        st.metric("Total Analyses", len(history_df))
+
+        # Cleared in the callback, before the panel reruns, so it redraws empty on its own
+        st.button("Clear History", on_click=clear_history)
+
+@st.fragment
+def what_if_panel(model, le, patient, occupation_encoder, trend_input, sleep_metrics_input, sleep_score, route_key, input_df):
+    st.markdown("---")
+    st.subheader("What-If Simulator")
+    st.markdown("**Explore how changing your habits could affect your sleep health**")
+
+    col_sim1, col_sim2 = st.columns([1, 1])
+
+    with col_sim1:
+        st.markdown("**Adjust Metrics to See Impact**")
+
+        sim_sleep = st.slider('Simulated Sleep Duration (hrs)', 0.0, 12.0, float(patient['sleep_duration']), 0.5, key='sim_sleep')
+        sim_quality = st.slider('Simulated Sleep Quality', 1, 10, patient['quality_of_sleep'], key='sim_quality')
+        sim_stress = st.slider('Simulated Stress Level', 1, 10, patient['stress_level'], key='sim_stress')
+        sim_activity = st.slider('Simulated Physical Activity (mins)', 0, 120, patient['physical_activity'], key='sim_activity')
+
+        if st.button("Run Simulation", key='sim_button'):
+            # Calculate simulated score
+            sim_score = sleep_core.sleep_score(sim_sleep, sim_quality, sim_stress, sim_activity, patient['heart_rate'])
+
+            # Prepare simulated input (stress changes the score only, as before)
+            sim_input = sleep_core.encode(
+                **{**patient, 'sleep_duration': sim_sleep, 'quality_of_sleep': sim_quality,
+                   'physical_activity': sim_activity},
+                occupation_encoder=occupation_encoder, trend_features=trend_input, sleep_metrics=sleep_metrics_input
+            )
+
+            # Get prediction
+            sim_label = sleep_core.predict(model, le, sim_input)[0][0]
+
+            # Store in session state
+            session = current_session()
+            session.simulation = (int(sim_score), str(sim_label))
+            save_session(session)
+
+    session = current_session()
+    with col_sim2:
+        if session.simulation is not None:
+            st.markdown("**Simulation Results**")
+            sim_score, sim_label = session.simulation
+            analysis = session.analysis
+
+            # Compare scores
+            score_diff = sim_score - sleep_score
+
+            col_comp1, col_comp2 = st.columns(2)
+            with col_comp1:
+                st.metric("Current Score", f"{sleep_score}/100")
+                st.metric("Current Status", analysis['prediction'] if analysis else 'N/A')
+
+            with col_comp2:
+                st.metric("Simulated Score", f"{sim_score}/100",
+                         delta=f"{score_diff:+.0f}")
+                st.metric("Simulated Status", sim_label)
+
+            # Interpretation
+            if score_diff > 10:
+                st.success("✅ **Great improvement!** These changes could significantly boost your sleep health.")
+            elif score_diff > 0:
+                st.info("📈 **Positive change.** These adjustments would help improve your sleep.")
+            elif score_diff < -10:
+                st.error("⚠️ **Decline detected.** These changes could worsen your sleep health.")
+            else:
+                st.warning("➡️ **Minimal change.** Try adjusting other factors for better results.")
+        else:
+            st.info("👆 Adjust the sliders above and click 'Run Simulation' to see how changes affect your sleep health.")
+
+    if st.toggle("Suggest the smallest changes that reach Healthy", key='cf_toggle'):
+        result = counterfactuals(route_key, model, le, input_df)
+        if result['prediction'] == 'Healthy':
+            st.info("The current inputs are already diagnosed Healthy.")
+        elif not result['counterfactuals']:
+            st.warning("No change to sleep, stress, activity or steps alone reaches Healthy; "
+                       "the diagnosis rests on other factors such as BMI, blood pressure or heart rate.")
+        else:
+            st.dataframe(pd.DataFrame([{'Changes': describe(cf['changes']), 'Effort': round(cf['cost'], 2),
+                                        'P(Healthy)': f"{cf['probability']:.0%}"}
+                                       for cf in result['counterfactuals']]), hide_index=True)
+            st.caption(f"Cheapest changes among {result['evaluated']} candidates scored. One unit of effort is "
+                       "1 h of sleep, 2 points of quality or stress, 30 min of activity or 3000 steps.")
+
+route_key = model_router.model_key(*tenant_args)
+
+# Layout: 2 Columns
+col_left, col_right = st.columns([1, 1], gap="large")
+
+with col_left:
+    analysis_panel(model, le, input_df, user_data_dict, sleep_score, route_key, fast_inference)
 
 with col_right:
     st.subheader(" Health Metrics Visualization")
-    
+
     # Radar Chart with Baseline Comparison
     categories = ['Sleep Quality', 'Activity', 'Stress Mgmt', 'Heart Health', 'Sleep Duration']
-    
+
     # Current values
     r_values = [
         quality_of_sleep / 10,
@@ -284,12 +521,12 @@ with col_right:
         1 - (abs(heart_rate - 70) / 50),
         min(sleep_duration / 8, 1.0)
     ]
-    
+
     # Healthy baseline
     baseline = [0.8, 0.7, 0.8, 0.9, 0.9]
-    
+
     fig = go.Figure()
-    
+
     # Add baseline
     fig.add_trace(go.Scatterpolar(
         r=baseline,
@@ -299,7 +536,7 @@ with col_right:
         line_color='#4ADE80',
         fillcolor='rgba(74, 222, 128, 0.1)'
     ))
-    
+
     # Add current
     fig.add_trace(go.Scatterpolar(
         r=r_values,
@@ -309,7 +546,7 @@ with col_right:
         line_color='#00D9FF',
         fillcolor='rgba(0, 217, 255, 0.2)'
     ))
-    
+
     fig.update_layout(
         polar=dict(
             radialaxis=dict(visible=True, range=[0, 1]),
@@ -329,12 +566,12 @@ with col_right:
         plot_bgcolor='rgba(0,0,0,0)',
         font=dict(color='#FAFAFA')
     )
-    
+
     st.plotly_chart(fig, width="stretch")
-    
+
     # Gauge Chart
-    if 'run' in st.session_state and st.session_state['run']:
-        risk = st.session_state['risk_val']
+    if session.analysis_fields is not None:
+        risk = session.analysis_fields['risk']
         fig_gauge = go.Figure(go.Indicator(
             mode = "gauge+number+delta",
             value = risk,
@@ -358,7 +595,7 @@ with col_right:
             }
         ))
         fig_gauge.update_layout(
-            height=250, 
+            height=250,
             margin=dict(l=20, r=20, t=40, b=20),
             paper_bgcolor='rgba(0,0,0,0)',
             font=dict(color='#FAFAFA')
@@ -366,72 +603,49 @@ with col_right:
         st.plotly_chart(fig_gauge, width="stretch")
 
 # Historical Tracking
-if len(st.session_state['history']) > 0:
-    st.markdown("---")
-    st.subheader("Historical Analysis")
-    
-    col_h1, col_h2 = st.columns([2, 1])
-    
-    with col_h1:
-        # Trend Chart
-        history_df = pd.DataFrame(st.session_state['history'])
-        
-        fig_trend = go.Figure()
-        fig_trend.add_trace(go.Scatter(
-            x=history_df['timestamp'],
-            y=history_df['score'],
-            mode='lines+markers',
-            name='Sleep Score',
-            line=dict(color='#00D9FF', width=3),
-            marker=dict(size=8)
-        ))
-        
-        fig_trend.update_layout(
-            title="Sleep Score Trend",
-            xaxis_title="Time",
-            yaxis_title="Score",
-            height=250,
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='#FAFAFA'),
-            xaxis=dict(gridcolor='#2D3139'),
-            yaxis=dict(gridcolor='#2D3139')
-        )
-        
-        st.plotly_chart(fig_trend, width="stretch")
-    
-    with col_h2:
-        st.markdown("**Analysis Summary**")
-        avg_score = np.mean([h['score'] for h in st.session_state['history']])
-        st.metric("Average Score", f"{avg_score:.1f}/100")
-        st.metric("Total Analyses", len(st.session_state['history']))
-        
-        if st.button("Clear History"):
-            st.session_state['history'] = []
-            st.rerun()
+history_panel()
+
+# Input Drift Monitor
+if drift_monitor and drift_monitor.n_observed > 0:
+    with st.expander("Input Drift Monitor", expanded=False):
+        st.caption(f"Live inputs vs. training distribution (last {drift_monitor.n_observed} analyses, all sessions)")
+        st.dataframe(drift_monitor.report(), width="stretch", hide_index=True)
+
+# Session Memory
+with st.expander("Session Memory", expanded=False):
+    memory = session_store.stats()
+    col_mem1, col_mem2, col_mem3 = st.columns(3)
+    col_mem1.metric("Sessions in memory", memory['sessions'], help=f"{memory['spilled']} spilled to disk")
+    col_mem2.metric("Memory used", f"{memory['memory_bytes'] / 1024:.1f} KB",
+                    help=f"Budget {memory['total_budget'] / 2**20:.0f} MB; this session {session.nbytes / 1024:.1f} KB")
+    col_mem3.metric("Largest session", f"{memory['largest_session_bytes'] / 1024:.1f} KB",
+                    help=f"Per-session budget {memory['session_budget'] / 1024:.0f} KB")
+    st.caption(f"Spills {memory['spills']} | Restores {memory['restores']} | "
+               f"Expired {memory['evictions']} | History rows trimmed {memory['trimmed_rows']}")
+
+# Shadow Model Comparison
+if shadow_scorer:
+    shadow_stats = shadow_scorer.summary()
+    if shadow_stats['requests']:
+        with st.expander("Shadow Model Comparison", expanded=False):
+            col_sh1, col_sh2, col_sh3 = st.columns(3)
+            col_sh1.metric("Agreement", f"{shadow_stats['agreement']:.1%}", help=f"{shadow_stats['requests']} requests scored")
+            col_sh2.metric("Live p95 latency", f"{shadow_stats['live_ms_p95']:.1f} ms")
+            col_sh3.metric("Candidate p95 latency", f"{shadow_stats['candidate_ms_p95']:.1f} ms")
+            st.caption("Confusion: rows = live prediction, columns = candidate prediction")
+            st.dataframe(shadow_stats['confusion'], width="stretch")
 
 # Feature Importance Section
-st.markdown("---")
-st.subheader("Feature Importance Analysis")
+if hasattr(model, 'feature_importances_'):
+    st.markdown("---")
+    st.subheader("Feature Importance Analysis")
 
-col_fi1, col_fi2 = st.columns([1, 1])
+    col_fi1, col_fi2 = st.columns([1, 1])
+    fi_df = feature_importance(route_key, model)
+
+    with col_fi1:
+        st.markdown("**What Factors Most Affect Sleep Health?**")
 
-with col_fi1:
-    st.markdown("**What Factors Most Affect Sleep Health?**")
-    
-    # Get feature importances from the model
-    if model and hasattr(model, 'feature_importances_'):
-        feature_names = ['Gender', 'Age', 'Occupation', 'Sleep Duration', 'Quality of Sleep', 
-                        'Physical Activity', 'Stress Level', 'BMI Category', 'Heart Rate', 
-                        'Daily Steps', 'BP Systolic', 'BP Diastolic']
-        importances = model.feature_importances_
-        
-        # Create DataFrame and sort
-        fi_df = pd.DataFrame({
-            'Feature': feature_names,
-            'Importance': importances
-        }).sort_values('Importance', ascending=True)
-        
         # Create horizontal bar chart
         fig_fi = go.Figure(go.Bar(
             x=fi_df['Importance'],
@@ -443,7 +657,7 @@ with col_fi1:
                 showscale=False
             )
         ))
-        
+
         fig_fi.update_layout(
             title="Feature Importance Scores",
             xaxis_title="Importance",
@@ -455,90 +669,27 @@ with col_fi1:
             xaxis=dict(gridcolor='#2D3139'),
             yaxis=dict(gridcolor='#2D3139')
         )
-        
-        st.plotly_chart(fig_fi, width="stretch")
 
-with col_fi2:
-    st.markdown("**Understanding the Results**")
-    st.info("""
-    **Feature Importance** shows which health metrics have the strongest influence on sleep disorder predictions.
-    
-    **Higher bars** = More important for prediction
-    
-    **Key Insights:**
-    - Focus on improving the top-ranked factors
-    - These metrics have the biggest impact on your sleep health
-    - The model weighs these features most heavily in its decision
-    """)
-    
-    # Top 3 features
-    top_3 = fi_df.tail(3)
-    st.markdown("**Top 3 Most Important Factors:**")
-    for idx, row in top_3.iterrows():
-        st.markdown(f"🔹 **{row['Feature']}** ({row['Importance']:.3f})")
+        st.plotly_chart(fig_fi, width="stretch")
 
-# What-If Simulator
-st.markdown("---")
-st.subheader("What-If Simulator")
-st.markdown("**Explore how changing your habits could affect your sleep health**")
+    with col_fi2:
+        st.markdown("**Understanding the Results**")
+        st.info("""
+        **Feature Importance** shows which health metrics have the strongest influence on sleep disorder predictions.
 
-col_sim1, col_sim2 = st.columns([1, 1])
+        **Higher bars** = More important for prediction
 
-with col_sim1:
-    st.markdown("**Adjust Metrics to See Impact**")
-    
-    sim_sleep = st.slider('Simulated Sleep Duration (hrs)', 0.0, 12.0, float(sleep_duration), 0.5, key='sim_sleep')
-    sim_quality = st.slider('Simulated Sleep Quality', 1, 10, quality_of_sleep, key='sim_quality')
-    sim_stress = st.slider('Simulated Stress Level', 1, 10, stress_level, key='sim_stress')
-    sim_activity = st.slider('Simulated Physical Activity (mins)', 0, 120, physical_activity, key='sim_activity')
-    
-    if st.button("Run Simulation", key='sim_button'):
-        # Calculate simulated score
-        sim_score = calculate_sleep_score(sim_sleep, sim_quality, sim_stress, sim_activity, heart_rate)
-        
-        # Prepare simulated input
-        sim_input = preprocess_input(
-            gender, age, occupation, sim_sleep, sim_quality, sim_activity, 
-            stress_level, bmi_category, heart_rate, daily_steps, bp_systolic, bp_diastolic,
-            occupation_encoder
-        )
-        
-        # Get prediction
-        sim_prediction = model.predict(sim_input)
-        sim_label = le.inverse_transform(sim_prediction)[0]
-        
-        # Store in session state
-        st.session_state['sim_score'] = sim_score
-        st.session_state['sim_label'] = sim_label
-        st.session_state['sim_run'] = True
-
-with col_sim2:
-    if 'sim_run' in st.session_state and st.session_state['sim_run']:
-        st.markdown("**Simulation Results**")
-        
-        # Compare scores
-        score_diff = st.session_state['sim_score'] - sleep_score
-        
-        col_comp1, col_comp2 = st.columns(2)
-        with col_comp1:
-            st.metric("Current Score", f"{sleep_score}/100")
-            st.metric("Current Status", st.session_state.get('prediction', 'N/A'))
-        
-        with col_comp2:
-            st.metric("Simulated Score", f"{st.session_state['sim_score']}/100", 
-                     delta=f"{score_diff:+.0f}")
-            st.metric("Simulated Status", st.session_state['sim_label'])
-        
-        # Interpretation
-        if score_diff > 10:
-            st.success("✅ **Great improvement!** These changes could significantly boost your sleep health.")
-        elif score_diff > 0:
-            st.info("📈 **Positive change.** These adjustments would help improve your sleep.")
-        elif score_diff < -10:
-            st.error("⚠️ **Decline detected.** These changes could worsen your sleep health.")
-        else:
-            st.warning("➡️ **Minimal change.** Try adjusting other factors for better results.")
-    else:
-        st.info("👆 Adjust the sliders above and click 'Run Simulation' to see how changes affect your sleep health.")
+        **Key Insights:**
+        - Focus on improving the top-ranked factors
+        - These metrics have the biggest impact on your sleep health
+        - The model weighs these features most heavily in its decision
+        """)
 
+        # Top 3 features
+        top_3 = fi_df.tail(3)
+        st.markdown("**Top 3 Most Important Factors:**")
+        for idx, row in top_3.iterrows():
+            st.markdown(f"🔹 **{row['Feature']}** ({row['Importance']:.3f})")
 
+# What-If Simulator
+what_if_panel(model, le, patient, occupation_encoder, trend_input, sleep_metrics_input, sleep_score, route_key, input_df)
@@ -0,0 +1,97 @@
+import os
+import sys
+import streamlit as st
+import plotly.graph_objects as go
+import pandas as pd
+
+# Pages share the dashboard's helpers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from styles import get_css
+from utils import load_cohort_cube
+from cohort_cube import ALL, AGE_BANDS, SCORE_EDGES
+
+st.set_page_config(
+    page_title="Cohort Analytics | Sleep Health Predictor",
+    page_icon="🩺",
+    layout="wide",
+)
+st.markdown(get_css(), unsafe_allow_html=True)
+
+CHART_LAYOUT = dict(
+    height=300,
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(0,0,0,0)',
+    font=dict(color='#FAFAFA'),
+    xaxis=dict(gridcolor='#2D3139'),
+    yaxis=dict(gridcolor='#2D3139'),
+    margin=dict(t=40, b=20),
+)
+DISORDER_COLORS = {'Healthy': '#00CC96', 'Insomnia': '#FFA15A', 'Sleep Apnea': '#EF553B'}
+
+st.title("Cohort Analytics")
+st.markdown("### Population view of scored patients")
+
+cube = load_cohort_cube()
+overall = cube.cell()
+if not overall['n']:
+    st.info("No scored results yet. Run analyses on the main page, or build the cube from a dataset:\n\n"
+            "`python3 src/cohort_cube.py --data data/raw/Sleep_health_and_lifestyle_dataset.csv`")
+    st.stop()
+
+# --- Slice filters (every combination is a precomputed cell) ---
+with st.sidebar:
+    st.markdown("### Cohort Filters")
+    occupation = st.selectbox('Occupation', [ALL] + cube.values('Occupation'), format_func=lambda v: 'All' if v == ALL else v)
+    bmi = st.selectbox('BMI Category', [ALL] + cube.values('BMI'), format_func=lambda v: 'All' if v == ALL else v)
+    bands = [b for b in AGE_BANDS if b in cube.values('Age Band')]
+    band = st.selectbox('Age Band', [ALL] + bands, format_func=lambda v: 'All' if v == ALL else v)
+    periods = cube.values('Period')
+    week = st.selectbox('Week', [ALL] + periods, format_func=lambda v: 'All time' if v == ALL else f"Week of {v}")
+
+filters = dict(occupation=occupation, bmi=bmi, age_band=band, period=week)
+cell = cube.cell(**filters)
+
+col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+col_m1.metric("Patients", f"{cell['n']:,}", help=f"{overall['n']:,} in total")
+col_m2.metric("Mean Sleep Score", f"{cell['mean_score']:.1f}" if cell['n'] else "-")
+col_m3.metric("Insomnia", f"{cell['prevalence'].get('Insomnia', 0):.1%}")
+col_m4.metric("Sleep Apnea", f"{cell['prevalence'].get('Sleep Apnea', 0):.1%}")
+
+if not cell['n']:
+    st.warning("No patients in this slice.")
+    st.stop()
+
+st.markdown("---")
+col_left, col_right = st.columns([1, 1], gap="large")
+
+with col_left:
+    breakdown_dim = st.radio("Prevalence by", ['Occupation', 'BMI', 'Age Band'], horizontal=True)
+    dim_filter = {'Occupation': 'occupation', 'BMI': 'bmi', 'Age Band': 'age_band'}[breakdown_dim]
+    table = cube.breakdown(breakdown_dim, **{k: v for k, v in filters.items() if k != dim_filter})
+    if breakdown_dim == 'Age Band' and len(table):
+        table = table.set_index('Age Band').reindex([b for b in AGE_BANDS if b in set(table['Age Band'])]).reset_index()
+
+    fig_prev = go.Figure()
+    for label, color in DISORDER_COLORS.items():
+        if f'{label} %' in table:
+            fig_prev.add_trace(go.Bar(x=table[breakdown_dim], y=table[f'{label} %'], name=label, marker_color=color))
+    fig_prev.update_layout(title=f"Disorder Prevalence by {breakdown_dim} (%)", barmode='stack', **CHART_LAYOUT)
+    st.plotly_chart(fig_prev, width="stretch")
+    st.dataframe(table.round(1), width="stretch", hide_index=True)
+
+with col_right:
+    labels = [f"{lo}-{hi}" for lo, hi in zip(SCORE_EDGES[:-1], SCORE_EDGES[1:])]
+    fig_hist = go.Figure(go.Bar(x=labels, y=cell['score_hist'], marker_color='#00D9FF'))
+    fig_hist.update_layout(title="Sleep Score Distribution", xaxis_title="Score", yaxis_title="Patients", **CHART_LAYOUT)
+    st.plotly_chart(fig_hist, width="stretch")
+
+    # Over time: one cell lookup per week
+    weekly = [(p, cube.cell(**{**filters, 'period': p})) for p in periods]
+    weekly = pd.DataFrame([{'Week': p, 'Mean Score': c['mean_score'], 'Patients': c['n']} for p, c in weekly if c['n']])
+    if len(weekly) > 1:
+        fig_time = go.Figure(go.Scatter(x=weekly['Week'], y=weekly['Mean Score'], mode='lines+markers',
+                                        line=dict(color='#00D9FF', width=3)))
+        fig_time.update_layout(title="Mean Sleep Score by Week", **CHART_LAYOUT)
+        st.plotly_chart(fig_time, width="stretch")
+    else:
+        st.caption("Score trends over time appear once results span more than one week.")
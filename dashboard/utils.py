@@ -1,123 +1,101 @@
 import os
+import sys
+import time
+import threading
 import joblib
-import pandas as pd
-import datetime
+import numpy as np
 
-def load_model():
-    """Loads the trained model and label encoder."""
-    # Navigate up from 'dashboard' to project root
+# Shared modules live in src/ alongside the training script
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+from sleep_core import analyze, load_feature_profile
+from hypnogram import SLEEP_METRIC_FEATURES
+from watch_sim import STREAM_FIELDS, synthetic_day, summarize_days
+from model_router import ModelRouter, DEFAULT_TENANT
+from model_bundle import current_version
+from cohort_cube import CohortCube
+
+def load_model_router(capacity=4):
+    """Builds the per-clinic/device model router.
+
+    Uses models/tenants.json when present (see src/model_router.py);
+    otherwise every request routes to the active model bundle, or to the
+    loose deployed model files when no bundle is active.
+    """
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    model_path = os.path.join(base_dir, 'models', 'sleep_model_fast.pkl')
-    le_path = os.path.join(base_dir, 'models', 'label_encoder.pkl')
-    occupation_encoder_path = os.path.join(base_dir, 'models', 'occupation_encoder.pkl')
-    
-    if not os.path.exists(model_path):
-        return None, None, None
-        
-    model = joblib.load(model_path)
-    le = joblib.load(le_path)
-    
-    # Load occupation encoder if exists
-    occupation_encoder = None
-    if os.path.exists(occupation_encoder_path):
-        occupation_encoder = joblib.load(occupation_encoder_path)
-    
-    return model, le, occupation_encoder
+    models_dir = os.path.join(base_dir, 'models')
+    registry_path = os.path.join(models_dir, 'tenants.json')
+    if os.path.exists(registry_path):
+        return ModelRouter.from_file(registry_path, capacity)
+    if current_version(os.path.join(models_dir, 'bundles')):
+        return ModelRouter({DEFAULT_TENANT: {'bundle': 'current'}}, models_dir, capacity)
+    if not os.path.exists(os.path.join(models_dir, 'sleep_model_fast.pkl')):
+        return None
+    default = {'model': 'sleep_model_fast.pkl', 'label_encoder': 'label_encoder.pkl'}
+    if os.path.exists(os.path.join(models_dir, 'occupation_encoder.pkl')):
+        default['occupation_encoder'] = 'occupation_encoder.pkl'
+    return ModelRouter({DEFAULT_TENANT: default}, models_dir, capacity)
 
-def preprocess_input(gender, age, occupation, sleep_duration, quality_of_sleep, physical_activity, stress_level, bmi_category, heart_rate, daily_steps, bp_systolic, bp_diastolic, occupation_encoder=None):
-    """Preprocesses user input into a DataFrame for the model."""
-    gender_val = 0 if gender == 'Male' else 1
-    bmi_map = {'Normal': 0, 'Overweight': 1, 'Obese': 2}
-    bmi_val = bmi_map.get(bmi_category, 0)
-    
-    # Encode occupation if encoder is available
-    occupation_val = 0  # Default
-    if occupation_encoder is not None:
-        try:
-            occupation_val = occupation_encoder.transform([occupation])[0]
-        except:
-            # If occupation not in training data, use a default value
-            occupation_val = 0
+def load_candidate_model():
+    """Loads the shadow candidate model (trained with --candidate), if present."""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    candidate_path = os.path.join(base_dir, 'models', 'sleep_model_candidate.pkl')
+    if not os.path.exists(candidate_path):
+        return None
+    return joblib.load(candidate_path)
 
-    input_data = pd.DataFrame({
-        'Gender': [gender_val],
-        'Age': [age],
-        'Occupation': [occupation_val],
-        'Sleep Duration': [sleep_duration],
-        'Quality of Sleep': [quality_of_sleep],
-        'Physical Activity Level': [physical_activity],
-        'Stress Level': [stress_level],
-        'BMI Category': [bmi_val],
-        'Heart Rate': [heart_rate],
-        'Daily Steps': [daily_steps],
-        'BP_Systolic': [bp_systolic],
-        'BP_Diastolic': [bp_diastolic]
-    })
-    return input_data
+# Shared by every session in this process (see the Cohort Analytics page)
+_cohort_cube = None
+_cohort_cube_lock = threading.Lock()
 
-def get_recommendations(duration, quality, stress, activity, bmi, heart_rate):
-    """Generates personalized recommendations based on health metrics."""
-    recommendations = []
-    
-    # Sleep Duration
-    if duration < 6.0:
-        recommendations.append("Increase Sleep Duration: Aim for at least 7 hours. Consistent lack of sleep increases health risks.")
-    elif duration > 9.0:
-        recommendations.append("Regulate Sleep Pattern: Oversleeping can indicate underlying issues. Try to stick to a consistent 7-8 hour schedule.")
-        
-    # Sleep Quality
-    if quality < 6:
-        recommendations.append("Improve Sleep Hygiene: Low sleep quality detected. Avoid screens before bed, keep your room cool, and limit caffeine.")
-        
-    # Stress
-    if stress > 6:
-        recommendations.append("Manage Stress: High stress negatively impacts sleep. Consider meditation, deep breathing, or yoga.")
-        
-    # Physical Activity
-    if activity < 30:
-        recommendations.append("Get Moving: Regular physical activity (30+ mins/day) promotes deeper sleep.")
-        
-    # BMI
-    if bmi != 'Normal':
-        recommendations.append("Watch Your Weight: Maintaining a healthy weight reduces the risk of sleep apnea and insomnia.")
-        
-    # Heart Rate
-    if heart_rate > 80:
-        recommendations.append("Monitor Heart Rate: Resting heart rate is slightly high. Regular cardio and stress reduction can help.")
-        
-    if not recommendations:
-        recommendations.append("Excellent Habits: Your metrics suggest good sleep health. Keep it up!")
-        
-    return recommendations
+def load_cohort_cube():
+    """Returns the process-wide cohort cube (data/cohort_cube.pkl), kept up to date.
 
-def generate_report(user_data, prediction_label, risk_val, recommendations):
-    """Generates a text report of the analysis."""
-    report_text = f"""
-    SLEEP HEALTH ANALYSIS REPORT
-    Date: {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-    ----------------------------------------
-    USER PROFILE:
-    - Gender: {user_data['Gender']}
-    - Age: {user_data['Age']}
-    - Occupation: {user_data.get('Occupation', 'N/A')}
-    - BMI Category: {user_data['BMI']}
-    - Sleep Duration: {user_data['Sleep Duration']} hrs
-    - Sleep Quality: {user_data['Quality of Sleep']}/10
-    - Stress Level: {user_data['Stress Level']}/10
-    - Physical Activity: {user_data['Physical Activity']} mins/day
-    - Heart Rate: {user_data['Heart Rate']} bpm
-    - Daily Steps: {user_data['Daily Steps']}
-    - Blood Pressure: {user_data['BP']}
-    ----------------------------------------
-    ANALYSIS RESULT:
-    Prediction: {prediction_label}
-    Risk Level: {risk_val}/100
-    ----------------------------------------
-    RECOMMENDATIONS:
+    Results other dashboard processes recorded are folded in from their new
+    delta files; a rewritten cube file (src/cohort_cube.py, or a compaction)
+    is loaded again.
     """
-    for rec in recommendations:
-        # Clean up markdown for text file
-        clean_rec = rec.replace('**', '').replace(' ', '').replace(' ', '').replace(' ', '').replace(' ', '').replace(' ', '').replace(' ', '').replace(' ', '').replace(' ', '')
-        report_text += f"\n- {clean_rec}"
-        
-    return report_text
+    global _cohort_cube
+    with _cohort_cube_lock:
+        if _cohort_cube is None:
+            _cohort_cube = CohortCube.load()
+        else:
+            _cohort_cube = _cohort_cube.refresh()
+        return _cohort_cube
+
+def simulate_watch_sync(job):
+    """Background job: simulates pulling the last day's data from the smartwatch.
+
+    The day is a per-minute stream as in src/watch_sim.py. Sleep duration
+    and quality come from the night's hypnogram (objective sleep
+    architecture) rather than a self-reported rating.
+    """
+    for step in range(10):
+        time.sleep(0.2)  # Simulate sync delay
+        job.report((step + 1) / 10, 'Syncing data from smartwatch...')
+    day = synthetic_day(np.random.default_rng())
+    summary = summarize_days(*(day[k][None] for k in STREAM_FIELDS)).iloc[0]
+    return {
+        'heart_rate': int(summary['Heart Rate']),
+        'steps': int(summary['Daily Steps']),
+        'sleep_duration': float(summary['Sleep Duration']),
+        'sleep_quality': int(summary['Quality of Sleep']),
+        'sleep_metrics': summary[SLEEP_METRIC_FEATURES].astype(float).to_dict(),
+    }
+
+def run_analysis(job, model, le, input_df, user_data, drift_monitor=None, shadow_scorer=None, early_exit=None):
+    """Background job: sleep_core.analyze for one patient, feeding the live monitors.
+
+    With early_exit (an EarlyExitForest over model) the forest stops once its
+    vote is settled; the result then records how many trees were used.
+    The result also carries the cohort fields it was scored with, so the
+    page files it under those rather than whatever the sidebar shows now.
+    """
+    def observe(codes, latency):
+        if shadow_scorer:
+            shadow_scorer.submit(input_df, codes[0], latency)
+        if drift_monitor:
+            drift_monitor.observe(input_df)
+
+    analysis = analyze(model, le, input_df, user_data, early_exit, on_progress=job.report, on_predict=observe)
+    analysis['cohort'] = (user_data['Occupation'], user_data['BMI'], user_data['Age'])
+    return analysis
@@ -0,0 +1,199 @@
+"""Threshold-binned forest: exact lookup-table inference on binned inputs.
+
+Every split in the forest compares one feature against one of that
+feature's split thresholds, so an input is fully described by its bin: the
+number of the feature's thresholds below it. Dashboard inputs are discrete
+and bounded, so each feature has few thresholds and bins fit in a uint8.
+
+With inputs binned, each tree is evaluated from precomputed tables instead
+of a node-by-node walk (the QuickScorer scheme). Leaves are numbered left to
+right. A split that sends the input right rules out the leaves of its left
+subtree. For every (feature, bin) the table holds, per tree, a bitmask of
+the leaves still possible after all of that feature's splits, so
+
+    exit leaf = lowest set bit of AND over features of table[feature][bin]
+
+which is a handful of gathers and integer ANDs per row. Missing values get
+their own bin that follows each split's missing-value direction. Leaf
+probabilities are kept in float64 and summed tree by tree as sklearn does,
+so predict_proba matches sklearn bit for bit:
+
+    python3 src/binned_forest.py      # compile models/sleep_model_binned.npz and benchmark
+"""
+import os
+import time
+import argparse
+import numpy as np
+
+ALL_LEAVES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _leaf_ranges(tree):
+    """Left-to-right leaf numbering: (first leaf, end leaf) of every node's subtree."""
+    left, right = tree.children_left, tree.children_right
+    start = np.zeros(tree.node_count, dtype=np.int64)
+    end = np.zeros(tree.node_count, dtype=np.int64)
+    leaves = 0
+    stack = [(0, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if left[node] == -1:
+            start[node], end[node] = leaves, leaves + 1
+            leaves += 1
+        elif children_done:
+            start[node], end[node] = start[left[node]], end[right[node]]
+        else:
+            stack += [(node, True), (right[node], False), (left[node], False)]
+    return start, end
+
+
+def _clear_mask(first, end, n_words):
+    """Words of a leaf bitmask with leaves [first, end) cleared."""
+    bits = ((1 << int(end)) - 1) ^ ((1 << int(first)) - 1)
+    return ~np.array([(bits >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(n_words)], dtype=np.uint64)
+
+
+class BinnedForest:
+    """A fitted RandomForestClassifier compiled to per-feature bin edges and leaf-mask tables."""
+
+    def __init__(self, edges, offsets, table, value, classes, feature_names):
+        self.edges = edges        # Per feature: sorted split thresholds (float64)
+        self.offsets = offsets    # Feature f's bins start at table row offsets[f]
+        self.table = table        # (total bins, n_trees, n_words) uint64 leaf masks
+        self.value = value        # (n_trees, max leaves, n_classes) leaf probabilities
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names
+        self._used = np.array([f for f, e in enumerate(edges) if len(e)], dtype=np.int64)
+        self._bin_dtype = np.uint8 if max(len(e) for e in edges) + 2 <= 256 else np.uint16
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        trees = [est.tree_ for est in forest.estimators_]
+        n_features = forest.n_features_in_
+        edges = [np.unique(np.concatenate([t.threshold[(t.children_left != -1) & (t.feature == f)] for t in trees]))
+                 for f in range(n_features)]
+        # Bins 0..len(edges) for values, len(edges) + 1 for missing values
+        sizes = np.array([len(e) + 2 for e in edges])
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        max_leaves = max(t.n_leaves for t in trees)
+        n_words = (max_leaves + 63) // 64
+        table = np.full((offsets[-1], len(trees), n_words), ALL_LEAVES, dtype=np.uint64)
+        value = np.zeros((len(trees), max_leaves, len(forest.classes_)))
+
+        for i, t in enumerate(trees):
+            start, end = _leaf_ranges(t)
+            missing_left = getattr(t, 'missing_go_to_left', np.zeros(t.node_count, dtype=bool))
+            leaf = t.children_left == -1
+            # Leaf probabilities normalized as DecisionTreeClassifier.predict_proba does
+            proba = t.value[leaf, 0, :]
+            normalizer = proba.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value[i, start[leaf]] = proba / normalizer
+            for node in np.flatnonzero(~leaf):
+                f = t.feature[node]
+                k = np.searchsorted(edges[f], t.threshold[node])
+                mask = _clear_mask(start[t.children_left[node]], end[t.children_left[node]], n_words)
+                # Bins above k fail x <= threshold and go right
+                table[offsets[f] + k + 1:offsets[f] + len(edges[f]) + 1, i] &= mask
+                if not missing_left[node]:
+                    table[offsets[f + 1] - 1, i] &= mask
+
+        return cls(edges, offsets, table, value, np.asarray(forest.classes_),
+                   np.asarray(getattr(forest, 'feature_names_in_', []), dtype=object))
+
+    @property
+    def n_estimators(self):
+        return self.table.shape[1]
+
+    def bin(self, X):
+        """Maps inputs to bin indices, shape (n_samples, n_features)."""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        bins = np.zeros(X.shape, dtype=self._bin_dtype)
+        for f in self._used:
+            column = X[:, f]
+            bins[:, f] = np.where(np.isnan(column), len(self.edges[f]) + 1,
+                                  np.searchsorted(self.edges[f], column, side='left'))
+        return bins
+
+    def apply(self, X, chunk=512):
+        """Returns the exit leaf (left-to-right number) in every tree, shape (n_samples, n_trees)."""
+        bins = self.bin(X)
+        out = np.empty((len(bins), self.n_estimators), dtype=np.int64)
+        for i in range(0, len(bins), chunk):
+            rows = self.offsets[self._used] + bins[i:i + chunk, self._used]
+            mask = self.table[rows[:, 0]]
+            for j in range(1, rows.shape[1]):
+                mask &= self.table[rows[:, j]]
+            word = (mask != 0).argmax(axis=2)
+            w = np.take_along_axis(mask, word[..., None], axis=2)[..., 0]
+            lowest = w & (~w + np.uint64(1))
+            out[i:i + chunk] = 64 * word + np.log2(lowest.astype(np.float64)).astype(np.int64)
+        return out
+
+    def predict_proba(self, X, chunk=512):
+        leaves = self.apply(X, chunk)
+        flat = self.value.reshape(-1, self.value.shape[2])
+        base = np.arange(self.n_estimators) * self.value.shape[1]
+        proba = np.empty((len(leaves), self.value.shape[2]))
+        for i in range(0, len(leaves), chunk):
+            # Summing over the tree axis adds trees in order, as sklearn does
+            proba[i:i + chunk] = flat[leaves[i:i + chunk] + base].sum(axis=1)
+        return proba / self.n_estimators
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path):
+        np.savez_compressed(
+            path, edges=np.concatenate(self.edges), edge_counts=np.array([len(e) for e in self.edges]),
+            offsets=self.offsets, table=self.table, value=self.value,
+            classes=self.classes_, feature_names=self.feature_names_in_.astype(str),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=False)
+        edges = np.split(data['edges'], np.cumsum(data['edge_counts'])[:-1])
+        return cls(edges, data['offsets'], data['table'], data['value'], data['classes'],
+                   data['feature_names'].astype(object))
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    from train_model import BASE_DIR
+    from parity_check import load_bundled, synthetic_patients, timed
+    from sleep_core import encode_batch, load_artifacts
+
+    parser = argparse.ArgumentParser(description="Compile the trained forest to binned lookup tables.")
+    parser.add_argument('--bundle', metavar='VERSION', help="Model bundle to compile (default: the active one)")
+    parser.add_argument('--out', default=os.path.join(BASE_DIR, 'models', 'sleep_model_binned.npz'))
+    parser.add_argument('--rows', type=int, default=50000, help="Synthetic rows to benchmark on")
+    args = parser.parse_args()
+
+    # Model and encoder from the same bundle
+    model, _, occupation_encoder = load_artifacts(version=args.bundle)
+    start = time.perf_counter()
+    binned = BinnedForest.from_sklearn(model)
+    print(f"Compiled {binned.n_estimators} trees in {time.perf_counter() - start:.2f}s")
+    for name, e in zip(binned.feature_names_in_, binned.edges):
+        print(f"  {name:<25} {len(e) + 1:>4} bins")
+    binned.save(args.out)
+    print(f"Tables: {binned.table.nbytes / 1024:.0f} KB; saved to {args.out} "
+          f"({os.path.getsize(args.out) / 1024:.0f} KB)")
+
+    occupations = occupation_encoder.categories_ if occupation_encoder is not None else []
+    X = pd.concat([encode_batch(load_bundled(), occupation_encoder),
+                   encode_batch(synthetic_patients(args.rows, occupations), occupation_encoder)], ignore_index=True)
+    expected, sklearn_time = timed(model.predict_proba, X)
+    got, binned_time = timed(binned.predict_proba, X)
+    print(f"{len(X)} rows: sklearn {1e6 * sklearn_time / len(X):.1f} us/row, "
+          f"binned {1e6 * binned_time / len(X):.1f} us/row; max |dp| {np.abs(got - expected).max():.1e}, "
+          f"labels identical: {np.array_equal(got.argmax(axis=1), expected.argmax(axis=1))}")
+
+    # One patient per call, as the dashboard and API score
+    singles = X.iloc[:500]
+    _, sklearn_time = timed(lambda: [model.predict_proba(singles.iloc[[i]]) for i in range(len(singles))])
+    rows = singles.to_numpy()
+    _, binned_time = timed(lambda: [binned.predict_proba(rows[i:i + 1]) for i in range(len(rows))])
+    print(f"Single requests: sklearn {1e6 * sklearn_time / len(rows):.0f} us, binned {1e6 * binned_time / len(rows):.0f} us")
@@ -0,0 +1,87 @@
+"""Category encoding with an explicit bucket for rare and unseen values.
+
+Frequent categories get codes 0..k-1 (sorted, as LabelEncoder would);
+categories seen fewer than min_count times in training, and categories
+never seen at all, share code k, the OTHER bucket. The model learns what
+OTHER means from the rare training rows, so an unseen occupation is scored
+as "uncommon occupation" instead of silently as whatever class has code 0.
+
+A legacy LabelEncoder (older model artifacts) is wrapped without an OTHER
+bucket: its model never saw code k, so unseen values keep the old fallback
+to code 0 until the model is retrained with a fitted CategoryEncoder.
+"""
+import joblib
+import numpy as np
+import pandas as pd
+
+OTHER = '<other>'
+
+
+class CategoryEncoder:
+    """Dict-indexed encoder: O(1) single lookups, vectorized batch transform."""
+
+    has_other = True  # False for wrapped legacy encoders (unseen values -> code 0)
+
+    def __init__(self, min_count=1):
+        self.min_count = min_count
+        self.categories_ = np.array([], dtype=object)
+        self.index_ = {}
+
+    def fit(self, values):
+        counts = pd.Series(values).value_counts()
+        return self._set_categories(sorted(counts.index[counts >= self.min_count]))
+
+    @classmethod
+    def from_classes(cls, classes):
+        """Wraps fitted classes (e.g. a legacy LabelEncoder's) keeping their codes.
+
+        The model behind them was never trained on an OTHER code, so unseen
+        values map to code 0 as the legacy preprocessing did.
+        """
+        encoder = cls()._set_categories(list(classes))
+        encoder.has_other = False
+        return encoder
+
+    def _set_categories(self, categories):
+        self.categories_ = np.array(categories, dtype=object)
+        self.index_ = {c: i for i, c in enumerate(categories)}
+        return self
+
+    @property
+    def other_code(self):
+        """Code of rare and unseen values."""
+        return len(self.categories_) if self.has_other else 0
+
+    @property
+    def classes_(self):
+        return np.append(self.categories_, OTHER) if self.has_other else self.categories_
+
+    def encode(self, value):
+        """Code for a single value."""
+        return self.index_.get(value, self.other_code)
+
+    def transform(self, values):
+        codes = pd.Categorical(values, categories=self.categories_).codes.astype(np.int16)
+        codes[codes < 0] = self.other_code
+        return codes
+
+    def fit_transform(self, values):
+        return self.fit(values).transform(values)
+
+    def inverse_transform(self, codes):
+        return self.classes_[np.asarray(codes)]
+
+    def known(self, values):
+        """Mask of values that have their own code (not in the OTHER bucket)."""
+        return pd.Series(values).isin(self.index_).to_numpy()
+
+
+def as_category_encoder(encoder):
+    """Accepts a CategoryEncoder or a fitted LabelEncoder (older model artifacts)."""
+    if encoder is None or isinstance(encoder, CategoryEncoder):
+        return encoder
+    return CategoryEncoder.from_classes(encoder.classes_)
+
+
+def load_category_encoder(path):
+    return as_category_encoder(joblib.load(path))
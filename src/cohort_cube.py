@@ -0,0 +1,331 @@
+"""Pre-aggregated cohort cube over scored results.
+
+Every scored patient is added to all 16 roll-up cells of its
+(Occupation, BMI, Age Band, Period) combination, with '*' standing for
+"all" on a dimension. Any slice of the population is then one dict lookup,
+however many results have been ingested. Cells hold per-class counts, a
+sleep-score histogram and the score sum, so they can be added to
+incrementally and merged without revisiting the raw rows.
+
+Build or extend the cube from a scored dataset (only rows not ingested
+before are scored):
+    python3 src/cohort_cube.py --data data/raw/Sleep_health_and_lifestyle_dataset.csv
+
+The dashboard appends each result it scores as a small delta file next to
+the cube (record()); load() folds pending deltas in and save() deletes the
+ones it folded. Every rewrite of the cube file (this CLI, or record() once
+COMPACT_AFTER deltas are pending) reloads from disk and saves under a file
+lock, so no writer can overwrite results another added.
+"""
+import os
+import time
+import uuid
+import contextlib
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+import argparse
+import threading
+import itertools
+import datetime
+import joblib
+import numpy as np
+import pandas as pd
+from sleep_core import encode_batch, split_blood_pressure, sleep_score, validate_override, predict, load_artifacts
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CUBE_PATH = os.path.join(BASE_DIR, 'data', 'cohort_cube.pkl')
+
+ALL = '*'
+DIMENSIONS = ['Occupation', 'BMI', 'Age Band', 'Period']
+CLASSES = ['Healthy', 'Insomnia', 'Sleep Apnea']
+AGE_EDGES = [0, 30, 40, 50, 60, np.inf]
+AGE_BANDS = ['<30', '30-39', '40-49', '50-59', '60+']
+SCORE_EDGES = np.arange(0, 101, 10)  # 10 bins; a score of 100 lands in the last one
+# Pending delta files that make record() fold them into the cube file
+COMPACT_AFTER = 100
+
+
+def delta_dir(path=CUBE_PATH):
+    """Directory of results recorded against the cube at `path` but not yet saved into it."""
+    return os.path.splitext(path)[0] + '_deltas'
+
+
+@contextlib.contextmanager
+def cube_lock(path=CUBE_PATH, blocking=True):
+    """Exclusive lock for rewriting the cube at `path`; yields False if non-blocking and held elsewhere."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.lock', 'a+b') as f:
+        try:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if blocking:
+                raise
+            yield False
+            return
+        yield True  # Closing the file releases the lock
+
+
+def compact(path=CUBE_PATH, blocking=True):
+    """Folds pending delta files into the cube file; returns False if another writer holds the lock."""
+    with cube_lock(path, blocking) as locked:
+        if locked:
+            CohortCube.load(path).save(path)
+        return locked
+
+
+def age_band(age):
+    return pd.cut(pd.Series(age), AGE_EDGES, right=False, labels=AGE_BANDS).astype(str).to_numpy()
+
+
+def period(timestamps):
+    """Week (its Monday, as YYYY-MM-DD) each timestamp falls in."""
+    ts = pd.to_datetime(pd.Series(timestamps))
+    return (ts - pd.to_timedelta(ts.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d').to_numpy()
+
+
+class CohortCube:
+    """Dict of roll-up cells: (occupation, bmi, age band, period) -> measure vector."""
+
+    def __init__(self, classes=CLASSES):
+        self.classes = list(classes)
+        self.cells = {}
+        self.sources = {}  # dataset path -> rows ingested so far
+        self.folded = set()  # delta files already counted in cells
+        self._lock = threading.Lock()
+        self._stamp = None  # of the cube file this was loaded from
+        n_bins = len(SCORE_EDGES) - 1
+        self._hist = slice(len(self.classes), len(self.classes) + n_bins)
+        self._width = len(self.classes) + n_bins + 1  # class counts, score histogram, score sum
+
+    def _measures(self, prediction, score):
+        prediction = np.asarray(prediction)
+        score = np.asarray(score, dtype=float)
+        m = np.zeros((len(score), self._width))
+        for k, label in enumerate(self.classes):
+            m[:, k] = prediction == label
+        bins = np.clip(np.digitize(score, SCORE_EDGES) - 1, 0, len(SCORE_EDGES) - 2)
+        m[np.arange(len(score)), self._hist.start + bins] = 1
+        m[:, -1] = score
+        return m
+
+    def ingest(self, results):
+        """Adds scored results: a DataFrame with Occupation, BMI, Age, Prediction, Score, Timestamp."""
+        if not len(results):
+            return
+        keys = pd.DataFrame({
+            'Occupation': results['Occupation'].astype(str).to_numpy(),
+            'BMI': results['BMI'].astype(str).to_numpy(),
+            'Age Band': age_band(results['Age']),
+            'Period': period(results['Timestamp']),
+        })
+        measures = pd.DataFrame(self._measures(results['Prediction'], results['Score']))
+        updates = []
+        for keep in itertools.product([True, False], repeat=len(DIMENSIONS)):
+            dims = [d for d, k in zip(DIMENSIONS, keep) if k]
+            if dims:
+                grouped = measures.groupby([keys[d] for d in dims]).sum()
+                index = grouped.index if len(dims) > 1 else [(v,) for v in grouped.index]
+            else:
+                grouped, index = measures.sum().to_frame().T, [()]
+            for values, row in zip(index, grouped.to_numpy()):
+                it = iter(values)
+                updates.append((tuple(next(it) if k else ALL for k in keep), row))
+        with self._lock:
+            for key, row in updates:
+                if key in self.cells:
+                    self.cells[key] += row
+                else:
+                    self.cells[key] = row.copy()
+
+    def add(self, occupation, bmi, age, prediction, score, timestamp=None):
+        """Adds one scored result (16 cell updates)."""
+        row = self._measures([prediction], [score])[0]
+        values = (str(occupation), str(bmi), age_band([age])[0], period([timestamp or datetime.datetime.now()])[0])
+        with self._lock:
+            for keep in itertools.product([True, False], repeat=len(DIMENSIONS)):
+                key = tuple(v if k else ALL for v, k in zip(values, keep))
+                if key in self.cells:
+                    self.cells[key] += row
+                else:
+                    self.cells[key] = row.copy()
+
+    def record(self, occupation, bmi, age, prediction, score, timestamp=None, path=CUBE_PATH):
+        """Adds one scored result and appends it to the delta directory of the cube at `path`."""
+        timestamp = timestamp or datetime.datetime.now()
+        self.add(occupation, bmi, age, prediction, score, timestamp)
+        deltas = delta_dir(path)
+        os.makedirs(deltas, exist_ok=True)
+        name = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.pkl"
+        tmp = os.path.join(deltas, '.' + name + '.tmp')
+        joblib.dump({'Occupation': occupation, 'BMI': bmi, 'Age': age, 'Prediction': prediction,
+                     'Score': score, 'Timestamp': timestamp}, tmp)
+        os.replace(tmp, os.path.join(deltas, name))
+        with self._lock:
+            self.folded.add(name)
+        if len(_delta_names(path)) >= COMPACT_AFTER:
+            # Skipped while another writer holds the lock; the next record() retries
+            compact(path, blocking=False)
+
+    def refresh(self, path=CUBE_PATH):
+        """This cube brought up to date with the cube at `path`.
+
+        Results other processes recorded since are folded in place, reading
+        only their new delta files; after a rewrite of the cube file (e.g. a
+        compaction) the cube is loaded again.
+        """
+        if _stamp(path) != self._stamp:
+            return CohortCube.load(path)
+        try:
+            for name in _delta_names(path):
+                if name not in self.folded:
+                    self._fold(path, name)
+        except FileNotFoundError:
+            return CohortCube.load(path)  # Compacted meanwhile
+        return self
+
+    def cell(self, occupation=ALL, bmi=ALL, age_band=ALL, period=ALL):
+        """Summary of one slice: counts, prevalence, mean score and score histogram."""
+        row = self.cells.get((occupation, bmi, age_band, period))
+        if row is None:
+            row = np.zeros(self._width)
+        counts = row[:len(self.classes)]
+        n = counts.sum()
+        return {
+            'n': int(n),
+            'counts': dict(zip(self.classes, counts.astype(int).tolist())),
+            'prevalence': dict(zip(self.classes, (counts / n if n else np.zeros(len(counts))).tolist())),
+            'mean_score': float(row[-1] / n) if n else float('nan'),
+            'score_hist': row[self._hist].astype(int),
+        }
+
+    def values(self, dimension):
+        """Observed values of a dimension (from its single-dimension roll-up cells)."""
+        i = DIMENSIONS.index(dimension)
+        return sorted(key[i] for key in self.cells
+                      if key[i] != ALL and all(v == ALL for j, v in enumerate(key) if j != i))
+
+    def breakdown(self, dimension, **filters):
+        """One row per value of `dimension` within the filtered slice."""
+        arg = dimension.lower().replace(' ', '_')
+        rows = []
+        for value in self.values(dimension):
+            c = self.cell(**{**filters, arg: value})
+            if c['n']:
+                rows.append({dimension: value, 'n': c['n'], 'Mean Score': c['mean_score'],
+                             **{f'{k} %': 100 * v for k, v in c['prevalence'].items()}})
+        return pd.DataFrame(rows)
+
+    def save(self, path=CUBE_PATH):
+        """Writes the cells as plain data (atomically, so readers never see a partial file).
+
+        Delta files folded into the cells are then deleted. The saved state
+        lists them, so a crash before the deletes cannot count them twice.
+        Callers hold cube_lock() from load() to save().
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            folded = set(self.folded)
+            joblib.dump({'classes': self.classes, 'cells': self.cells, 'sources': self.sources,
+                         'folded': folded}, path + '.tmp')
+        os.replace(path + '.tmp', path)
+        for name in folded:
+            try:
+                os.remove(os.path.join(delta_dir(path), name))
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def load(cls, path=CUBE_PATH):
+        """Loads the saved cube and folds in the results recorded since it was saved.
+
+        Reads without the lock: if the cube file is rewritten meanwhile (and
+        the deltas it folded deleted), the load starts over.
+        """
+        while True:
+            stamp = _stamp(path)
+            cube = cls()
+            if stamp is not None:
+                state = joblib.load(path)
+                cube = cls(state['classes'])
+                cube.cells, cube.sources = state['cells'], state['sources']
+                cube.folded = set(state.get('folded', ()))
+            cube._stamp = stamp
+            names = _delta_names(path)
+            # Names whose files are gone were deleted by the save that folded them
+            cube.folded &= set(names)
+            try:
+                for name in names:
+                    if name not in cube.folded:
+                        cube._fold(path, name)
+            except FileNotFoundError:
+                continue
+            if _stamp(path) == stamp:
+                return cube
+
+    def _fold(self, path, name):
+        d = joblib.load(os.path.join(delta_dir(path), name))
+        self.add(d['Occupation'], d['BMI'], d['Age'], d['Prediction'], d['Score'], d['Timestamp'])
+        with self._lock:
+            self.folded.add(name)
+
+
+def _stamp(path):
+    """Identifies one version of the cube file (None if there is none)."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def _delta_names(path=CUBE_PATH):
+    deltas = delta_dir(path)
+    if not os.path.isdir(deltas):
+        return []
+    return sorted(n for n in os.listdir(deltas) if n.endswith('.pkl'))
+
+
+def score_dataset(raw, model, le, occupation_encoder):
+    """Scores raw patient rows (dataset columns) the way the dashboard does."""
+    predicted, _ = predict(model, le, encode_batch(raw, occupation_encoder))
+    prediction = [validate_override(p, d, s, q, h) for p, d, s, q, h in zip(
+        predicted, raw['Sleep Duration'], raw['Stress Level'], raw['Quality of Sleep'], raw['Heart Rate'])]
+    score = sleep_score(raw['Sleep Duration'].to_numpy(), raw['Quality of Sleep'].to_numpy(),
+                        raw['Stress Level'].to_numpy(), raw['Physical Activity Level'].to_numpy(),
+                        raw['Heart Rate'].to_numpy())
+    return pd.DataFrame({'Occupation': raw['Occupation'].to_numpy(), 'BMI': raw['BMI Category'].to_numpy(),
+                         'Age': raw['Age'].to_numpy(), 'Prediction': prediction, 'Score': score})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or extend the cohort analytics cube.")
+    parser.add_argument('--data', required=True, help="Patient CSV in the dataset's format (optional Timestamp column)")
+    parser.add_argument('--cube', default=CUBE_PATH)
+    parser.add_argument('--rebuild', action='store_true', help="Start from an empty cube")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args()
+
+    model, le, occupation_encoder = load_artifacts()
+    with cube_lock(args.cube):
+        cube = CohortCube() if args.rebuild else CohortCube.load(args.cube)
+        source = os.path.abspath(args.data)
+        done = cube.sources.get(source, 0)
+        added = 0
+        # Rows already ingested from this file are skipped, so a growing export is scored once
+        for raw in pd.read_csv(args.data, skiprows=range(1, done + 1), chunksize=args.chunksize):
+            if not len(raw):
+                continue
+            results = score_dataset(split_blood_pressure(raw), model, le, occupation_encoder)
+            results['Timestamp'] = raw['Timestamp'].to_numpy() if 'Timestamp' in raw else datetime.datetime.now()
+            cube.ingest(results)
+            added += len(raw)
+        cube.sources[source] = done + added
+        cube.save(args.cube)
+    print(f"Ingested {added} new rows ({done + added} total from {args.data}); {len(cube.cells)} cells in {args.cube}")
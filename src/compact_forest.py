@@ -0,0 +1,97 @@
+"""Compact, numpy-only forest: float32 thresholds and uint8 leaf probabilities."""
+import numpy as np
+
+
+class CompactForest:
+    """Flattened array form of a fitted RandomForestClassifier.
+
+    All trees share one set of node arrays. Thresholds are stored as float32,
+    rounded down so that `x <= threshold` gives the same branch as sklearn for
+    every float32 input (sklearn casts inputs to float32 before comparing).
+    Leaf class probabilities are quantized to uint8 (1/255 steps), so
+    predict_proba is approximate and predict can differ on near-ties.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, feature_names):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for est in forest.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            leaf = tree.children_left == -1
+            roots.append(offset)
+            features.append(np.where(leaf, 0, tree.feature))
+            thr = tree.threshold.astype(np.float32)
+            # float32 rounding may go above the float64 threshold; step back down
+            thr = np.where(thr > tree.threshold, np.nextafter(thr, np.float32(-np.inf)), thr)
+            thresholds.append(thr)
+            # Leaves point to themselves so traversal can run a fixed number of steps
+            idx = np.arange(n)
+            lefts.append(np.where(leaf, idx, tree.children_left) + offset)
+            rights.append(np.where(leaf, idx, tree.children_right) + offset)
+            proba = tree.value[:, 0, :]
+            proba = proba / proba.sum(axis=1, keepdims=True)
+            values.append(np.round(proba * 255).astype(np.uint8))
+            offset += n
+
+        index_dtype = np.int32 if offset > np.iinfo(np.int16).max else np.int16
+        return cls(
+            feature=np.concatenate(features).astype(np.uint8),
+            threshold=np.concatenate(thresholds).astype(np.float32),
+            left=np.concatenate(lefts).astype(index_dtype),
+            right=np.concatenate(rights).astype(index_dtype),
+            value=np.concatenate(values),
+            roots=np.array(roots, dtype=np.int32),
+            classes=np.asarray(forest.classes_),
+            feature_names=np.asarray(getattr(forest, 'feature_names_in_', []), dtype=object),
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Returns the leaf node index reached in every tree, shape (n_samples, n_trees)."""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).astype(np.int64)
+        while True:
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            nxt = np.where(go_left, self.left[node], self.right[node])
+            if np.array_equal(nxt, node):
+                return node
+            node = nxt
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        return self.value[leaves].astype(np.float32).sum(axis=1) / (255.0 * self.n_estimators)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path):
+        np.savez_compressed(
+            path, feature=self.feature, threshold=self.threshold, left=self.left,
+            right=self.right, value=self.value, roots=self.roots,
+            classes=self.classes_, feature_names=self.feature_names_in_.astype(str),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=False)
+        return cls(
+            feature=data['feature'], threshold=data['threshold'], left=data['left'],
+            right=data['right'], value=data['value'], roots=data['roots'],
+            classes=data['classes'], feature_names=data['feature_names'].astype(object),
+        )
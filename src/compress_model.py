@@ -0,0 +1,184 @@
+"""Post-training compression of the serving forest.
+
+Three stages, each reported on the fixed test split:
+1. Cost-complexity pruning: refit with the largest ccp_alpha that keeps
+   validation accuracy within tolerance of the unpruned forest.
+   The strength is chosen on a validation slice of the training split; the
+   pruned forest is then fit on the whole training split.
+2. Ensemble selection: greedily keep the smallest subset of the pruned
+   forest's trees whose averaged vote stays within tolerance. Each tree
+   votes only on the training rows left out of its bootstrap sample
+   (out-of-bag), so the selection needs no held-out rows and the kept
+   trees are the fitted ones.
+3. Compact storage: float32 thresholds and uint8 leaf probabilities
+   (see compact_forest.py).
+"""
+import argparse
+import io
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeClassifier
+from compact_forest import CompactForest
+from train_model import BASE_DIR, load_training_data, split_data
+from model_bundle import dump_atomic
+
+
+def choose_ccp_alpha(X_fit, y_fit, X_val, y_val, tolerance, n_candidates=12):
+    """Returns the largest pruning strength whose forest stays within tolerance."""
+    path = DecisionTreeClassifier(random_state=42).cost_complexity_pruning_path(X_fit, y_fit)
+    alphas = np.unique(np.quantile(path.ccp_alphas[:-1], np.linspace(0, 1, n_candidates)))
+    results = []
+    for alpha in alphas:
+        rf = RandomForestClassifier(n_estimators=100, random_state=42, ccp_alpha=alpha)
+        rf.fit(X_fit, y_fit)
+        results.append((alpha, accuracy_score(y_val, rf.predict(X_val))))
+    best = max(acc for _, acc in results)
+    return max(alpha for alpha, acc in results if acc >= best - tolerance)
+
+
+def vote_accuracy(avg_proba, classes, y):
+    return np.mean(classes[avg_proba.argmax(axis=1)] == y)
+
+
+def select_trees(forest, X, y, tolerance, min_trees=5, samples=None):
+    """Greedy forward selection of trees (Caruana et al.).
+
+    Stops at the first subset whose averaged probabilities score within
+    tolerance of the full forest. Ties are broken by mean probability on the
+    true class. With samples (each tree's bootstrap row indices into X, as
+    forest.estimators_samples_), X and y are the training rows and a tree
+    only votes on the rows it did not see; rows no selected tree can vote
+    on are left out of the score. Returns the selected tree indices.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    classes = forest.classes_
+    probas = np.stack([est.predict_proba(X) for est in forest.estimators_])
+    votes = np.ones(probas.shape[:2])
+    if samples is not None:
+        for i, rows in enumerate(samples):
+            votes[i, rows] = 0
+    probas *= votes[..., None]
+    true_idx = np.searchsorted(classes, y)
+
+    def accuracy(total, count):
+        covered = count > 0
+        return vote_accuracy(total[covered], classes, y[covered]) if covered.any() else 0.0
+
+    target = accuracy(probas.sum(axis=0), votes.sum(axis=0)) - tolerance
+    selected, remaining = [], list(range(len(probas)))
+    total, count = np.zeros_like(probas[0]), np.zeros(len(y))
+    while remaining:
+        def score(i):
+            t, c = total + probas[i], count + votes[i]
+            covered = c > 0
+            true_proba = t[covered, true_idx[covered]] / c[covered] if covered.any() else np.zeros(1)
+            return accuracy(t, c), true_proba.mean()
+        best = max(remaining, key=score)
+        selected.append(best)
+        remaining.remove(best)
+        total += probas[best]
+        count += votes[best]
+        if len(selected) >= min_trees and accuracy(total, count) >= target:
+            break
+    return selected
+
+
+def subset_forest(forest, selected):
+    """A forest holding only the trees at the `selected` indices."""
+    small = RandomForestClassifier(**forest.get_params())
+    for attr in ('classes_', 'n_classes_', 'n_outputs_', 'n_features_in_', 'feature_names_in_', 'estimator_'):
+        if hasattr(forest, attr):
+            setattr(small, attr, getattr(forest, attr))
+    small.estimators_ = [forest.estimators_[i] for i in selected]
+    small.n_estimators = len(selected)
+    return small
+
+
+def pickled_size(model):
+    buf = io.BytesIO()
+    joblib.dump(model, buf)
+    return buf.tell()
+
+
+def latency_ms(model, X, repeats=50):
+    """Median single-row latency and batch throughput latency, in ms."""
+    row = X.iloc[[0]] if isinstance(model, RandomForestClassifier) else X.iloc[[0]].to_numpy()
+    batch = X if isinstance(model, RandomForestClassifier) else X.to_numpy()
+    single = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(row)
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    model.predict(batch)
+    return np.median(single) * 1000, (time.perf_counter() - start) * 1000
+
+
+def compress(tolerance=0.01, candidate=False, version=None):
+    """Compresses a forest trained like bundle `version` (default: the active one)."""
+    from sleep_core import load_artifacts
+
+    compact_path = os.path.join(BASE_DIR, 'models', 'sleep_model_compact.npz')
+
+    # The deployed encoders, so the compressed forest can be scored next to the deployed one
+    deployed, le, occupation_encoder = load_artifacts(version=version)
+    X, y, _, _ = load_training_data(le=le, occupation_encoder=occupation_encoder)
+    if deployed is not None:
+        X = X[list(deployed.feature_names_in_)]
+    X_train, X_test, y_train, y_test = split_data(X, y)
+    # Pruning strength is tuned on a slice of the training data only
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.25, random_state=42)
+
+    print("Choosing cost-complexity pruning strength...")
+    alpha = choose_ccp_alpha(X_fit, y_fit, X_val, y_val, tolerance)
+    print(f"ccp_alpha = {alpha:.5f}")
+    pruned = RandomForestClassifier(n_estimators=100, random_state=42, ccp_alpha=alpha).fit(X_train, y_train)
+
+    print("Selecting trees on out-of-bag votes...")
+    trees = select_trees(pruned, X_train, y_train, tolerance, samples=pruned.estimators_samples_)
+    print(f"Kept {len(trees)} of {pruned.n_estimators} trees")
+    selected = subset_forest(pruned, trees)
+    compact = CompactForest.from_sklearn(selected)
+    compact.save(compact_path)
+
+    stages = [('Pruned', pruned), ('Pruned + selected', selected), ('Compact (float32/uint8)', compact)]
+    if deployed is not None:
+        stages.insert(0, ('Deployed', deployed))
+
+    rows = []
+    for name, model in stages:
+        single, batch = latency_ms(model, X_test)
+        pred = model.predict(X_test if isinstance(model, RandomForestClassifier) else X_test.to_numpy())
+        n_trees = model.n_estimators
+        nodes = sum(e.tree_.node_count for e in model.estimators_) if hasattr(model, 'estimators_') else len(model.feature)
+        size = os.path.getsize(compact_path) if model is compact else pickled_size(model)
+        rows.append({'Model': name, 'Trees': n_trees, 'Nodes': nodes,
+                     'Accuracy': accuracy_score(y_test, pred), 'Size (KB)': size / 1024,
+                     'Single-row (ms)': single, f'Batch of {len(X_test)} (ms)': batch})
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    print(f"Saved compact model to {compact_path}")
+    if candidate:
+        candidate_path = os.path.join(BASE_DIR, 'models', 'sleep_model_candidate.pkl')
+        dump_atomic(selected, candidate_path)
+        print(f"Saved pruned + selected forest to {candidate_path} for shadow scoring")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune, thin and compact the trained forest.")
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help="Allowed validation accuracy drop per stage (default 0.01)")
+    parser.add_argument('--candidate', action='store_true',
+                        help="Also save the pruned + selected forest as models/sleep_model_candidate.pkl")
+    parser.add_argument('--bundle', metavar='VERSION', help="Model bundle to compress (default: the active one)")
+    args = parser.parse_args()
+    compress(tolerance=args.tolerance, candidate=args.candidate, version=args.bundle)
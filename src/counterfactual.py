@@ -0,0 +1,255 @@
+"""Counterfactual search: the smallest lifestyle change that flips the forest's prediction.
+
+Only actionable inputs change (sleep duration and quality, stress, activity,
+steps); everything else about the patient is held fixed. A random forest is
+piecewise constant: along one feature its prediction can only change at a
+threshold some tree splits that feature on. So each actionable feature
+needs just one candidate value per interval between its split thresholds:
+the value in that interval nearest the patient's own. The search lays out
+every combination of up to max_changes such values, sorts the combinations
+by cost (the sum of each change in units of ACTIONABLE's effort scale) and
+scores them in batches, cheapest first. The first flip found is therefore
+the cheapest, and most searches stop after a batch or two. Candidates are
+judged by the final diagnosis, i.e. after sleep_core's validate_override
+rules, so a change the rules would overrule never counts as a flip:
+
+    python3 src/counterfactual.py --data high_risk.csv --out counterfactuals.csv --workers 4
+
+Batch mode takes dataset columns (as the bundled CSV) and writes the n
+cheapest counterfactuals for every patient not already diagnosed as the
+target class.
+"""
+import os
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# Model column: (lowest, highest, resolution, effort scale: a change of this size costs 1)
+ACTIONABLE = {
+    'Sleep Duration': (5.0, 10.0, 0.1, 1.0),
+    'Quality of Sleep': (1, 10, 1, 2),
+    'Stress Level': (1, 10, 1, 2),
+    'Physical Activity Level': (0, 120, 5, 30),
+    'Daily Steps': (0, 20000, 100, 3000),
+}
+# Model columns validate_override reads, in its argument order
+RULE_INPUTS = ['Sleep Duration', 'Stress Level', 'Quality of Sleep', 'Heart Rate']
+
+
+def split_thresholds(model, features):
+    """Sorted unique split thresholds of each feature across the forest's trees."""
+    columns = list(model.feature_names_in_)
+    found = {name: [] for name in features}
+    for tree in model.estimators_:
+        t = tree.tree_
+        for name in features:
+            found[name].append(t.threshold[t.feature == columns.index(name)])
+    return {name: np.unique(np.concatenate(parts)) for name, parts in found.items()}
+
+
+class CounterfactualSearch:
+    """Finds minimal-cost changes to ACTIONABLE features that make the model predict `target`."""
+
+    def __init__(self, model, le, actionable=ACTIONABLE, max_changes=3, batch_size=256, max_batch_size=16384):
+        self.model = model
+        self.classes = list(le.classes_)
+        self.columns = list(model.feature_names_in_)
+        self.actionable = {k: v for k, v in actionable.items() if k in self.columns}
+        self.max_changes = max_changes
+        self.batch_size = batch_size          # First batch; each later one doubles, up to max_batch_size
+        self.max_batch_size = max_batch_size
+        self.thresholds = split_thresholds(model, list(self.actionable))
+        self._rule_inputs = [self.columns.index(name) for name in RULE_INPUTS]
+
+    def diagnose(self, X, proba):
+        """Final diagnoses of encoded rows (model columns, as an array) given the forest's probabilities."""
+        from sleep_core import validate_overrides
+        return validate_overrides(np.asarray(self.classes, dtype=object)[proba.argmax(axis=1)],
+                                  *(X[:, i] for i in self._rule_inputs))
+
+    def _candidates(self, name, current):
+        """One value per threshold interval (nearest the current value), excluding the current interval."""
+        low, high, res, scale = self.actionable[name]
+        edges = self.thresholds[name]
+        lower, upper = np.r_[-np.inf, edges], np.r_[edges, np.inf]
+        above = lower >= current  # Interval lies entirely above the current value
+        with np.errstate(invalid='ignore'):
+            # Trees send x <= threshold left, so an interval is (lower, upper]
+            up = np.floor(lower / res + 1) * res
+            up = np.where(np.round(up, 9) <= lower, up + res, up)
+            down = np.floor(upper / res) * res
+            down = np.where(np.round(down, 9) > upper, down - res, down)
+        values = np.round(np.where(above, up, down), 9)
+        moved = above | (upper < current)
+        keep = moved & (values > lower) & (values <= upper) & (values >= low) & (values <= high)
+        values = np.unique(values[keep])
+        return values, np.abs(values - current) / scale
+
+    def _combinations(self, x):
+        """All combinations of up to max_changes feature moves: (value matrix, cost, changed count)."""
+        moves = [(j, *self._candidates(name, x[self.columns.index(name)]))
+                 for j, name in enumerate(self.actionable)]
+        moves = [m for m in moves if len(m[1])]
+        current = np.array([x[self.columns.index(name)] for name in self.actionable], dtype=float)
+        blocks, costs, counts = [], [], []
+        for k in range(1, min(self.max_changes, len(moves)) + 1):
+            for subset in itertools.combinations(moves, k):
+                grid = [g.ravel() for g in np.meshgrid(*[np.arange(len(m[1])) for m in subset], indexing='ij')]
+                block = np.repeat(current[None, :], len(grid[0]), axis=0)
+                cost = np.zeros(len(grid[0]))
+                for (j, values, move_cost), index in zip(subset, grid):
+                    block[:, j] = values[index]
+                    cost += move_cost[index]
+                blocks.append(block)
+                costs.append(cost)
+                counts.append(np.full(len(cost), k))
+        if not blocks:
+            return np.empty((0, len(current))), np.empty(0), np.empty(0)
+        return np.concatenate(blocks), np.concatenate(costs), np.concatenate(counts)
+
+    def search(self, X, target='Healthy', n=3, max_cost=None):
+        """Counterfactuals for one encoded patient (a single-row frame in model columns).
+
+        Returns the current prediction, up to n counterfactuals (cheapest
+        first; each changes a feature set that is not a superset of a cheaper
+        one's) and how many candidates were scored.
+        """
+        x = X[self.columns].to_numpy(dtype=float)[0]
+        target_code = self.classes.index(target)
+        proba = self.model.predict_proba(X[self.columns])[0]
+        prediction = self.diagnose(x[None, :], proba[None, :])[0]
+        result = {'prediction': prediction, 'probability': float(proba[target_code]),
+                  'counterfactuals': [], 'evaluated': 0}
+        if prediction == target:
+            return result
+
+        values, cost, count = self._combinations(x)
+        if max_cost is not None:
+            values, cost, count = values[cost <= max_cost], cost[cost <= max_cost], count[cost <= max_cost]
+        order = np.lexsort((count, cost))
+        names = list(self.actionable)
+        index = [self.columns.index(name) for name in names]
+        found = []
+        start, size = 0, self.batch_size
+        while start < len(order):
+            rows = order[start:start + size]
+            start, size = start + size, min(2 * size, self.max_batch_size)
+            batch = np.repeat(x[None, :], len(rows), axis=0)
+            batch[:, index] = values[rows]
+            p = self.model.predict_proba(pd.DataFrame(batch, columns=self.columns))
+            result['evaluated'] += len(rows)
+            for i in np.flatnonzero(self.diagnose(batch, p) == target):
+                changes = {names[j]: (self._typed(names[j], x[index[j]]), self._typed(names[j], values[rows[i], j]))
+                           for j in range(len(names)) if values[rows[i], j] != x[index[j]]}
+                if any(set(f['changes']) <= set(changes) for f in found):
+                    continue  # A cheaper change to a subset of these features already works
+                found.append({'changes': changes, 'cost': float(cost[rows[i]]), 'probability': float(p[i, target_code])})
+                if len(found) == n:
+                    break
+            if len(found) == n:
+                break
+        result['counterfactuals'] = found
+        return result
+
+    def _typed(self, name, value):
+        return int(round(value)) if isinstance(self.actionable[name][2], int) else round(float(value), 2)
+
+
+def describe(changes):
+    """'Sleep Duration 6.1 -> 7.2; Stress Level 7 -> 5'"""
+    return '; '.join(f"{name} {old} -> {new}" for name, (old, new) in changes.items())
+
+
+# --- Batch mode ---
+_worker = {}
+
+
+def _init_worker(models_dir, max_changes):
+    from sleep_core import load_artifacts
+    model, le, occupation_encoder = load_artifacts(models_dir)
+    _worker['search'] = CounterfactualSearch(model, le, max_changes=max_changes)
+
+
+def _search_rows(task):
+    X, target, n, max_cost = task
+    search = _worker['search']
+    return [search.search(X.iloc[[i]], target, n, max_cost) for i in range(len(X))]
+
+
+def counterfactual_table(raw, target='Healthy', n=3, max_changes=3, max_cost=None, workers=None,
+                         models_dir=None, chunk=64):
+    """Counterfactuals for every patient in raw (dataset columns) not diagnosed as target.
+
+    One output row per counterfactual (Rank 1 is the cheapest); patients with
+    no counterfactual within max_cost get a single row with empty Changes.
+    """
+    from sleep_core import MODELS_DIR, load_artifacts, encode_batch, split_blood_pressure, validate_overrides
+
+    models_dir = models_dir or MODELS_DIR
+    model, le, occupation_encoder = load_artifacts(models_dir)
+    if 'Blood Pressure' in raw:
+        raw = split_blood_pressure(raw)
+    raw = raw.reset_index(drop=True)
+    X = encode_batch(raw, occupation_encoder)
+    for col in model.feature_names_in_:
+        if col not in X:  # Optional hypnogram/HRV features, when the export has them
+            X[col] = raw[col].to_numpy() if col in raw else np.nan
+    X = X[list(model.feature_names_in_)]
+    # The diagnosis after validate_override, as the dashboard shows it
+    predicted = validate_overrides(le.inverse_transform(model.predict(X)), *(X[name] for name in RULE_INPUTS))
+    todo = np.flatnonzero(predicted != target)
+
+    tasks = [(X.iloc[todo[i:i + chunk]], target, n, max_cost) for i in range(0, len(todo), chunk)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(models_dir, max_changes)
+        parts = list(map(_search_rows, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(models_dir, max_changes)) as pool:
+            parts = list(pool.map(_search_rows, tasks))
+
+    rows = []
+    for i, result in zip(todo, itertools.chain.from_iterable(parts)):
+        patient = {'Row': i, 'Person ID': raw.at[i, 'Person ID'] if 'Person ID' in raw else i,
+                   'Predicted': result['prediction'], 'Target': target}
+        for rank, cf in enumerate(result['counterfactuals'], 1):
+            rows.append({**patient, 'Rank': rank, 'Changes': describe(cf['changes']), 'Cost': round(cf['cost'], 3),
+                         'Probability': round(cf['probability'], 3),
+                         **{name: new for name, (_, new) in cf['changes'].items()}})
+        if not result['counterfactuals']:
+            rows.append({**patient, 'Rank': None, 'Changes': '', 'Cost': None, 'Probability': None})
+    columns = ['Row', 'Person ID', 'Predicted', 'Target', 'Rank', 'Changes', 'Cost', 'Probability'] + list(ACTIONABLE)
+    table = pd.DataFrame(rows).reindex(columns=columns)
+    table['Rank'] = table['Rank'].astype('Int64')
+    return table
+
+
+if __name__ == "__main__":
+    from train_model import DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Find minimal lifestyle changes that flip each patient's prediction.")
+    parser.add_argument('--data', default=DATA_PATH, help="Patients with the dataset's columns (default: the bundled CSV)")
+    parser.add_argument('--target', default='Healthy', help="Class the changes should reach")
+    parser.add_argument('--n', type=int, default=3, help="Counterfactuals per patient")
+    parser.add_argument('--max-changes', type=int, default=3, help="Most features changed at once")
+    parser.add_argument('--max-cost', type=float, default=None, help="Skip changes costlier than this")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all CPUs)")
+    parser.add_argument('--out', help="Write the table to this CSV")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = counterfactual_table(pd.read_csv(args.data), args.target, args.n, args.max_changes, args.max_cost,
+                                 args.workers)
+    elapsed = time.perf_counter() - start
+    patients = table['Row'].nunique()
+    print(f"Searched {patients} patients in {elapsed:.1f}s ({1000 * elapsed / max(patients, 1):.0f} ms each); "
+          f"{table.loc[table['Rank'] == 1, 'Row'].nunique()} have a counterfactual")
+    if args.out:
+        table.to_csv(args.out, index=False)
+        print(f"Saved to {args.out}")
+    else:
+        print(table.head(20).to_string(index=False))
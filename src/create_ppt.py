@@ -1,91 +1,412 @@
+"""Project presentation deck built from live metrics.
+
+Every number in the deck is measured when it is built, none are typed in:
+the served model's metrics on the evaluation data's test split and its
+feature importances, the cached out-of-fold validation of the reference
+training recipe (src/evaluation.py), serving-engine benchmarks
+(src/parity_check.py) and population aggregates from the cohort cube
+(src/cohort_cube.py). Cross-validation retrains the recipe, not a clinic's
+model, so its slides are labelled as the reference recipe's in every deck. Each deck also gets a Markdown summary with the same
+numbers for written reports.
+
+Charts are rendered with matplotlib into data/deck_cache/, named by a hash
+of their contents, so a chart whose numbers have not changed is reused
+across runs and across clinics. Missing charts for all slides of all decks
+are rendered in one process pool, and engine benchmarks are cached per
+model the same way:
+
+    python3 src/create_ppt.py                              # default model
+    python3 src/create_ppt.py --clinic north
+    python3 src/create_ppt.py --all-clinics --out-dir decks/ --workers 4
+
+Clinics are the clinic:<id> entries of models/tenants.json (see
+src/model_router.py). All decks share the cohort cube's population view.
+"""
+import os
+import io
+import json
+import time
+import hashlib
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from pptx import Presentation
 from pptx.util import Inches, Pt
-from pptx.dml.color import RGBColor
-from pptx.enum.text import PP_ALIGN
+from train_model import BASE_DIR, DATA_PATH, MODEL_PARAMS, load_training_data, split_data, evaluate
+from sleep_core import MODELS_DIR, load_artifacts
+
+CACHE_DIR = os.path.join(BASE_DIR, 'data', 'deck_cache')
+DEFAULT_DECK = 'Samsung_Sleep_Project_Presentation.pptx'
+COLORS = ['#4C78A8', '#F58518', '#E45756', '#72B7B2', '#54A24B']
+# Part of the benchmark cache key; bump when the measurement changes
+BENCHMARK_VERSION = 2
+
+
+# --- Metrics ---
+def model_key(model):
+    """Content hash of a fitted forest's trees, the cache key for its benchmarks."""
+    digest = hashlib.sha256()
+    for estimator in model.estimators_:
+        t = estimator.tree_
+        for array in (t.feature, t.threshold, t.children_left, t.children_right, t.value):
+            digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def model_facts(model, le, occupation_encoder, data_path=DATA_PATH):
+    """Metrics on the test split of data_path, and feature importances, of the served model."""
+    features = list(model.feature_names_in_)
+    X, y, _, _ = load_training_data(data_path, le, occupation_encoder)
+    _, X_test, _, y_test = split_data(X[features], y)
+    importances = sorted(zip(features, model.feature_importances_), key=lambda item: -item[1])
+    return {
+        'data': os.path.basename(data_path),
+        'n_features': len(features),
+        'n_trees': len(model.estimators_),
+        'training_rows': len(X),
+        'test_rows': len(X_test),
+        'test': {k: float(v) for k, v in evaluate(model, X_test, y_test).items()},
+        'importances': [(name, round(float(v), 4)) for name, v in importances],
+    }
+
+
+def validation_facts(data_path=DATA_PATH):
+    """Out-of-fold metrics of the reference training recipe (MODEL_PARAMS on data_path).
+
+    Cross-validated once per data version. They describe the recipe, not any
+    one deployed model.
+    """
+    from evaluation import out_of_fold
+
+    oof = out_of_fold(data_path)
+    metrics = oof.metrics()
+    per_class = metrics['per_class']
+    return {
+        'data': os.path.basename(data_path),
+        'n_trees': MODEL_PARAMS['n_estimators'],
+        'accuracy': float(metrics['accuracy']),
+        'macro_f1': float(metrics['macro_f1']),
+        'ece': oof.calibration().attrs['ece'],
+        'classes': [str(c) for c in oof.classes],
+        'confusion': oof.confusion().to_numpy().tolist(),
+        'precision': per_class['precision'].round(4).tolist(),
+        'recall': per_class['recall'].round(4).tolist(),
+    }
+
+
+def benchmark_facts(model, occupation_encoder, rows=5000, refresh=False, cache_dir=CACHE_DIR):
+    """Per-row latency and parity of each serving engine, cached per model."""
+    path = os.path.join(cache_dir, f'bench{BENCHMARK_VERSION}_{model_key(model)}_{rows}.json')
+    if os.path.exists(path) and not refresh:
+        with open(path) as f:
+            return json.load(f)
+    import pandas as pd
+    from parity_check import check, load_bundled, synthetic_patients
+
+    occupations = occupation_encoder.categories_ if occupation_encoder is not None else []
+    raw = pd.concat([load_bundled(), synthetic_patients(rows, occupations)], ignore_index=True)
+    # Engines are diffed on every row; shuffled so the per-row sample spans bundled and synthetic patients
+    raw = raw.sample(frac=1, random_state=0).reset_index(drop=True)
+    report = check(raw, model, occupation_encoder, reference_limit=200)
+    engines = [{'engine': r['Engine'], 'us_per_row': round(float(r['us/row']), 2), 'ok': bool(r['OK']),
+                'rows': int(r['Rows'])} for _, r in report.iterrows()]
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(engines, f)
+    os.replace(path + '.tmp', path)
+    return engines
+
+
+def cohort_facts(cube=None):
+    """Population prevalence and sleep scores from the cohort cube (None if it is empty)."""
+    from cohort_cube import CohortCube
+
+    cube = cube or CohortCube.load()
+    overall = cube.cell()
+    if not overall['n']:
+        return None
+    by_bmi, by_age = cube.breakdown('BMI'), cube.breakdown('Age Band')
+    prevalence = [f'{c} %' for c in cube.classes]
+    return {
+        'n': overall['n'],
+        'prevalence': overall['prevalence'],
+        'mean_score': overall['mean_score'],
+        'classes': cube.classes,
+        'by_bmi': {'labels': by_bmi['BMI'].tolist(), 'series': by_bmi[prevalence].round(2).to_dict('list')},
+        'by_age': {'labels': by_age['Age Band'].tolist(), 'series': by_age[prevalence].round(2).to_dict('list')},
+    }
+
+
+# --- Charts ---
+def chart_path(spec, cache_dir=CACHE_DIR):
+    """Cache file of a chart: its spec (kind, title and data) hashed."""
+    digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:20]
+    return os.path.join(cache_dir, f'chart_{digest}.png')
 
-def create_presentation():
+
+def _render_chart(task):
+    spec, path = task
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    kind, data = spec['kind'], spec['data']
+    fig, ax = plt.subplots(figsize=(6, 4.2), dpi=150)
+    if kind == 'barh':
+        ax.barh(data['labels'][::-1], data['values'][::-1], color=COLORS[0])
+        ax.set_xlabel(data.get('xlabel', ''))
+        if data.get('log'):
+            ax.set_xscale('log')
+    elif kind == 'bars':
+        x = np.arange(len(data['labels']))
+        width = 0.8 / len(data['series'])
+        for i, (name, values) in enumerate(data['series'].items()):
+            ax.bar(x + (i - (len(data['series']) - 1) / 2) * width, values, width, label=name,
+                   color=COLORS[i % len(COLORS)])
+        ax.set_xticks(x, data['labels'], rotation=30 if len(data['labels']) > 4 else 0, ha='right')
+        ax.set_ylabel(data.get('ylabel', ''))
+        if len(data['series']) > 1:
+            ax.legend(frameon=False)
+    elif kind == 'heatmap':
+        matrix = np.asarray(data['matrix'])
+        ax.imshow(matrix, cmap='Blues')
+        ax.set_xticks(range(len(data['labels'])), data['labels'])
+        ax.set_yticks(range(len(data['labels'])), data['labels'])
+        ax.set_xlabel('Predicted')
+        ax.set_ylabel('True')
+        for (i, j), v in np.ndenumerate(matrix):
+            ax.text(j, i, str(v), ha='center', va='center', color='white' if v > matrix.max() / 2 else 'black')
+    else:
+        raise ValueError(f"Unknown chart kind '{kind}'")
+    ax.set_title(spec['title'])
+    ax.spines[['top', 'right']].set_visible(False)
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    plt.close(fig)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def render_charts(specs, workers=None, refresh=False, cache_dir=CACHE_DIR):
+    """Renders the charts not already cached, in parallel; returns the number rendered."""
+    os.makedirs(cache_dir, exist_ok=True)
+    todo = {}
+    for spec in specs:
+        path = chart_path(spec, cache_dir)
+        if refresh or not os.path.exists(path):
+            todo[path] = (spec, path)
+    tasks = list(todo.values())
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    if workers == 1:
+        list(map(_render_chart, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_render_chart, tasks))
+    return len(tasks)
+
+
+# --- Slides ---
+def build_slides(facts):
+    """Slide list: {'title', 'bullets', 'chart' (spec or None)}."""
+    model, validation = facts['model'], facts['validation']
+    test = model['test']
+    top = [name for name, _ in model['importances'][:3]]
+    slides = [
+        {'title': "Problem Statement: The Silent Epidemic", 'chart': None, 'bullets': [
+            "• Sleep disorders like Insomnia and Sleep Apnea affect millions globally.",
+            "• Risks include cardiovascular disease, chronic fatigue, and reduced cognitive function.",
+            "• Current diagnosis is expensive, time-consuming, and requires clinical sleep studies.",
+            "• There is a critical gap for accessible, early screening tools."]},
+        {'title': "The Solution: AI-Driven Dashboard", 'chart': None, 'bullets': [
+            "• An intelligent, web-based application for instant sleep health assessment.",
+            f"• Uses Machine Learning to analyze {model['n_features']} key lifestyle and health markers.",
+            f"• Provides real-time risk classification: {', '.join(validation['classes'][:-1])}, "
+            f"or {validation['classes'][-1]}.",
+            "• Accessible anywhere, empowering users to take proactive health steps."]},
+        {'title': "Technical Architecture", 'chart': None, 'bullets': [
+            f"• Evaluation Data: {model['data']} ({model['training_rows']} patients).",
+            f"• Model: Random Forest Classifier ({model['n_trees']} trees, version {facts['version']}).",
+            "• Backend: Python with Scikit-learn for inference.",
+            "• Frontend: Streamlit for a responsive, interactive user interface.",
+            "• Deployment: Versioned, checksummed model bundles with rollback."]},
+        {'title': "Model Performance & Results", 'bullets': [
+            f"• Accuracy: {test['accuracy']:.0%} on {model['test_rows']} held-out patients of {model['data']}.",
+            f"• Macro F1: {test['macro_f1']:.2f} across all three classes.",
+            f"• Reference recipe ({validation['n_trees']} trees trained on {validation['data']}), "
+            f"cross-validated: accuracy {validation['accuracy']:.0%}, calibration error {validation['ece']:.3f}.",
+            f"• Key Predictors: {', '.join(top)}."],
+         'chart': {'kind': 'heatmap', 'title': 'Out-of-fold confusion matrix (reference recipe)',
+                   'data': {'matrix': validation['confusion'], 'labels': validation['classes']}}},
+        {'title': "Per-Class Precision and Recall (Reference Recipe)",
+         'bullets': [f"• {c}: precision {p:.0%}, recall {r:.0%}."
+                     for c, p, r in zip(validation['classes'], validation['precision'], validation['recall'])]
+                    + [f"• Cross-validation retrains the recipe on {validation['data']}; it does not score this deck's model."],
+         'chart': {'kind': 'bars', 'title': 'Out-of-fold precision and recall (reference recipe)',
+                   'data': {'labels': validation['classes'], 'ylabel': 'Share',
+                            'series': {'Precision': validation['precision'], 'Recall': validation['recall']}}}},
+        {'title': "Key Predictors",
+         'bullets': [f"• {name}: {v:.1%} of split importance." for name, v in model['importances'][:4]],
+         'chart': {'kind': 'barh', 'title': 'Feature importance',
+                   'data': {'labels': [n for n, _ in model['importances']],
+                            'values': [v for _, v in model['importances']], 'xlabel': 'Mean decrease in impurity'}}},
+    ]
+    if facts.get('benchmarks'):
+        engines = facts['benchmarks']
+        slides.append({'title': "Serving Performance", 'bullets': [
+            f"• {e['engine']}: {e['us_per_row']:,.1f} µs per patient "
+            f"(parity {'checked' if e['ok'] else 'FAILED'} on {e['rows']:,} patients)." for e in engines],
+            'chart': {'kind': 'barh', 'title': 'Scoring latency per patient (µs)',
+                      'data': {'labels': [e['engine'] for e in engines],
+                               'values': [e['us_per_row'] for e in engines], 'xlabel': 'µs per row (log scale)',
+                               'log': True}}})
+    cohort = facts.get('cohort')
+    if cohort:
+        slides.append({'title': "Population Overview", 'bullets': [
+            f"• {cohort['n']:,} patients scored.",
+            *[f"• {c}: {p:.0%} of patients." for c, p in cohort['prevalence'].items()],
+            f"• Mean sleep score: {cohort['mean_score']:.0f}/100."],
+            'chart': {'kind': 'bars', 'title': 'Prevalence by BMI category (%)',
+                      'data': {'labels': cohort['by_bmi']['labels'], 'series': cohort['by_bmi']['series'],
+                               'ylabel': '% of patients'}}})
+        slides.append({'title': "Risk by Age", 'bullets': [
+            f"• {band}: {apnea:.0f}% Sleep Apnea, {insomnia:.0f}% Insomnia."
+            for band, apnea, insomnia in zip(cohort['by_age']['labels'], cohort['by_age']['series']['Sleep Apnea %'],
+                                             cohort['by_age']['series']['Insomnia %'])],
+            'chart': {'kind': 'bars', 'title': 'Prevalence by age band (%)',
+                      'data': {'labels': cohort['by_age']['labels'], 'series': cohort['by_age']['series'],
+                               'ylabel': '% of patients'}}})
+    slides += [
+        {'title': "Social Impact", 'chart': None, 'bullets': [
+            "• Democratizing Health: Brings clinical-grade screening to the user's home.",
+            "• Prevention First: Early detection prevents long-term chronic conditions.",
+            "• Public Safety: Reduces accidents caused by undiagnosed sleep deprivation.",
+            "• Awareness: Educates users about the link between lifestyle (steps, stress) and sleep."]},
+        {'title': "Future Expansion", 'chart': None, 'bullets': [
+            "• Wearable Integration: Sync directly with Samsung Galaxy Watch for real-time bio-data.",
+            "• Deep Learning: Implement CNN-LSTM models for raw EEG/ECG signal analysis.",
+            "• Telehealth Connection: One-click report sharing with sleep specialists.",
+            "• Personalized Plans: AI-generated sleep hygiene recommendations based on risk."]},
+    ]
+    return slides
+
+
+def write_deck(facts, slides, path, cache_dir=CACHE_DIR):
     prs = Presentation()
 
-    # Helper to set title and content
-    def add_slide(title_text, content_text_list):
-        slide_layout = prs.slide_layouts[1] # Title and Content
-        slide = prs.slides.add_slide(slide_layout)
-        title = slide.shapes.title
-        content = slide.placeholders[1]
-
-        title.text = title_text
-        
-        tf = content.text_frame
-        for i, text in enumerate(content_text_list):
-            if i == 0:
-                p = tf.paragraphs[0]
-            else:
-                p = tf.add_paragraph()
+    # Title Slide
+    slide = prs.slides.add_slide(prs.slide_layouts[0])
+    slide.shapes.title.text = "Samsung Sleep Health Predictor"
+    slide.placeholders[1].text = (f"AI-Driven Early Detection System\nSamsung Capstone Project\n"
+                                  f"{facts['tenant']} · generated {facts['generated']}")
+
+    for spec in slides:
+        if spec['chart'] is None:
+            slide = prs.slides.add_slide(prs.slide_layouts[1])  # Title and Content
+            tf = slide.placeholders[1].text_frame
+            size, space = Pt(24), Pt(14)
+        else:
+            slide = prs.slides.add_slide(prs.slide_layouts[5])  # Title Only
+            slide.shapes.add_picture(chart_path(spec['chart'], cache_dir), Inches(4.6), Inches(1.8), width=Inches(5.2))
+            tf = slide.shapes.add_textbox(Inches(0.4), Inches(1.8), Inches(4.1), Inches(5)).text_frame
+            tf.word_wrap = True
+            size, space = Pt(16), Pt(10)
+        slide.shapes.title.text = spec['title']
+        for i, text in enumerate(spec['bullets']):
+            p = tf.paragraphs[0] if i == 0 else tf.add_paragraph()
             p.text = text
-            p.font.size = Pt(24)
-            p.space_after = Pt(14)
-
-    # 1. Title Slide
-    slide_layout = prs.slide_layouts[0] # Title Slide
-    slide = prs.slides.add_slide(slide_layout)
-    title = slide.shapes.title
-    subtitle = slide.placeholders[1]
-    title.text = "Samsung Sleep Health Predictor"
-    subtitle.text = "AI-Driven Early Detection System\nSamsung Capstone Project"
-
-    # 2. Problem Statement
-    add_slide("Problem Statement: The Silent Epidemic", [
-        "• Sleep disorders like Insomnia and Sleep Apnea affect millions globally.",
-        "• Risks include cardiovascular disease, chronic fatigue, and reduced cognitive function.",
-        "• Current diagnosis is expensive, time-consuming, and requires clinical sleep studies.",
-        "• There is a critical gap for accessible, early screening tools."
-    ])
-
-    # 3. The Solution
-    add_slide("The Solution: AI-Driven Dashboard", [
-        "• An intelligent, web-based application for instant sleep health assessment.",
-        "• Uses Machine Learning to analyze 11 key lifestyle and health markers.",
-        "• Provides real-time risk classification: Healthy, Insomnia, or Sleep Apnea.",
-        "• Accessible anywhere, empowering users to take proactive health steps."
-    ])
-
-    # 4. Technical Architecture
-    add_slide("Technical Architecture", [
-        "• Data Source: Sleep Health & Lifestyle Dataset (Blood Pressure, BMI, HRV, etc.)",
-        "• Model: Random Forest Classifier (Optimized for tabular health data).",
-        "• Backend: Python with Scikit-learn for inference.",
-        "• Frontend: Streamlit for a responsive, interactive user interface.",
-        "• Deployment: Lightweight and container-ready."
-    ])
-
-    # 5. Model Performance
-    add_slide("Model Performance & Results", [
-        "• Accuracy: 88% on unseen test data.",
-        "• Precision: High precision in distinguishing Sleep Apnea from Healthy subjects.",
-        "• Key Predictors: BMI Category, Systolic Blood Pressure, and Sleep Duration.",
-        "• Validation: Rigorous train-test splitting and metric evaluation."
-    ])
-
-    # 6. Social Impact
-    add_slide("Social Impact", [
-        "• Democratizing Health: Brings clinical-grade screening to the user's home.",
-        "• Prevention First: Early detection prevents long-term chronic conditions.",
-        "• Public Safety: Reduces accidents caused by undiagnosed sleep deprivation.",
-        "• Awareness: Educates users about the link between lifestyle (steps, stress) and sleep."
-    ])
-
-    # 7. Future Expansion
-    add_slide("Future Expansion", [
-        "• Wearable Integration: Sync directly with Samsung Galaxy Watch for real-time bio-data.",
-        "• Deep Learning: Implement CNN-LSTM models for raw EEG/ECG signal analysis.",
-        "• Telehealth Connection: One-click report sharing with sleep specialists.",
-        "• Personalized Plans: AI-generated sleep hygiene recommendations based on risk."
-    ])
-
-    # Save
-    output_path = "Samsung_Sleep_Project_Presentation.pptx"
-    prs.save(output_path)
-    print(f"Presentation saved to {output_path}")
+            p.font.size = size
+            p.space_after = space
+    prs.save(path)
+
+
+def render_summary(facts, slides):
+    """Markdown report with the deck's numbers."""
+    lines = [f"# Sleep Health Predictor: {facts['tenant']}", "",
+             f"Generated {facts['generated']} from model {facts['version']}.", ""]
+    for spec in slides:
+        if spec['chart'] is not None:
+            lines += [f"## {spec['title']}", *[b.replace('• ', '- ', 1) for b in spec['bullets']], ""]
+    return '\n'.join(lines)
+
+
+# --- Batch ---
+def _tenants(clinic=None, all_clinics=False, models_dir=MODELS_DIR):
+    """(tenant name, (model, label encoder, occupation encoder), version) per deck to build."""
+    from model_router import ModelRouter
+    from model_bundle import current_version
+
+    registry_path = os.path.join(models_dir, 'tenants.json')
+    if not os.path.exists(registry_path):
+        if clinic or all_clinics:
+            print("No models/tenants.json; building the default deck only")
+        artifacts = load_artifacts(models_dir)
+        if artifacts[0] is None:
+            raise FileNotFoundError("No trained model; run src/train_model.py first")
+        version = current_version(os.path.join(models_dir, 'bundles')) or model_key(artifacts[0])
+        return [('default', artifacts, version)]
+    router = ModelRouter.from_file(registry_path)
+    if all_clinics:
+        clinics = [None] + [key.split(':', 1)[1] for key in router.registry if key.startswith('clinic:')]
+    else:
+        clinics = [clinic]
+    tenants = []
+    for c in clinics:
+        artifacts, key = router.route(c), router.model_key(c)
+        # Bundle entries are keyed "<tenant>@<bundle version>"
+        tenants.append((router.resolve(c), artifacts, key.split('@', 1)[1] if '@' in key else model_key(artifacts[0])))
+    return tenants
+
+
+def build_decks(clinic=None, all_clinics=False, out_dir=None, out=None, workers=None, benchmark=True,
+                refresh=False, data_path=DATA_PATH, cache_dir=CACHE_DIR):
+    """Builds one deck (and Markdown summary) per tenant; returns the deck paths."""
+    generated = datetime.date.today().isoformat()
+    validation = validation_facts(data_path)
+    cohort = cohort_facts()
+    decks = []
+    for tenant, (model, le, occupation_encoder), version in _tenants(clinic, all_clinics):
+        facts = {'tenant': tenant, 'version': version, 'generated': generated, 'validation': validation,
+                 'cohort': cohort, 'model': model_facts(model, le, occupation_encoder, data_path),
+                 'benchmarks': benchmark_facts(model, occupation_encoder, refresh=refresh, cache_dir=cache_dir)
+                 if benchmark else None}
+        decks.append((facts, build_slides(facts)))
+
+    start = time.perf_counter()
+    specs = [s['chart'] for _, slides in decks for s in slides if s['chart'] is not None]
+    rendered = render_charts(specs, workers, refresh, cache_dir)
+    print(f"Charts: {len(specs)} on slides, {rendered} rendered, the rest reused from cache "
+          f"({time.perf_counter() - start:.2f}s)")
+
+    paths = []
+    for facts, slides in decks:
+        name = DEFAULT_DECK if facts['tenant'] == 'default' else f"{facts['tenant'].replace(':', '_')}_presentation.pptx"
+        path = out if out and len(decks) == 1 else os.path.join(out_dir or '.', name)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        write_deck(facts, slides, path, cache_dir)
+        with open(os.path.splitext(path)[0] + '.md', 'w') as f:
+            f.write(render_summary(facts, slides))
+        print(f"Presentation saved to {path}")
+        paths.append(path)
+    return paths
+
 
 if __name__ == "__main__":
-    create_presentation()
+    parser = argparse.ArgumentParser(description="Build the project deck from live metrics.")
+    parser.add_argument('--clinic', help="Build the deck for this clinic's model (models/tenants.json)")
+    parser.add_argument('--all-clinics', action='store_true', help="One deck per clinic, plus the default")
+    parser.add_argument('--out', help=f"Deck path for a single deck (default: {DEFAULT_DECK})")
+    parser.add_argument('--out-dir', default='.', help="Directory for the decks")
+    parser.add_argument('--data', default=DATA_PATH, help="Training data the metrics are computed on")
+    parser.add_argument('--workers', type=int, default=None, help="Chart rendering processes (default: all CPUs)")
+    parser.add_argument('--no-benchmark', action='store_true', help="Skip the serving-engine benchmark slide")
+    parser.add_argument('--refresh', action='store_true', help="Re-render charts and rerun benchmarks")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = build_decks(args.clinic, args.all_clinics, args.out_dir, args.out, args.workers,
+                        not args.no_benchmark, args.refresh, args.data)
+    print(f"Built {len(paths)} deck(s) in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,184 @@
+"""Chunked CSV/Parquet loading with compact dtypes and row-level validation.
+
+Rows that fail validation are quarantined (returned with a Reason column)
+instead of aborting the load, so one malformed export line cannot break a
+training run over a large pooled dataset.
+"""
+import os
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from hypnogram import SLEEP_METRIC_FEATURES
+from hrv import HRV_FEATURES
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pq = None
+
+# column -> (dtype, allowed range or category set, nullable)
+SCHEMA = {
+    'Person ID': ('int32', (0, np.iinfo(np.int32).max), False),
+    'Gender': ('category', {'Male', 'Female'}, True),
+    'Age': ('int16', (0, 120), False),
+    'Occupation': ('category', None, True),
+    'Sleep Duration': ('float32', (0, 24), False),
+    'Quality of Sleep': ('int8', (1, 10), False),
+    'Physical Activity Level': ('int16', (0, 1440), False),
+    'Stress Level': ('int8', (1, 10), False),
+    'BMI Category': ('category', {'Normal', 'Normal Weight', 'Overweight', 'Obese'}, False),
+    'Blood Pressure': ('bp', None, False),
+    'Heart Rate': ('int16', (20, 250), False),
+    'Daily Steps': ('int32', (0, 100000), False),
+    'Sleep Disorder': ('category', {'Healthy', 'Insomnia', 'Sleep Apnea'}, True),
+    # Longitudinal exports only: night index per person (see trend_features.py)
+    'Night': ('int32', (0, np.iinfo(np.int32).max), True),
+    # Nights staged by sleep_stager.py: percentage of the night in each stage
+    'Wake_Pct': ('float32', (0, 100), False),
+    'N1_Pct': ('float32', (0, 100), False),
+    'N2_Pct': ('float32', (0, 100), False),
+    'N3_Pct': ('float32', (0, 100), False),
+    'REM_Pct': ('float32', (0, 100), False),
+    # Sleep architecture from hypnogram.py (latencies and WASO in minutes)
+    'Sleep_Efficiency': ('float32', (0, 100), False),
+    'Sleep_Latency': ('float32', (0, 1440), False),
+    'WASO': ('float32', (0, 1440), False),
+    'REM_Latency': ('float32', (0, 1440), True),  # missing when a night has no REM
+    'Awakenings': ('int16', (0, 1000), False),
+    'Stage_Shifts_Per_Hour': ('float32', (0, 1000), False),
+    # Nightly HRV from hrv.py (ms, except pNN50 in % and the LF/HF ratio); missing on noisy nights
+    'Mean_RR': ('float32', (300, 2000), True),
+    'SDNN': ('float32', (0, 1000), True),
+    'RMSSD': ('float32', (0, 1000), True),
+    'pNN50': ('float32', (0, 100), True),
+    'LF_HF': ('float32', (0, 1000), True),
+}
+# Extra model features, placed after the snapshot columns when present
+FEATURE_COLUMNS = SLEEP_METRIC_FEATURES + HRV_FEATURES
+OPTIONAL_COLUMNS = {'Person ID', 'Night'} | set(FEATURE_COLUMNS)
+
+BP_PATTERN = r'^\s*(\d{2,3})\s*/\s*(\d{2,3})\s*$'
+
+
+def read_chunks(path, columns, chunksize=100_000):
+    """Yields raw chunks of `columns` (those present) from a CSV or Parquet file."""
+    if path.endswith('.parquet'):
+        if pq is None:
+            raise ImportError("Parquet input requires pyarrow: pip install pyarrow")
+        source = pq.ParquetFile(path)
+        present = [c for c in columns if c in source.schema_arrow.names]
+        for batch in source.iter_batches(batch_size=chunksize, columns=present):
+            yield batch.to_pandas()
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        present = [c for c in columns if c in header]
+        # Everything is read as text and converted below, so a stray value
+        # quarantines its row instead of failing the whole parse
+        yield from pd.read_csv(path, usecols=present, dtype=str, chunksize=chunksize)
+
+
+def validate_chunk(chunk):
+    """Splits a raw chunk into (clean rows with compact dtypes, quarantined rows)."""
+    reason = pd.Series('', index=chunk.index, dtype=object)
+    out = {}
+
+    def flag(mask, message):
+        reason[mask & (reason == '')] = message
+
+    for col in chunk.columns:
+        dtype, allowed, nullable = SCHEMA[col]
+        raw = chunk[col]
+        missing = raw.isna()
+        if not nullable:
+            flag(missing, f'{col}: missing')
+
+        if dtype == 'bp':
+            parts = raw.astype(str).str.extract(BP_PATTERN)
+            flag(~missing & parts[0].isna(), f'{col}: expected systolic/diastolic')
+            out['BP_Systolic'] = pd.to_numeric(parts[0], errors='coerce')
+            out['BP_Diastolic'] = pd.to_numeric(parts[1], errors='coerce')
+        elif dtype == 'category':
+            values = raw.astype(object).where(missing, raw.astype(str).str.strip())
+            if col == 'Sleep Disorder':
+                values = values.replace('None', np.nan).fillna('Healthy')
+                missing = values.isna()
+            if allowed is not None:
+                flag(~missing & ~values.isin(allowed), f'{col}: unknown category')
+            out[col] = values
+        else:
+            values = pd.to_numeric(raw, errors='coerce')
+            bad = ~missing & values.isna()
+            lo, hi = allowed
+            bad |= values.notna() & ~values.between(lo, hi)
+            if dtype.startswith('int'):
+                bad |= values.notna() & (values % 1 != 0)
+            flag(bad, f'{col}: invalid value')
+            out[col] = values
+
+    ok = reason == ''
+    # Snapshot columns, then parsed blood pressure, then extra features:
+    # the column order the model was trained with (see sleep_core.encode)
+    bp = [c for c in out if c.startswith('BP_')]
+    extra = [c for c in FEATURE_COLUMNS if c in out]
+    order = [c for c in out if c not in bp and c not in extra] + bp + extra
+    clean = pd.DataFrame({col: out[col][ok] for col in order})
+    for col in clean.columns:
+        dtype = SCHEMA[col][0] if col in SCHEMA else 'int16'
+        if dtype == 'category':
+            allowed = SCHEMA[col][1]
+            categories = sorted(allowed) if allowed is not None else None
+            clean[col] = pd.Categorical(clean[col], categories=categories)
+        elif dtype.startswith('int') and clean[col].isna().any():
+            clean[col] = clean[col].astype(dtype.capitalize())  # pandas nullable integer
+        else:
+            clean[col] = clean[col].astype(dtype)
+
+    quarantined = chunk[~ok].assign(Reason=reason[~ok])
+    return clean, quarantined
+
+
+def load_dataset(path, columns=None, chunksize=100_000, quarantine_path=None):
+    """Loads and validates a CSV or Parquet dataset chunk by chunk.
+
+    Only `columns` (default: every schema column) are read. Blood Pressure is
+    parsed into BP_Systolic/BP_Diastolic, and a missing Sleep Disorder means
+    'Healthy'. Returns (clean DataFrame, quarantined rows); quarantined rows
+    are also written to quarantine_path as CSV when given. Raises ValueError
+    when no row passes validation (an empty file or one fully quarantined).
+    """
+    columns = list(columns or SCHEMA)
+    unknown = set(columns) - set(SCHEMA)
+    if unknown:
+        raise ValueError(f"Columns not in schema: {sorted(unknown)}")
+
+    clean_parts, bad_parts = [], []
+    for chunk in read_chunks(path, columns, chunksize):
+        required = [c for c in columns if c not in OPTIONAL_COLUMNS]
+        absent = [c for c in required if c not in chunk.columns]
+        if absent:
+            raise ValueError(f"{path} is missing required columns: {absent}")
+        clean, bad = validate_chunk(chunk)
+        clean_parts.append(clean)
+        if len(bad):
+            bad_parts.append(bad)
+
+    quarantined = pd.concat(bad_parts) if bad_parts else pd.DataFrame(columns=columns + ['Reason'])
+    if quarantine_path and len(quarantined):
+        os.makedirs(os.path.dirname(quarantine_path), exist_ok=True)
+        quarantined.to_csv(quarantine_path, index=False)
+    if not sum(len(part) for part in clean_parts):
+        where = f" (see {quarantine_path})" if quarantine_path and len(quarantined) else ""
+        raise ValueError(f"{path} has no valid rows: {len(quarantined)} quarantined{where}")
+    return _concat(clean_parts), quarantined
+
+
+def _concat(parts):
+    """Concatenates chunks, merging open-ended categoricals (e.g. Occupation)."""
+    parts = [p for p in parts if len(p)] or parts[:1]
+    if len(parts) == 1:
+        return parts[0].reset_index(drop=True)
+    df = pd.concat(parts, ignore_index=True)
+    for col in parts[0].columns:
+        if isinstance(parts[0][col].dtype, pd.CategoricalDtype) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = pd.Series(union_categoricals([p[col] for p in parts]), index=df.index)
+    return df
@@ -0,0 +1,112 @@
+"""Feature drift monitoring: training histograms vs. sliding windows of live inputs."""
+import threading
+import numpy as np
+import pandas as pd
+
+# PSI rule of thumb: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 major shift
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+EPS = 1e-4
+
+
+def build_feature_profile(X, n_bins=10):
+    """Builds per-feature quantile histograms of the training inputs.
+
+    Bin edges are training quantiles, so every bin starts with roughly equal
+    mass; low-cardinality features (gender, BMI, ratings) get one bin per value.
+    """
+    features = {}
+    for col in X.columns:
+        values = X[col].to_numpy(dtype=float)
+        uniques = np.unique(values)
+        if len(uniques) <= n_bins:
+            # Cut halfway between observed values
+            edges = (uniques[:-1] + uniques[1:]) / 2
+        else:
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        features[col] = {'edges': edges, 'ref': counts / counts.sum()}
+    return {'features': features, 'n_samples': len(X)}
+
+
+def psi(ref, cur):
+    """Population stability index between two binned distributions."""
+    ref = np.clip(ref, EPS, None)
+    cur = np.clip(cur, EPS, None)
+    return float(np.sum((cur - ref) * np.log(cur / ref)))
+
+
+def ks_stat(ref, cur):
+    """Kolmogorov-Smirnov distance between two binned distributions."""
+    return float(np.max(np.abs(np.cumsum(ref) - np.cumsum(cur))))
+
+
+class SlidingHistogram:
+    """Exact histogram over the last `window` observations in constant memory.
+
+    Keeps a ring buffer of bin indices plus running counts, so each update is
+    O(1) and memory does not grow with traffic.
+    """
+
+    def __init__(self, edges, window):
+        self.edges = edges
+        self.window = window
+        self.bins = np.zeros(window, dtype=np.uint8)
+        self.counts = np.zeros(len(edges) + 1, dtype=np.int64)
+        self.n = 0
+        self.pos = 0
+
+    def add(self, values):
+        for b in np.searchsorted(self.edges, np.asarray(values, dtype=float), side='right'):
+            if self.n == self.window:
+                self.counts[self.bins[self.pos]] -= 1
+            else:
+                self.n += 1
+            self.bins[self.pos] = b
+            self.counts[b] += 1
+            self.pos = (self.pos + 1) % self.window
+
+    def distribution(self):
+        return self.counts / max(self.n, 1)
+
+
+class DriftMonitor:
+    """Tracks live model inputs against a training profile.
+
+    Safe to share across sessions: updates and reports take a lock.
+    """
+
+    def __init__(self, profile, window=1000, min_samples=30):
+        self.profile = profile
+        self.min_samples = min_samples
+        self.histograms = {
+            name: SlidingHistogram(spec['edges'], window)
+            for name, spec in profile['features'].items()
+        }
+        self._lock = threading.Lock()
+
+    def observe(self, X):
+        """Adds a batch of preprocessed model inputs (DataFrame)."""
+        with self._lock:
+            for name, hist in self.histograms.items():
+                if name in X.columns:
+                    hist.add(X[name].to_numpy())
+
+    @property
+    def n_observed(self):
+        return min((h.n for h in self.histograms.values()), default=0)
+
+    def report(self):
+        """Returns per-feature PSI/KS for the current window, worst first."""
+        rows = []
+        with self._lock:
+            for name, hist in self.histograms.items():
+                ref = self.profile['features'][name]['ref']
+                cur = hist.distribution()
+                score = psi(ref, cur)
+                status = 'alert' if score > PSI_ALERT else 'warn' if score > PSI_WARN else 'ok'
+                if hist.n < self.min_samples:
+                    status = 'insufficient data'
+                rows.append({'Feature': name, 'PSI': score, 'KS': ks_stat(ref, cur),
+                             'Samples': hist.n, 'Status': status})
+        return pd.DataFrame(rows).sort_values('PSI', ascending=False).reset_index(drop=True)
@@ -0,0 +1,69 @@
+"""Early-exit inference for a fitted RandomForestClassifier.
+
+Trees are evaluated in blocks and evaluation stops once the running vote
+margin makes the full forest's answer statistically settled. Per tree, the
+margin d = p(leader) - p(runner-up) lies in [-1, 1]; after n of N trees
+the forest's final mean margin is estimated by the running mean, and by
+Hoeffding-Serfling (sampling trees without replacement):
+
+    P(final mean <= 0) <= delta  once  mean_n > sqrt(2 ln(1/delta) (1 - (n-1)/N) / n)
+
+with delta = 1 - confidence. The bootstrap trees are exchangeable, so
+evaluating them in order is a random sample. When the lead is larger than
+the remaining trees could overturn, the stop is exact.
+"""
+import numpy as np
+
+
+class EarlyExitForest:
+    """Wraps a fitted forest; predict returns labels and the trees used per row."""
+
+    def __init__(self, forest, confidence=0.99, min_trees=8, block=4):
+        self.forest = forest
+        self.confidence = confidence
+        self.min_trees = min_trees
+        self.block = block
+        self.classes_ = forest.classes_
+        self.feature_names_in_ = getattr(forest, 'feature_names_in_', None)
+        self._log_term = 2 * np.log(1 / (1 - confidence))
+
+    @property
+    def n_estimators(self):
+        return len(self.forest.estimators_)
+
+    @staticmethod
+    def _tree_proba(tree, X):
+        value = tree.tree_.predict(X).reshape(len(X), -1)  # single output
+        return value / value.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, X):
+        """Returns (probabilities averaged over the trees used, trees used per row)."""
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+        n_trees = self.n_estimators
+        total = np.zeros((len(X), len(self.classes_)))
+        used = np.zeros(len(X), dtype=np.int32)
+        active = np.arange(len(X))
+
+        for start in range(0, n_trees, self.block):
+            if not len(active):
+                break
+            rows = X[active]
+            for tree in self.forest.estimators_[start:start + self.block]:
+                total[active] += self._tree_proba(tree, rows)
+            n = min(start + self.block, n_trees)
+            used[active] = n
+            if n < self.min_trees or n >= n_trees:
+                continue
+            # Summed leader-minus-runner-up margin of the trees so far
+            top = np.sort(total[active], axis=1)
+            gap = top[:, -1] - top[:, -2]
+            bound = np.sqrt(self._log_term * (1 - (n - 1) / n_trees) / n)
+            settled = (gap / n > bound) | (gap > n_trees - n)
+            active = active[~settled]
+
+        return total / used[:, None], used
+
+    def predict(self, X):
+        """Returns (labels, trees used per row)."""
+        proba, used = self.predict_proba(X)
+        return self.classes_[proba.argmax(axis=1)], used
@@ -0,0 +1,220 @@
+"""Evaluation from cached out-of-fold predictions, plus uncertainty ranking for labeling.
+
+Out-of-fold (OOF) class probabilities are computed once per model version
+(training data contents + forest parameters + folds) with stratified k-fold
+cross-validation and cached in data/eval_cache/. Every row is scored by a
+forest that never saw it, so metrics, confusion matrices, calibration and
+threshold sweeps are all recomputed from the cached arrays in milliseconds
+instead of retraining:
+
+    python3 src/evaluation.py                          # metrics + confusion + calibration
+    python3 src/evaluation.py --sweep "Sleep Apnea"    # per-threshold precision/recall
+    python3 src/evaluation.py --rank unlabeled.csv --top 50 --out to_label.csv
+
+--rank scores unlabeled patients (dataset columns, no Sleep Disorder) with
+the deployed model and lists the ones it is least sure about first, for
+clinicians to label.
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold
+from train_model import BASE_DIR, DATA_PATH, MODEL_PARAMS, load_training_data
+
+CACHE_DIR = os.path.join(BASE_DIR, 'data', 'eval_cache')
+UNCERTAINTY = ('margin', 'entropy', 'least_confident')
+
+
+def model_version(data_path, params=MODEL_PARAMS, folds=5, seed=42):
+    """Cache key: hash of the training file's bytes and the evaluation settings."""
+    digest = hashlib.sha256()
+    with open(data_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(json.dumps({'params': params, 'folds': folds, 'seed': seed}, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+class OutOfFold:
+    """Cached OOF probabilities for one model version; all reports are computed from them."""
+
+    def __init__(self, y, proba, classes, version=None):
+        self.y = np.asarray(y)
+        self.proba = np.asarray(proba)
+        self.classes = np.asarray(classes)
+        self.version = version
+
+    @property
+    def predicted(self):
+        return self.proba.argmax(axis=1)
+
+    def metrics(self):
+        """Accuracy, macro F1, log loss, Brier score and per-class precision/recall/F1."""
+        cm = self.confusion().to_numpy()
+        tp = np.diag(cm)
+        precision = tp / np.maximum(cm.sum(axis=0), 1)
+        recall = tp / np.maximum(cm.sum(axis=1), 1)
+        f1 = 2 * precision * recall / np.maximum(precision + recall, 1e-12)
+        onehot = np.eye(len(self.classes))[self.y]
+        p_true = self.proba[np.arange(len(self.y)), self.y]
+        return {
+            'accuracy': tp.sum() / len(self.y),
+            'macro_f1': f1.mean(),
+            'log_loss': -np.log(np.clip(p_true, np.finfo(float).eps, 1)).mean(),
+            'brier': ((self.proba - onehot) ** 2).sum(axis=1).mean(),
+            'per_class': pd.DataFrame({'precision': precision, 'recall': recall, 'f1': f1,
+                                       'support': cm.sum(axis=1)}, index=self.classes),
+        }
+
+    def confusion(self):
+        """Confusion matrix (rows = true class, columns = predicted)."""
+        k = len(self.classes)
+        cm = np.bincount(self.y * k + self.predicted, minlength=k * k).reshape(k, k)
+        return pd.DataFrame(cm, index=self.classes, columns=self.classes)
+
+    def calibration(self, label=None, bins=10):
+        """Reliability table: mean predicted probability vs observed frequency per bin.
+
+        label=None uses the top-class confidence against "prediction was
+        right"; a class name gives that class's one-vs-rest curve. The
+        expected calibration error (ECE) is returned in the table's attrs.
+        """
+        if label is None:
+            confidence, hit = self.proba.max(axis=1), self.predicted == self.y
+        else:
+            k = list(self.classes).index(label)
+            confidence, hit = self.proba[:, k], self.y == k
+        index = np.minimum((confidence * bins).astype(int), bins - 1)
+        count = np.bincount(index, minlength=bins)
+        mean_p = np.bincount(index, confidence, bins) / np.maximum(count, 1)
+        observed = np.bincount(index, hit, bins) / np.maximum(count, 1)
+        table = pd.DataFrame({'bin': [f"{i / bins:.1f}-{(i + 1) / bins:.1f}" for i in range(bins)],
+                              'n': count, 'mean_predicted': mean_p, 'observed': observed})
+        table = table[table['n'] > 0].reset_index(drop=True)
+        table.attrs['ece'] = float((table['n'] * (table['mean_predicted'] - table['observed']).abs()).sum() / len(self.y))
+        return table
+
+    def threshold_sweep(self, label, thresholds=None):
+        """One-vs-rest precision, recall, specificity and F1 of `label` at each probability threshold."""
+        thresholds = np.linspace(0, 1, 21) if thresholds is None else np.asarray(thresholds)
+        k = list(self.classes).index(label)
+        positive = self.y == k
+        flagged = self.proba[:, k][None, :] >= thresholds[:, None]
+        tp = (flagged & positive).sum(axis=1)
+        fp = (flagged & ~positive).sum(axis=1)
+        tn = (~positive).sum() - fp
+        precision = np.where(tp + fp > 0, tp / np.maximum(tp + fp, 1), 1.0)
+        recall = tp / max(positive.sum(), 1)
+        return pd.DataFrame({
+            'threshold': thresholds, 'flagged': tp + fp, 'precision': precision, 'recall': recall,
+            'specificity': tn / max((~positive).sum(), 1),
+            'f1': 2 * precision * recall / np.maximum(precision + recall, 1e-12),
+        })
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, y=self.y, proba=self.proba, classes=self.classes.astype(str))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, version=None):
+        with np.load(path) as f:
+            return cls(f['y'], f['proba'], f['classes'], version)
+
+
+def out_of_fold(data_path=DATA_PATH, params=MODEL_PARAMS, folds=5, seed=42, refresh=False, cache_dir=CACHE_DIR):
+    """Returns OutOfFold for this model version, running cross-validation only on a cache miss."""
+    version = model_version(data_path, params, folds, seed)
+    path = os.path.join(cache_dir, f'oof_{version}.npz')
+    if os.path.exists(path) and not refresh:
+        return OutOfFold.load(path, version)
+
+    X, y, le, _ = load_training_data(data_path)
+    y = np.asarray(y)
+    proba = np.zeros((len(y), len(le.classes_)))
+    print(f"Cross-validating ({folds} folds) for model version {version}...")
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    for train_idx, test_idx in splitter.split(X, y):
+        forest = RandomForestClassifier(**params).fit(X.iloc[train_idx], y[train_idx])
+        # A fold may miss a rare class; place its columns by class code
+        proba[np.ix_(test_idx, forest.classes_)] = forest.predict_proba(X.iloc[test_idx])
+    oof = OutOfFold(y, proba, le.classes_, version)
+    oof.save(path)
+    return oof
+
+
+def uncertainty(proba, strategy='margin'):
+    """Per-row uncertainty in [0, 1]; higher means the model is less sure."""
+    proba = np.asarray(proba)
+    if strategy == 'margin':
+        top = np.sort(proba, axis=1)
+        return 1 - (top[:, -1] - top[:, -2])
+    if strategy == 'entropy':
+        p = np.clip(proba, 1e-12, 1)
+        return -(p * np.log(p)).sum(axis=1) / np.log(proba.shape[1])
+    if strategy == 'least_confident':
+        return 1 - proba.max(axis=1)
+    raise ValueError(f"Unknown strategy '{strategy}', expected one of {UNCERTAINTY}")
+
+
+def rank_for_labeling(raw, model, le, occupation_encoder, strategy='margin', top=None):
+    """Unlabeled patients (dataset columns, blood pressure split) ordered most uncertain first."""
+    from sleep_core import encode_batch
+
+    X = encode_batch(raw, occupation_encoder)
+    for col in model.feature_names_in_:
+        if col not in X:  # Optional hypnogram/HRV features, when the export has them
+            X[col] = raw[col].to_numpy() if col in raw else np.nan
+    proba = model.predict_proba(X[list(model.feature_names_in_)])
+    ranked = raw.reset_index(drop=True).assign(
+        Predicted=le.classes_[proba.argmax(axis=1)],
+        Confidence=proba.max(axis=1),
+        Uncertainty=uncertainty(proba, strategy),
+    ).sort_values('Uncertainty', ascending=False, kind='stable')
+    return ranked.head(top) if top else ranked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate from cached out-of-fold predictions; rank samples for labeling.")
+    parser.add_argument('--data', default=DATA_PATH, help="Labeled training data (default: the bundled CSV)")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--refresh', action='store_true', help="Recompute the OOF cache for this version")
+    parser.add_argument('--sweep', metavar='CLASS', help="Print a threshold sweep for this class")
+    parser.add_argument('--rank', metavar='UNLABELED', help="Rank unlabeled patients by model uncertainty")
+    parser.add_argument('--strategy', choices=UNCERTAINTY, default='margin')
+    parser.add_argument('--top', type=int, default=50)
+    parser.add_argument('--out', help="Write the --rank list to this CSV")
+    args = parser.parse_args()
+
+    if args.rank:
+        from sleep_core import load_artifacts, split_blood_pressure
+        model, le, occupation_encoder = load_artifacts()
+        ranked = rank_for_labeling(split_blood_pressure(pd.read_csv(args.rank)), model, le, occupation_encoder,
+                                   args.strategy, args.top)
+        if args.out:
+            ranked.to_csv(args.out, index=False)
+            print(f"Saved {len(ranked)} patients to label to {args.out}")
+        else:
+            print(ranked.to_string(index=False))
+    else:
+        oof = out_of_fold(args.data, folds=args.folds, refresh=args.refresh)
+        start = time.perf_counter()
+        metrics = oof.metrics()
+        confusion, calibration = oof.confusion(), oof.calibration()
+        sweep = oof.threshold_sweep(args.sweep) if args.sweep else None
+        elapsed = time.perf_counter() - start
+        print(f"Model version {oof.version}: {len(oof.y)} out-of-fold predictions")
+        print(f"Accuracy {metrics['accuracy']:.3f} | Macro F1 {metrics['macro_f1']:.3f} | "
+              f"Log loss {metrics['log_loss']:.3f} | Brier {metrics['brier']:.3f}")
+        print(metrics['per_class'].round(3).to_string())
+        print("\nConfusion (rows = true):\n" + confusion.to_string())
+        print(f"\nCalibration (ECE {calibration.attrs['ece']:.3f}):\n" + calibration.round(3).to_string(index=False))
+        if sweep is not None:
+            print(f"\nThreshold sweep for {args.sweep}:\n" + sweep.round(3).to_string(index=False))
+        print(f"\nReports computed from the cache in {1000 * elapsed:.1f} ms")
@@ -0,0 +1,164 @@
+"""Sleep-architecture metrics from per-epoch stage labels, vectorized over many nights.
+
+Nights are laid out as rows of a padded (n_nights, n_epochs) int8 array
+(stages as in preprocessing.STAGES: 0=W, 1=N1, 2=N2, 3=N3, 4=REM; -1 = padding)
+and every metric is computed with whole-array operations, so an archive of
+thousands of nights is a few numpy passes rather than a Python loop per night.
+
+    python3 src/hypnogram.py data/processed/epochs --out data/processed/night_metrics.csv
+"""
+import os
+import glob
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+EPOCH_MIN = 0.5
+WAKE, REM = 0, 4
+
+ARCHITECTURE_FEATURES = [
+    'Sleep_Efficiency', 'Sleep_Latency', 'WASO', 'REM_Latency',
+    'Awakenings', 'Stage_Shifts_Per_Hour',
+]
+STAGE_FEATURES = ['Wake_Pct', 'N1_Pct', 'N2_Pct', 'N3_Pct', 'REM_Pct']
+# Optional disorder-classifier features, in training column order
+SLEEP_METRIC_FEATURES = STAGE_FEATURES + ARCHITECTURE_FEATURES
+
+# Epoch-to-epoch stage transition probabilities for synthetic nights
+_TRANSITIONS = np.array([
+    [0.80, 0.15, 0.05, 0.00, 0.00],
+    [0.08, 0.55, 0.33, 0.00, 0.04],
+    [0.02, 0.04, 0.84, 0.07, 0.03],
+    [0.01, 0.00, 0.12, 0.87, 0.00],
+    [0.03, 0.04, 0.05, 0.00, 0.88],
+])
+
+
+def pad_nights(nights, pad=-1):
+    """Stacks 1D stage arrays of different lengths into a padded 2D array."""
+    lengths = np.array([len(n) for n in nights])
+    out = np.full((len(nights), lengths.max(initial=0)), pad, dtype=np.int8)
+    mask = np.arange(out.shape[1]) < lengths[:, None]
+    out[mask] = np.concatenate(nights) if len(nights) else []
+    return out
+
+
+def night_metrics(stages, chunk=4096):
+    """Computes per-night architecture metrics for a padded stage array.
+
+    Returns a DataFrame with one row per night: Total_Sleep_Time (hours),
+    Sleep_Efficiency (% of recording asleep), Sleep_Latency, WASO and
+    REM_Latency (minutes), Awakenings, Stage_Shifts_Per_Hour (of sleep) and
+    the share of the recording in each stage. Nights are processed in
+    chunks to bound temporary memory.
+    """
+    stages = np.asarray(stages, dtype=np.int8)
+    if stages.ndim == 1:
+        stages = stages[None, :]
+    parts = [_metrics_chunk(stages[i:i + chunk]) for i in range(0, len(stages), chunk)]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+def _metrics_chunk(S):
+    n, T = S.shape
+    idx = np.arange(T)
+    valid = S >= 0
+    recorded = valid.sum(axis=1)
+    asleep = valid & (S != WAKE)
+    has_sleep = asleep.any(axis=1)
+
+    # Sleep period: first to last sleep epoch
+    onset = np.where(has_sleep, asleep.argmax(axis=1), recorded)
+    last = np.where(has_sleep, T - 1 - asleep[:, ::-1].argmax(axis=1), -1)
+    in_period = (idx >= onset[:, None]) & (idx <= last[:, None])
+
+    tst = asleep.sum(axis=1)
+    waso = ((S == WAKE) & in_period).sum(axis=1)
+
+    rem_after_onset = (S == REM) & (idx >= onset[:, None])
+    has_rem = rem_after_onset.any(axis=1)
+    rem_latency = np.where(has_rem, (rem_after_onset.argmax(axis=1) - onset) * EPOCH_MIN, np.nan)
+
+    # Run-length boundaries inside the sleep period
+    change = (S[:, 1:] != S[:, :-1]) & in_period[:, 1:] & in_period[:, :-1]
+    awakenings = (change & (S[:, 1:] == WAKE)).sum(axis=1)
+    shifts = change.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = {
+            'Total_Sleep_Time': tst * EPOCH_MIN / 60,
+            'Sleep_Efficiency': np.where(recorded > 0, 100.0 * tst / recorded, np.nan),
+            'Sleep_Latency': onset * EPOCH_MIN,
+            'WASO': waso * EPOCH_MIN,
+            'REM_Latency': rem_latency,
+            'Awakenings': awakenings,
+            'Stage_Shifts_Per_Hour': np.where(tst > 0, shifts / (tst * EPOCH_MIN / 60), 0.0),
+        }
+        for k, name in enumerate(STAGE_FEATURES):
+            out[name] = np.where(recorded > 0, 100.0 * (S == k).sum(axis=1) / recorded, np.nan)
+    return pd.DataFrame(out)
+
+
+def synthetic_night(rng, n_epochs=960):
+    """Simulates one night's stage sequence (Markov chain), for demos and load tests."""
+    stages = np.empty(n_epochs, dtype=np.int8)
+    stages[0] = WAKE
+    cumulative = _TRANSITIONS.cumsum(axis=1)
+    draws = rng.random(n_epochs)
+    for i in range(1, n_epochs):
+        stages[i] = np.searchsorted(cumulative[stages[i - 1]], draws[i])
+    return stages
+
+
+def objective_inputs(metrics):
+    """Maps architecture metrics onto the model's subjective sleep inputs.
+
+    Sleep Duration becomes total sleep time. Quality of Sleep (1-10) is a
+    heuristic blend of efficiency (65% -> 0, 95% -> 1), deep + REM share of
+    sleep (20% -> 0, 45% -> 1) and WASO (60+ min -> 0), weighted 2:1:1.
+    Works on a single-night dict or a metrics DataFrame.
+    """
+    eff = np.clip((metrics['Sleep_Efficiency'] - 65) / 30, 0, 1)
+    restorative = (metrics['N3_Pct'] + metrics['REM_Pct']) / np.maximum(100 - metrics['Wake_Pct'], 1e-6) * 100
+    deep = np.clip((restorative - 20) / 25, 0, 1)
+    waso = 1 - np.clip(metrics['WASO'] / 60, 0, 1)
+    score = np.nan_to_num(0.5 * eff + 0.25 * deep + 0.25 * waso)
+    quality = np.rint(1 + 9 * score).astype(int)
+    duration = np.round(metrics['Total_Sleep_Time'], 1)
+    if isinstance(metrics, pd.DataFrame):
+        return pd.DataFrame({'Sleep Duration': duration, 'Quality of Sleep': quality})
+    return {'Sleep Duration': float(duration), 'Quality of Sleep': int(quality)}
+
+
+def load_archive(path):
+    """Loads stage labels from a directory of epoch .npz files (key 'y') or a
+    long-format CSV with 'night' and 'stage' columns. Returns (night ids, padded stages)."""
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, '*.npz')))
+        ids = [os.path.splitext(os.path.basename(f))[0] for f in files]
+        return ids, pad_nights([np.load(f)['y'] for f in files])
+    df = pd.read_csv(path, usecols=['night', 'stage'], dtype={'stage': np.int8})
+    codes, ids = pd.factorize(df['night'], sort=False)
+    lengths = np.bincount(codes)
+    order = np.argsort(codes, kind='stable')
+    return list(ids), pad_nights(np.split(df['stage'].to_numpy()[order], np.cumsum(lengths)[:-1]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute sleep-architecture metrics for an archive of nights.")
+    parser.add_argument('archive', help="Directory of epoch .npz files or long-format night/stage CSV")
+    parser.add_argument('--out', default=None, help="Write per-night metrics to this CSV")
+    args = parser.parse_args()
+
+    ids, stages = load_archive(args.archive)
+    start = time.perf_counter()
+    metrics = night_metrics(stages)
+    metrics = pd.concat([metrics, objective_inputs(metrics)], axis=1)
+    metrics.insert(0, 'night', ids)
+    print(f"Computed metrics for {len(ids)} nights in {time.perf_counter() - start:.2f}s")
+    if args.out:
+        metrics.to_csv(args.out, index=False)
+        print(f"Saved to {args.out}")
+    else:
+        print(metrics.head(20).to_string(index=False))
@@ -0,0 +1,64 @@
+"""Background job execution so UI reruns never block on model or sync work."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """Handle to one background job: its future plus progress the job reports."""
+
+    def __init__(self, key):
+        self.key = key
+        self.progress = 0.0
+        self.message = ''
+        self.submitted = time.time()
+        self.future = None
+
+    def report(self, progress, message=''):
+        """Called from inside the job to publish progress (0-1)."""
+        self.progress = min(max(progress, 0.0), 1.0)
+        self.message = message
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+class JobRunner:
+    """Thread pool shared by all sessions, with de-duplication of in-flight work.
+
+    Jobs are threads rather than processes so they share the already-loaded
+    model; sklearn releases the GIL for most of predict(). Submitting a key
+    that is still running returns the existing Job instead of starting a
+    second copy, so identical requests from several clinicians cost one run.
+    """
+
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Runs fn(job, *args, **kwargs) in the background and returns its Job."""
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                return job
+            job = Job(key)
+            self._inflight[key] = job
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            return fn(job, *args, **kwargs)
+        finally:
+            job.progress = 1.0
+            with self._lock:
+                self._inflight.pop(job.key, None)
+
+    @property
+    def inflight(self):
+        return len(self._inflight)
@@ -0,0 +1,411 @@
+"""Versioned model bundles: checksummed, optionally signed, with a rollback registry.
+
+A bundle is one directory, models/bundles/<version>/, holding the forest,
+both encoders and the drift profile next to a manifest.json:
+
+    {"format": 1, "version": "20261019-153000-6820f638", "created": "...",
+     "feature_names": [...], "classes": [...], "params": {...},
+     "training_data": {"file": "...csv", "sha256": "...", "rows": 374},
+     "metrics": {"accuracy": 0.89, "macro_f1": 0.87},
+     "files": {"model.pkl": {"sha256": "...", "bytes": 759425}, ...},
+     "signature": "..."}
+
+A bundle is written to a temporary directory and renamed into place, so
+readers never see half of one. File checksums are computed as the pickles
+are written. load_bundle reads each file once, hashing as it reads, and
+unpickles nothing until every checksum matches. When SLEEP_MODEL_KEY is set,
+the manifest also carries an HMAC-SHA256 signature that is checked on load.
+
+models/bundles/registry.json names the active bundle and keeps the
+activation history. Activating a bundle or rolling back rewrites that one
+file atomically, so a swap never races file copies:
+
+    python3 src/model_bundle.py list
+    python3 src/model_bundle.py verify [VERSION]
+    python3 src/model_bundle.py activate VERSION
+    python3 src/model_bundle.py rollback
+    python3 src/model_bundle.py pack          # bundle the loose models/*.pkl files
+"""
+import io
+import os
+import hmac
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import datetime
+import tempfile
+import joblib
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUNDLES_DIR = os.path.join(BASE_DIR, 'models', 'bundles')
+FORMAT = 1
+KEY_ENV = 'SLEEP_MODEL_KEY'
+# Bundle file of each artifact
+ARTIFACTS = {
+    'model': 'model.pkl',
+    'label_encoder': 'label_encoder.pkl',
+    'occupation_encoder': 'occupation_encoder.pkl',
+    'feature_profile': 'feature_profile.pkl',
+}
+# Activated bundles kept on disk for rollback
+KEEP = 10
+BLOCK = 1 << 20
+
+
+class BundleError(ValueError):
+    """A bundle that is missing, incomplete, tampered with or inconsistent."""
+
+
+class Bundle:
+    """A loaded, verified bundle."""
+
+    def __init__(self, path, manifest, model=None, label_encoder=None, occupation_encoder=None,
+                 feature_profile=None):
+        self.path = path
+        self.manifest = manifest
+        self.model = model
+        self.label_encoder = label_encoder
+        self.occupation_encoder = occupation_encoder
+        self.feature_profile = feature_profile
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+
+class _HashingWriter:
+    """File wrapper that hashes everything joblib writes through it."""
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.f.write(data)
+
+    def tell(self):
+        return self.size
+
+
+def _signing_key(key):
+    key = key if key is not None else os.environ.get(KEY_ENV)
+    return key.encode() if isinstance(key, str) else key
+
+
+def sign(manifest, key):
+    """HMAC-SHA256 of the manifest, minus its signature, as canonical JSON."""
+    body = {k: v for k, v in manifest.items() if k != 'signature'}
+    payload = json.dumps(body, sort_keys=True, separators=(',', ':')).encode()
+    return hmac.new(key, payload, hashlib.sha256).hexdigest()
+
+
+# --- Writing ---
+def dump_atomic(obj, path):
+    """joblib.dump via a temporary file renamed into place, so readers never see a partial pickle."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            joblib.dump(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def write_bundle(model, label_encoder, occupation_encoder=None, feature_profile=None, metrics=None,
+                 params=None, data_path=None, bundles_dir=BUNDLES_DIR, key=None):
+    """Writes a new bundle and returns its version (does not activate it)."""
+    key = _signing_key(key)
+    os.makedirs(bundles_dir, exist_ok=True)
+    objects = {'model': model, 'label_encoder': label_encoder,
+               'occupation_encoder': occupation_encoder, 'feature_profile': feature_profile}
+    created = datetime.datetime.now()
+    tmp = tempfile.mkdtemp(prefix='.tmp-', dir=bundles_dir)
+    try:
+        files = {}
+        for name, obj in objects.items():
+            if obj is None:
+                continue
+            with open(os.path.join(tmp, ARTIFACTS[name]), 'wb') as f:
+                writer = _HashingWriter(f)
+                joblib.dump(obj, writer)
+                f.flush()
+                os.fsync(f.fileno())
+            files[ARTIFACTS[name]] = {'sha256': writer.digest.hexdigest(), 'bytes': writer.size}
+
+        version = f"{created:%Y%m%d-%H%M%S}-{files['model.pkl']['sha256'][:8]}"
+        manifest = {
+            'format': FORMAT,
+            'version': version,
+            'created': created.isoformat(timespec='seconds'),
+            'feature_names': [str(c) for c in getattr(model, 'feature_names_in_', [])],
+            'classes': [str(c) for c in label_encoder.classes_],
+            'n_estimators': len(getattr(model, 'estimators_', [])),
+            'params': params or {},
+            'training_data': _data_summary(data_path),
+            'metrics': {k: round(float(v), 6) for k, v in (metrics or {}).items()},
+            'files': files,
+        }
+        manifest['signature'] = sign(manifest, key) if key else None
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        path = os.path.join(bundles_dir, version)
+        if os.path.exists(path):
+            # Same model written within the same second: the bundle already exists
+            shutil.rmtree(tmp)
+        else:
+            os.rename(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return version
+
+
+def _data_summary(data_path):
+    """Hash (and, for CSV, data row count) of the training data file."""
+    if not data_path or not os.path.exists(data_path):
+        return None
+    digest, lines, last = hashlib.sha256(), 0, b'\n'
+    with open(data_path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK), b''):
+            digest.update(block)
+            lines += block.count(b'\n')
+            last = block[-1:]
+    summary = {'file': os.path.basename(data_path), 'sha256': digest.hexdigest()}
+    if data_path.endswith('.csv'):
+        # Header excluded; the last line may lack a newline
+        summary['rows'] = max(lines + (last != b'\n') - 1, 0)
+    return summary
+
+
+# --- Reading ---
+def _bundle_path(version, bundles_dir):
+    version = version or current_version(bundles_dir)
+    if not version:
+        raise BundleError(f"No active bundle in {bundles_dir}")
+    path = os.path.join(bundles_dir, version)
+    if not os.path.isdir(path):
+        raise BundleError(f"Bundle {version} not found in {bundles_dir}")
+    return path
+
+
+def read_manifest(path, key=None):
+    """Reads a bundle's manifest, checking its signature when a key is configured."""
+    try:
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BundleError(f"Unreadable manifest in {path}: {e}") from e
+    if manifest.get('format') != FORMAT:
+        raise BundleError(f"Unsupported bundle format {manifest.get('format')!r} in {path}")
+    key = _signing_key(key)
+    if key and not hmac.compare_digest(manifest.get('signature') or '', sign(manifest, key)):
+        raise BundleError(f"Bad or missing signature on bundle {manifest.get('version')}")
+    return manifest
+
+
+def _read_verified(path, expected, keep=True):
+    """Reads a file once, hashing as it goes; returns its bytes (or None if not kept)."""
+    digest = hashlib.sha256()
+    data = bytearray() if keep else None
+    size = 0
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(BLOCK), b''):
+                digest.update(block)
+                size += len(block)
+                if keep:
+                    data += block
+    except OSError as e:
+        raise BundleError(f"Missing bundle file {path}") from e
+    if size != expected['bytes'] or not hmac.compare_digest(digest.hexdigest(), expected['sha256']):
+        raise BundleError(f"Checksum mismatch for {path}")
+    return data
+
+
+def verify_bundle(version=None, bundles_dir=BUNDLES_DIR, key=None):
+    """Checks a bundle's signature and checksums without unpickling anything; returns its manifest."""
+    path = _bundle_path(version, bundles_dir)
+    manifest = read_manifest(path, key)
+    for name, expected in manifest['files'].items():
+        _read_verified(os.path.join(path, name), expected, keep=False)
+    return manifest
+
+
+def load_bundle(version=None, bundles_dir=BUNDLES_DIR, key=None, only=None):
+    """Loads a bundle (default: the active one) after verifying every file it loads.
+
+    only limits loading to some ARTIFACTS keys, e.g. ('feature_profile',).
+    """
+    from category_encoder import as_category_encoder
+
+    path = _bundle_path(version, bundles_dir)
+    manifest = read_manifest(path, key)
+    wanted = {name: fname for name, fname in ARTIFACTS.items()
+              if fname in manifest['files'] and (only is None or name in only)}
+    # Every checksum is checked before any pickle is trusted
+    payloads = {name: _read_verified(os.path.join(path, fname), manifest['files'][fname])
+                for name, fname in wanted.items()}
+    objects = {name: joblib.load(io.BytesIO(data)) for name, data in payloads.items()}
+    if objects.get('occupation_encoder') is not None:
+        objects['occupation_encoder'] = as_category_encoder(objects['occupation_encoder'])
+
+    model, le = objects.get('model'), objects.get('label_encoder')
+    if model is not None and hasattr(model, 'feature_names_in_') \
+            and [str(c) for c in model.feature_names_in_] != manifest['feature_names']:
+        raise BundleError(f"Bundle {manifest['version']}: model features differ from the manifest")
+    if le is not None and [str(c) for c in le.classes_] != manifest['classes']:
+        raise BundleError(f"Bundle {manifest['version']}: label encoder classes differ from the manifest")
+    return Bundle(path, manifest, **objects)
+
+
+# --- Registry ---
+def _registry_path(bundles_dir):
+    return os.path.join(bundles_dir, 'registry.json')
+
+
+def read_registry(bundles_dir=BUNDLES_DIR):
+    """{'current': active version or None, 'history': activated versions, oldest first}"""
+    try:
+        with open(_registry_path(bundles_dir)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'current': None, 'history': []}
+
+
+def _write_registry(registry, bundles_dir):
+    path = _registry_path(bundles_dir)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(registry, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def current_version(bundles_dir=BUNDLES_DIR):
+    return read_registry(bundles_dir)['current']
+
+
+def activate(version, bundles_dir=BUNDLES_DIR, keep=KEEP, key=None):
+    """Verifies a bundle and makes it the active one."""
+    verify_bundle(version, bundles_dir, key)
+    registry = read_registry(bundles_dir)
+    history = [v for v in registry['history'] if v != version] + [version]
+    _write_registry({'current': version, 'history': history}, bundles_dir)
+    prune(bundles_dir, keep)
+    return version
+
+
+def rollback(bundles_dir=BUNDLES_DIR, key=None):
+    """Re-activates the bundle that was active before the current one."""
+    registry = read_registry(bundles_dir)
+    history = registry['history']
+    if len(history) < 2:
+        raise BundleError("No earlier bundle to roll back to")
+    previous = history[-2]
+    verify_bundle(previous, bundles_dir, key)
+    _write_registry({'current': previous, 'history': history[:-1]}, bundles_dir)
+    return previous
+
+
+def prune(bundles_dir=BUNDLES_DIR, keep=KEEP):
+    """Deletes activated bundles beyond the last `keep`, and abandoned temporary directories.
+
+    Bundles that were never activated (e.g. ones awaiting review) are left alone.
+    """
+    registry = read_registry(bundles_dir)
+    history = registry['history']
+    kept = set(history[-keep:]) | {registry['current']}
+    stale = [v for v in history if v not in kept]
+    if stale:
+        _write_registry({'current': registry['current'], 'history': [v for v in history if v in kept]}, bundles_dir)
+        for version in stale:
+            shutil.rmtree(os.path.join(bundles_dir, version), ignore_errors=True)
+    for name in os.listdir(bundles_dir):
+        path = os.path.join(bundles_dir, name)
+        if name.startswith('.tmp-') and time.time() - os.path.getmtime(path) > 3600:
+            shutil.rmtree(path, ignore_errors=True)
+    return stale
+
+
+def list_bundles(bundles_dir=BUNDLES_DIR):
+    """Manifest summary of every bundle on disk, newest first."""
+    if not os.path.isdir(bundles_dir):
+        return []
+    current = current_version(bundles_dir)
+    rows = []
+    for name in sorted(os.listdir(bundles_dir), reverse=True):
+        path = os.path.join(bundles_dir, name)
+        if name.startswith('.') or not os.path.isdir(path):
+            continue
+        try:
+            manifest = read_manifest(path, key=b'')
+        except BundleError as e:
+            rows.append({'version': name, 'active': name == current, 'error': str(e)})
+            continue
+        rows.append({'version': name, 'active': name == current, 'created': manifest['created'],
+                     'trees': manifest['n_estimators'], 'signed': bool(manifest['signature']),
+                     **manifest['metrics']})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage versioned model bundles.")
+    parser.add_argument('--dir', default=BUNDLES_DIR, help="Bundle directory")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="List bundles")
+    verify_parser = sub.add_parser('verify', help="Check a bundle's signature and checksums")
+    verify_parser.add_argument('version', nargs='?', help="Default: the active bundle")
+    activate_parser = sub.add_parser('activate', help="Verify a bundle and make it active")
+    activate_parser.add_argument('version')
+    sub.add_parser('rollback', help="Re-activate the previously active bundle")
+    pack_parser = sub.add_parser('pack', help="Bundle and activate the loose models/*.pkl files")
+    pack_parser.add_argument('--data', default=None, help="Training data to hash and score (default: the bundled CSV)")
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'list':
+            for row in list_bundles(args.dir):
+                details = ', '.join(f"{k} {v}" for k, v in row.items() if k not in ('version', 'active'))
+                print(f"{'*' if row['active'] else ' '} {row['version']}  {details}")
+        elif args.command == 'verify':
+            start = time.perf_counter()
+            manifest = verify_bundle(args.version, args.dir)
+            size = sum(f['bytes'] for f in manifest['files'].values())
+            print(f"Bundle {manifest['version']} OK: {len(manifest['files'])} files, {size / 1024:.0f} KB "
+                  f"verified in {1000 * (time.perf_counter() - start):.0f} ms"
+                  f"{'' if manifest['signature'] else ' (unsigned)'}")
+        elif args.command == 'activate':
+            print(f"Active bundle: {activate(args.version, args.dir)}")
+        elif args.command == 'rollback':
+            print(f"Rolled back to {rollback(args.dir)}")
+        elif args.command == 'pack':
+            from train_model import DATA_PATH, MODEL_PARAMS, load_training_data, split_data, evaluate
+            from category_encoder import load_category_encoder
+
+            models_dir = os.path.dirname(os.path.abspath(args.dir))
+            loose = {name: os.path.join(models_dir, fname) for name, fname in [
+                ('model', 'sleep_model_fast.pkl'), ('label_encoder', 'label_encoder.pkl'),
+                ('occupation_encoder', 'occupation_encoder.pkl'), ('feature_profile', 'feature_profile.pkl')]}
+            model, le = joblib.load(loose['model']), joblib.load(loose['label_encoder'])
+            occupation_encoder = (load_category_encoder(loose['occupation_encoder'])
+                                  if os.path.exists(loose['occupation_encoder']) else None)
+            profile = joblib.load(loose['feature_profile']) if os.path.exists(loose['feature_profile']) else None
+            data_path = args.data or DATA_PATH
+            X, y, _, _ = load_training_data(data_path, le, occupation_encoder)
+            _, X_test, _, y_test = split_data(X[list(model.feature_names_in_)], y)
+            version = write_bundle(model, le, occupation_encoder, profile, evaluate(model, X_test, y_test),
+                                   MODEL_PARAMS, data_path, args.dir)
+            print(f"Active bundle: {activate(version, args.dir)}")
+    except BundleError as e:
+        parser.exit(1, f"error: {e}\n")
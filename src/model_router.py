@@ -0,0 +1,156 @@
+"""Per-tenant model routing for a single serving process.
+
+Tenants (clinics, device families) map to model artifacts in a small JSON
+registry, e.g. models/tenants.json:
+
+    {
+      "default": {"model": "sleep_model_fast.pkl",
+                  "label_encoder": "label_encoder.pkl",
+                  "occupation_encoder": "occupation_encoder.pkl"},
+      "device:Apple Watch": {"model": "sleep_model_apple.pkl"},
+      "clinic:north": {"model": "sleep_model_north.pkl"}
+    }
+
+Paths are relative to the registry file. Entries inherit any encoder they
+do not name from "default". Models load on first use and at most
+`capacity` stay in memory (least recently used are evicted). Encoders are
+small and shared: files with identical contents load once.
+
+An entry can instead name a verified bundle (see src/model_bundle.py) from
+the registry file's bundles/ directory, with its own encoders:
+
+    "default": {"bundle": "current"},
+    "clinic:north": {"bundle": "20261019-153000-6820f638"}
+
+"current" follows the bundle registry, so an activate or rollback is picked
+up on the next request.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import joblib
+from category_encoder import load_category_encoder
+from model_bundle import current_version, load_bundle
+
+DEFAULT_TENANT = 'default'
+ENCODER_KEYS = ('label_encoder', 'occupation_encoder')
+ENCODER_LOADERS = {'label_encoder': joblib.load, 'occupation_encoder': load_category_encoder}
+
+
+def tenant_keys(clinic=None, device=None):
+    """Candidate registry keys for a request, most specific first."""
+    keys = []
+    if clinic:
+        keys.append(f'clinic:{clinic}')
+    if device:
+        keys.append(f'device:{device}')
+    keys.append(DEFAULT_TENANT)
+    return keys
+
+
+class ModelRouter:
+    """Routes requests to tenant models held in a bounded LRU cache."""
+
+    def __init__(self, registry, base_dir, capacity=4):
+        if DEFAULT_TENANT not in registry:
+            raise ValueError(f"Model registry needs a '{DEFAULT_TENANT}' entry")
+        self.base_dir = base_dir
+        self.capacity = capacity
+        self.registry = {}
+        self.bundles_dir = os.path.join(base_dir, 'bundles')
+        for tenant, entry in registry.items():
+            if 'bundle' in entry:
+                self.registry[tenant] = dict(entry)
+                continue
+            merged = {k: registry[DEFAULT_TENANT].get(k) for k in ENCODER_KEYS}
+            merged.update(entry)
+            self.registry[tenant] = merged
+        self._models = OrderedDict()  # model path -> model
+        self._encoders = {}           # (kind, content digest) -> encoder
+        self._encoder_paths = {}      # (kind, path) -> encoder
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    @classmethod
+    def from_file(cls, path, capacity=4):
+        with open(path) as f:
+            return cls(json.load(f), os.path.dirname(os.path.abspath(path)), capacity)
+
+    def resolve(self, clinic=None, device=None):
+        """Returns the registry key serving this request."""
+        return next(key for key in tenant_keys(clinic, device) if key in self.registry)
+
+    def model_key(self, clinic=None, device=None):
+        """Registry key serving this request, tagged with its bundle version when it serves a bundle."""
+        tenant = self.resolve(clinic, device)
+        if 'bundle' in self.registry[tenant]:
+            return f"{tenant}@{self._bundle_version(self.registry[tenant]['bundle'])}"
+        return tenant
+
+    def route(self, clinic=None, device=None):
+        """Returns (model, label encoder, occupation encoder) for a request."""
+        entry = self.registry[self.resolve(clinic, device)]
+        if 'bundle' in entry:
+            return self._bundle(self._bundle_version(entry['bundle']))
+        model = self._model(self._path(entry['model']))
+        encoders = [self._encoder(k, self._path(entry[k])) if entry.get(k) else None for k in ENCODER_KEYS]
+        return (model, *encoders)
+
+    def _path(self, name):
+        return os.path.join(self.base_dir, name)
+
+    def _model(self, path):
+        with self._lock:
+            if path in self._models:
+                self._models.move_to_end(path)
+                self.hits += 1
+                return self._models[path]
+            self.misses += 1
+        # Load outside the lock so a cold tenant does not stall warm ones
+        model = joblib.load(path)
+        with self._lock:
+            model = self._models.setdefault(path, model)
+            self._models.move_to_end(path)
+            while len(self._models) > self.capacity:
+                self._models.popitem(last=False)
+                self.evictions += 1
+        return model
+
+    def _bundle_version(self, version):
+        return current_version(self.bundles_dir) if version == 'current' else version
+
+    def _bundle(self, version):
+        key = f'bundle:{version}'
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key]
+            self.misses += 1
+        bundle = load_bundle(version, self.bundles_dir)
+        artifacts = (bundle.model, bundle.label_encoder, bundle.occupation_encoder)
+        with self._lock:
+            artifacts = self._models.setdefault(key, artifacts)
+            self._models.move_to_end(key)
+            while len(self._models) > self.capacity:
+                self._models.popitem(last=False)
+                self.evictions += 1
+        return artifacts
+
+    def _encoder(self, kind, path):
+        with self._lock:
+            if (kind, path) in self._encoder_paths:
+                return self._encoder_paths[kind, path]
+            with open(path, 'rb') as f:
+                key = (kind, hashlib.sha256(f.read()).hexdigest())
+            if key not in self._encoders:
+                self._encoders[key] = ENCODER_LOADERS[kind](path)
+            self._encoder_paths[kind, path] = self._encoders[key]
+            return self._encoders[key]
+
+    def stats(self):
+        with self._lock:
+            return {'loaded': list(self._models), 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'shared_encoders': len(self._encoders)}
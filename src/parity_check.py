@@ -0,0 +1,138 @@
+"""Prediction parity harness across serving engines.
+
+Runs the bundled CSV plus seeded synthetic patients through every engine
+and diffs labels and class probabilities against sklearn's batch
+predict_proba on every row. The path the dashboard serves (sleep_core.encode
++ model, one patient at a time) is too slow to run on all of them, so it is
+diffed against the same baseline on a sample:
+
+    python3 src/parity_check.py --synthetic 20000
+
+Exits non-zero if any engine disagrees beyond its tolerance. A label
+difference only counts as a failure when the reference's top-two classes
+are further apart than twice the tolerance (otherwise it is a near-tie the
+engine is allowed to break differently).
+"""
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from compact_forest import CompactForest
+from binned_forest import BinnedForest
+from train_model import DATA_PATH
+from sleep_core import encode, encode_batch, split_blood_pressure, load_artifacts
+
+RAW_COLUMNS = ['Gender', 'Age', 'Occupation', 'Sleep Duration', 'Quality of Sleep', 'Physical Activity Level',
+               'Stress Level', 'BMI Category', 'Heart Rate', 'Daily Steps', 'BP_Systolic', 'BP_Diastolic']
+
+
+def compact(model):
+    forest = CompactForest.from_sklearn(model)
+    return lambda X: forest.predict_proba(X.to_numpy())
+
+
+def binned(model):
+    forest = BinnedForest.from_sklearn(model)
+    return lambda X: forest.predict_proba(X.to_numpy())
+
+
+# name -> (engine factory: fitted forest -> predict_proba(encoded batch), probability tolerance)
+ENGINES = {
+    'compact (float32/uint8)': (compact, 2 / 255),  # leaf probabilities are quantized
+    'binned lookup tables': (binned, 0.0),  # exact: same leaves, same summation order
+}
+
+
+def load_bundled(path=DATA_PATH):
+    return split_blood_pressure(pd.read_csv(path))[RAW_COLUMNS]
+
+
+def synthetic_patients(n, occupations, seed=0):
+    """Seeded random patients spanning the dashboard's input ranges (incl. unseen occupations)."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Gender': rng.choice(['Male', 'Female'], n),
+        'Age': rng.integers(10, 101, n),
+        'Occupation': rng.choice(list(occupations) + ['Student', 'Other'], n),
+        'Sleep Duration': np.round(rng.uniform(0, 12, n), 1),
+        'Quality of Sleep': rng.integers(1, 11, n),
+        'Physical Activity Level': rng.integers(0, 121, n),
+        'Stress Level': rng.integers(1, 11, n),
+        'BMI Category': rng.choice(['Normal', 'Overweight', 'Obese'], n),
+        'Heart Rate': rng.integers(40, 121, n),
+        'Daily Steps': rng.integers(0, 20001, n),
+        'BP_Systolic': rng.integers(80, 201, n),
+        'BP_Diastolic': rng.integers(50, 131, n),
+    })
+
+
+def reference_proba(model, raw, occupation_encoder):
+    """The dashboard path: one encode + predict_proba call per patient."""
+    rows = [model.predict_proba(encode(*row, occupation_encoder))[0]
+            for row in raw.itertuples(index=False)]
+    return np.array(rows)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def compare(name, proba, baseline, tolerance, seconds):
+    """Report row diffing one engine's probabilities against the baseline's (same rows)."""
+    proba = np.asarray(proba)
+    ordered = np.sort(baseline, axis=1)
+    margin = ordered[:, -1] - ordered[:, -2]
+    label_diff = proba.argmax(axis=1) != baseline.argmax(axis=1)
+    failing = int((label_diff & (margin > 2 * tolerance)).sum())
+    max_dp = float(np.abs(proba - baseline).max()) if len(proba) else 0.0
+    return {'Engine': name, 'Rows': len(proba), 'Label diffs': int(label_diff.sum()),
+            'Failing labels': failing, 'Max |dp|': max_dp, 'Tolerance': tolerance,
+            'us/row': 1e6 * seconds / max(len(proba), 1), 'OK': failing == 0 and max_dp <= tolerance}
+
+
+def check(raw, model, occupation_encoder, engines=ENGINES, reference_limit=2000):
+    """Returns one report row per engine; 'Rows' counts the rows actually diffed.
+
+    Engines are diffed against sklearn's batch predict_proba on every row; the
+    per-row dashboard path on the first reference_limit rows.
+    """
+    X, encode_time = timed(encode_batch, raw, occupation_encoder)
+    baseline, baseline_time = timed(model.predict_proba, X)
+    ref, ref_time = timed(reference_proba, model, raw.iloc[:reference_limit], occupation_encoder)
+
+    report = [compare('sklearn batch (baseline)', baseline, baseline, 0.0, encode_time + baseline_time),
+              compare('reference (per-row)', ref, baseline[:len(ref)], 1e-9, ref_time)]
+    for name, (factory, tolerance) in engines.items():
+        predict_proba = factory(model)
+        proba, run_time = timed(predict_proba, X)
+        report.append(compare(name, proba, baseline, tolerance, encode_time + run_time))
+    return pd.DataFrame(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check prediction parity across serving engines.")
+    parser.add_argument('--bundle', metavar='VERSION', help="Model bundle to check (default: the active one)")
+    parser.add_argument('--synthetic', type=int, default=10000, help="Synthetic patients to add (default 10000)")
+    parser.add_argument('--reference-limit', type=int, default=2000,
+                        help="Rows scored through the slow per-row reference path")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    model, _, occupation_encoder = load_artifacts(version=args.bundle)
+    occupations = occupation_encoder.categories_ if occupation_encoder is not None else []
+
+    failed = False
+    for name, raw in [('bundled CSV', load_bundled()),
+                      ('synthetic', synthetic_patients(args.synthetic, occupations, args.seed))]:
+        if not len(raw):
+            continue
+        # Shuffle so the per-row reference covers a spread of the sample
+        raw = raw.sample(frac=1, random_state=args.seed).reset_index(drop=True)
+        report = check(raw, model, occupation_encoder, reference_limit=args.reference_limit)
+        print(f"\n{name}: {len(raw)} rows")
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+        failed |= not report['OK'].all()
+    sys.exit(1 if failed else 0)
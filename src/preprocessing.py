@@ -1,11 +1,83 @@
-# Preprocessing script placeholder
-# This script will be used for cleaning data (Phase 1)
+# Preprocessing of overnight recordings (Phase 1)
+# Cuts EDF sleep recordings into 30-second epochs with per-epoch stage labels,
+# the input format of the sleep-stage model in sleep_stager.py.
+import os
+import glob
+import argparse
 import numpy as np
 import pandas as pd
-import mne
 
-def preprocess_data():
+STAGES = ['W', 'N1', 'N2', 'N3', 'REM']
+EPOCH_SEC = 30
+
+# Sleep-EDF / R&K annotations -> AASM stage index (stages 3 and 4 merge into N3)
+ANNOTATION_MAP = {
+    'Sleep stage W': 0,
+    'Sleep stage 1': 1,
+    'Sleep stage 2': 2,
+    'Sleep stage 3': 3,
+    'Sleep stage 4': 3,
+    'Sleep stage R': 4,
+}
+
+def epoch_signals(signals, fs, epoch_sec=EPOCH_SEC):
+    """Cuts (n_samples, n_channels) signals into (n_epochs, epoch_len, n_channels).
+
+    Each channel is z-scored over the night so different devices and
+    montages land on a comparable scale. A trailing partial epoch is dropped.
+    """
+    signals = np.asarray(signals, dtype=np.float32)
+    if signals.ndim == 1:
+        signals = signals[:, None]
+    epoch_len = int(round(fs * epoch_sec))
+    n_epochs = len(signals) // epoch_len
+    signals = signals[:n_epochs * epoch_len]
+    signals = (signals - signals.mean(axis=0)) / (signals.std(axis=0) + 1e-6)
+    return signals.reshape(n_epochs, epoch_len, signals.shape[1])
+
+def load_edf_night(psg_path, hypnogram_path, channels=None, target_fs=100):
+    """Reads one PSG night and its hypnogram into epoch arrays (X, y).
+
+    Epochs without a sleep-stage label (movement, unscored) are dropped.
+    """
+    import mne  # Only needed for EDF input
+    raw = mne.io.read_raw_edf(psg_path, include=channels, preload=True, verbose='error')
+    if raw.info['sfreq'] != target_fs:
+        raw.resample(target_fs, verbose='error')
+    X = epoch_signals(raw.get_data().T, target_fs)
+
+    y = np.full(len(X), -1, dtype=np.int8)
+    for ann in mne.read_annotations(hypnogram_path):
+        stage = ANNOTATION_MAP.get(ann['description'], -1)
+        start = int(ann['onset'] // EPOCH_SEC)
+        stop = min(len(y), start + int(ann['duration'] // EPOCH_SEC))
+        y[start:stop] = stage
+
+    keep = y >= 0
+    return X[keep], y[keep]
+
+def preprocess_data(raw_dir, out_dir, channels=None):
+    """Epochs every Sleep-EDF night in raw_dir into out_dir/<night>.npz."""
     print("Preprocessing data...")
+    os.makedirs(out_dir, exist_ok=True)
+    hypnograms = {os.path.basename(p)[:6]: p for p in glob.glob(os.path.join(raw_dir, '*-Hypnogram.edf'))}
+    summary = []
+    for psg_path in sorted(glob.glob(os.path.join(raw_dir, '*-PSG.edf'))):
+        night = os.path.basename(psg_path)[:6]
+        if night not in hypnograms:
+            print(f"Skipping {psg_path}: no hypnogram")
+            continue
+        X, y = load_edf_night(psg_path, hypnograms[night], channels)
+        np.savez_compressed(os.path.join(out_dir, f'{night}.npz'), X=X, y=y)
+        summary.append({'night': night, 'epochs': len(y), **{s: int((y == i).sum()) for i, s in enumerate(STAGES)}})
+    print(pd.DataFrame(summary).to_string(index=False) if summary else "No nights found.")
 
 if __name__ == "__main__":
-    preprocess_data()
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Epoch EDF sleep recordings for the sleep-stage model.")
+    parser.add_argument('--raw', default=os.path.join(base_dir, 'data', 'raw', 'edf'))
+    parser.add_argument('--out', default=os.path.join(base_dir, 'data', 'processed', 'epochs'))
+    parser.add_argument('--channels', nargs='*', default=None,
+                        help="Channels to keep, e.g. 'EEG Fpz-Cz' (default: all)")
+    args = parser.parse_args()
+    preprocess_data(args.raw, args.out, args.channels)
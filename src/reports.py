@@ -0,0 +1,194 @@
+"""Clinical report rendering from precompiled templates, single or in bulk."""
+import datetime
+import html
+import io
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from string import Template
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+except ImportError:  # PDF output is optional
+    canvas = None
+
+# Markdown bold markers and leading emoji badges ("⚠️ **Increase ...")
+_MARKUP_RE = re.compile(r'\*\*|^[^\x00-\x7F]+\s*')
+
+PROFILE_FIELDS = [
+    ('Gender', 'Gender', ''),
+    ('Age', 'Age', ''),
+    ('Occupation', 'Occupation', ''),
+    ('BMI Category', 'BMI', ''),
+    ('Sleep Duration', 'Sleep Duration', ' hrs'),
+    ('Sleep Quality', 'Quality of Sleep', '/10'),
+    ('Stress Level', 'Stress Level', '/10'),
+    ('Physical Activity', 'Physical Activity', ' mins/day'),
+    ('Heart Rate', 'Heart Rate', ' bpm'),
+    ('Daily Steps', 'Daily Steps', ''),
+    ('Blood Pressure', 'BP', ''),
+]
+
+TEXT_TEMPLATE = Template("""SLEEP HEALTH ANALYSIS REPORT
+Date: $date
+----------------------------------------
+USER PROFILE:
+$profile
+----------------------------------------
+ANALYSIS RESULT:
+Prediction: $prediction
+Risk Level: $risk/100
+----------------------------------------
+RECOMMENDATIONS:
+$recommendations
+""")
+
+HTML_TEMPLATE = Template("""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Sleep Health Analysis Report</title>
+<style>
+body { font-family: 'Inter', sans-serif; max-width: 720px; margin: 40px auto; color: #1A1D24; }
+h1 { color: #0E1117; border-bottom: 2px solid #00D9FF; padding-bottom: 8px; }
+td { padding: 2px 16px 2px 0; }
+.result { font-size: 1.2em; font-weight: 600; }
+</style></head>
+<body>
+<h1>Sleep Health Analysis Report</h1>
+<p>Date: $date</p>
+<h2>User Profile</h2>
+<table>$profile</table>
+<h2>Analysis Result</h2>
+<p class="result">Prediction: $prediction</p>
+<p>Risk Level: $risk/100</p>
+<h2>Recommendations</h2>
+<ul>$recommendations</ul>
+</body></html>
+""")
+
+
+def clean_text(text):
+    """Strips markdown bold markers and leading emoji from a recommendation."""
+    return _MARKUP_RE.sub('', text).strip()
+
+
+def _profile_rows(user_data):
+    return [(label, f"{user_data.get(key, 'N/A')}{unit if key in user_data else ''}")
+            for label, key, unit in PROFILE_FIELDS]
+
+
+def _date(record):
+    return record.get('date') or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def render_text(record):
+    """Renders one report as plain text.
+
+    A record holds 'user_data' (profile dict as built by the dashboard),
+    'prediction', 'risk', 'recommendations' and optionally 'date'.
+    """
+    return TEXT_TEMPLATE.substitute(
+        date=_date(record),
+        profile='\n'.join(f"- {label}: {value}" for label, value in _profile_rows(record['user_data'])),
+        prediction=record['prediction'],
+        risk=record['risk'],
+        recommendations='\n'.join(f"- {clean_text(rec)}" for rec in record['recommendations']),
+    )
+
+
+def render_html(record):
+    """Renders one report as a standalone HTML page."""
+    esc = html.escape
+    return HTML_TEMPLATE.substitute(
+        date=esc(_date(record)),
+        profile=''.join(f"<tr><td>{esc(label)}</td><td>{esc(str(value))}</td></tr>"
+                        for label, value in _profile_rows(record['user_data'])),
+        prediction=esc(str(record['prediction'])),
+        risk=esc(str(record['risk'])),
+        recommendations=''.join(f"<li>{esc(clean_text(rec))}</li>" for rec in record['recommendations']),
+    )
+
+
+def render_pdf(record):
+    """Renders one report as PDF bytes (requires reportlab)."""
+    if canvas is None:
+        raise ImportError("PDF reports require reportlab: pip install reportlab")
+    buf = io.BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=A4)
+    width, height = A4
+    y = height - 60
+    for line in render_text(record).splitlines():
+        if y < 50:
+            pdf.showPage()
+            y = height - 60
+        pdf.setFont('Helvetica-Bold' if line.isupper() else 'Helvetica', 11)
+        pdf.drawString(50, y, line)
+        y -= 16
+    pdf.save()
+    return buf.getvalue()
+
+
+RENDERERS = {
+    'txt': render_text,
+    'html': render_html,
+    'pdf': render_pdf,
+}
+
+
+def _render_one(args):
+    fmt, index, record = args
+    body = RENDERERS[fmt](record)
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    name = f"{record.get('patient_id', index)}_report.{fmt}"
+    return name, body
+
+
+def generate_reports(records, out_path, fmt='txt', workers=None, chunksize=32):
+    """Renders a batch of scored patients in parallel and streams them to disk.
+
+    out_path ending in '.zip' writes a single archive, anything else is
+    treated as a directory. Records are consumed in bounded slices, so
+    arbitrarily large (or generator) batches never sit in memory at once.
+    Returns the number of reports written.
+    """
+    if fmt not in RENDERERS:
+        raise ValueError(f"Unknown report format '{fmt}', expected one of {sorted(RENDERERS)}")
+    if fmt == 'pdf' and canvas is None:
+        raise ImportError("PDF reports require reportlab: pip install reportlab")
+
+    to_zip = out_path.endswith('.zip')
+    if to_zip:
+        sink = zipfile.ZipFile(out_path, 'w', compression=zipfile.ZIP_DEFLATED)
+        write = sink.writestr
+    else:
+        os.makedirs(out_path, exist_ok=True)
+
+        def write(name, body):
+            with open(os.path.join(out_path, name), 'wb') as f:
+                f.write(body)
+
+    workers = workers or os.cpu_count() or 1
+    slice_size = chunksize * workers * 4
+    written = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            batch = []
+            for index, record in enumerate(records):
+                batch.append((fmt, index, record))
+                if len(batch) == slice_size:
+                    written += _write_all(pool.map(_render_one, batch, chunksize=chunksize), write)
+                    batch = []
+            written += _write_all(pool.map(_render_one, batch, chunksize=chunksize), write)
+    finally:
+        if to_zip:
+            sink.close()
+    return written
+
+
+def _write_all(results, write):
+    count = 0
+    for name, body in results:
+        write(name, body)
+        count += 1
+    return count
@@ -0,0 +1,239 @@
+"""Bounded per-session dashboard state with disk spill and expiry.
+
+st.session_state lives in server memory for as long as a browser tab may
+come back, with no size limit. The dashboard keeps its per-patient state
+here instead, as compact records:
+
+- analysis history: a numpy structured array (14 bytes per analysis)
+  rather than a list of dicts holding datetime objects, with predictions
+  coded against a per-session label table
+- synced night: float32 vectors over fixed field names
+- latest analysis: its report zlib-compressed
+
+Each session's size is its serialized size. A session over
+session_budget sheds its oldest history rows. Sessions idle for
+idle_seconds, or the least recently used ones when the process is over
+total_budget, are written to spill_dir and dropped from memory; the next
+request restores them. Sessions unused for ttl_seconds are deleted from
+memory and disk.
+"""
+import os
+import time
+import zlib
+import pickle
+import datetime
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPILL_DIR = os.path.join(BASE_DIR, 'data', 'sessions')
+
+HISTORY_DTYPE = np.dtype([('timestamp', 'datetime64[s]'), ('prediction', 'u1'), ('risk', 'u1'), ('score', 'f4')])
+# Label table of sessions spilled before labels were stored per session
+LEGACY_LABELS = ('Healthy', 'Insomnia', 'Sleep Apnea')
+SYNC_FIELDS = ('heart_rate', 'steps', 'sleep_duration', 'sleep_quality')
+SYNC_INT_FIELDS = {'heart_rate', 'steps', 'sleep_quality'}
+
+
+class SessionState:
+    """One dashboard session's state, stored compactly."""
+
+    __slots__ = ('history', 'labels', 'synced', 'night_fields', 'night', 'analysis_fields', 'report',
+                 'simulation', 'trends', 'last_access', 'nbytes')
+
+    def __init__(self, trends=None):
+        self.history = np.empty(0, dtype=HISTORY_DTYPE)
+        self.labels = ()              # prediction code -> label, in order first seen
+        self.synced = None            # float32 values of SYNC_FIELDS
+        self.night_fields = ()        # names of the synced night's hypnogram metrics
+        self.night = None             # float32 values of night_fields
+        self.analysis_fields = None   # latest analysis, without its report
+        self.report = None            # zlib-compressed report text
+        self.simulation = None        # (score, label) of the last what-if run
+        self.trends = trends
+        self.last_access = time.time()
+        self.nbytes = 0
+
+    # --- History ---
+    def add_history(self, timestamp, prediction, risk, score):
+        # Labels come from whichever model served the analysis (tenant or bundle)
+        if prediction not in self.labels:
+            self.labels += (prediction,)
+        row = np.array([(np.datetime64(timestamp, 's'), self.labels.index(prediction), risk, score)],
+                       dtype=HISTORY_DTYPE)
+        self.history = np.concatenate([self.history, row])
+
+    def clear_history(self):
+        self.history = np.empty(0, dtype=HISTORY_DTYPE)
+        self.labels = ()
+
+    def history_frame(self):
+        return pd.DataFrame({
+            'timestamp': self.history['timestamp'].astype('datetime64[ns]'),
+            'prediction': np.asarray(self.labels, dtype=object)[self.history['prediction']],
+            'risk': self.history['risk'],
+            'score': self.history['score'],
+        })
+
+    # --- Synced night ---
+    def set_synced(self, synced):
+        self.synced = np.array([synced[k] for k in SYNC_FIELDS], dtype=np.float32)
+        metrics = synced.get('sleep_metrics', {})
+        self.night_fields = tuple(metrics)
+        self.night = np.array([metrics[k] for k in self.night_fields], dtype=np.float32)
+
+    @property
+    def synced_data(self):
+        """The synced night as the dict simulate_watch_sync returned ({} before any sync)."""
+        if self.synced is None:
+            return {}
+        data = {k: int(v) if k in SYNC_INT_FIELDS else round(float(v), 2) for k, v in zip(SYNC_FIELDS, self.synced)}
+        if self.night_fields:
+            data['sleep_metrics'] = {k: round(float(v), 4) for k, v in zip(self.night_fields, self.night)}
+        return data
+
+    # --- Latest analysis ---
+    def set_analysis(self, analysis):
+        fields = {k: v for k, v in analysis.items() if k != 'report'}
+        fields['timestamp'] = np.datetime64(analysis['timestamp'], 's')
+        self.analysis_fields = fields
+        self.report = zlib.compress(analysis['report'].encode('utf-8'))
+
+    @property
+    def analysis(self):
+        if self.analysis_fields is None:
+            return None
+        return {**self.analysis_fields,
+                'timestamp': self.analysis_fields['timestamp'].astype(datetime.datetime),
+                'report': zlib.decompress(self.report).decode('utf-8')}
+
+    # --- Persistence ---
+    def state(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_state(cls, state):
+        session = cls()
+        for name, value in state.items():
+            setattr(session, name, value)
+        if session.history.dtype != HISTORY_DTYPE:  # Spilled with integer scores and fixed labels
+            session.history = session.history.astype(HISTORY_DTYPE)
+            session.labels = LEGACY_LABELS
+        return session
+
+    def measure(self):
+        self.nbytes = len(pickle.dumps(self.state(), protocol=pickle.HIGHEST_PROTOCOL))
+        return self.nbytes
+
+
+class SessionStore:
+    """Process-wide map of session id -> SessionState with memory budgets."""
+
+    def __init__(self, session_budget=64 * 1024, total_budget=32 * 1024 * 1024, idle_seconds=600,
+                 ttl_seconds=24 * 3600, spill_dir=SPILL_DIR, sweep_every=60, new_trends=None):
+        self.session_budget = session_budget
+        self.total_budget = total_budget
+        self.idle_seconds = idle_seconds
+        self.ttl_seconds = ttl_seconds
+        self.spill_dir = spill_dir
+        self.sweep_every = sweep_every
+        self.new_trends = new_trends  # factory for a fresh session's TrendTracker
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0
+        self.spills = self.restores = self.evictions = self.trimmed_rows = 0
+
+    def _path(self, session_id):
+        if not session_id.isalnum():
+            raise ValueError(f"Invalid session id {session_id!r}")
+        return os.path.join(self.spill_dir, f'{session_id}.pkl')
+
+    def get(self, session_id):
+        """The session's state: in memory, restored from disk, or new."""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                path = self._path(session_id)
+                if os.path.exists(path):
+                    session = SessionState.from_state(joblib.load(path))
+                    os.remove(path)
+                    self.restores += 1
+                else:
+                    session = SessionState(self.new_trends() if self.new_trends else None)
+                session.measure()
+                self._sessions[session_id] = session
+            session.last_access = now
+        if now >= self._next_sweep:
+            self.sweep(now)
+        return session
+
+    def commit(self, session_id, session):
+        """Records a session's new size after changes, enforcing both budgets."""
+        with self._lock:
+            # Memory is authoritative: a copy spilled meanwhile is superseded
+            self._sessions[session_id] = session
+            path = self._path(session_id)
+            if os.path.exists(path):
+                os.remove(path)
+            while session.measure() > self.session_budget and len(session.history):
+                drop = max(1, len(session.history) // 4)
+                session.history = session.history[drop:]
+                self.trimmed_rows += drop
+            self._spill_over_budget(keep=session_id)
+
+    def sweep(self, now=None):
+        """Spills idle sessions and deletes expired ones (in memory and on disk)."""
+        now = now or time.time()
+        with self._lock:
+            self._next_sweep = now + self.sweep_every
+            for session_id, session in list(self._sessions.items()):
+                idle = now - session.last_access
+                if idle > self.ttl_seconds:
+                    del self._sessions[session_id]
+                    self.evictions += 1
+                elif idle > self.idle_seconds:
+                    self._spill(session_id)
+            if os.path.isdir(self.spill_dir):
+                for entry in os.scandir(self.spill_dir):
+                    if entry.name.endswith('.pkl') and now - entry.stat().st_mtime > self.ttl_seconds:
+                        os.remove(entry.path)
+                        self.evictions += 1
+
+    def _spill(self, session_id):
+        session = self._sessions.pop(session_id)
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = self._path(session_id)
+        joblib.dump(session.state(), path + '.tmp')
+        os.replace(path + '.tmp', path)
+        self.spills += 1
+
+    def _spill_over_budget(self, keep):
+        """Spills least recently used sessions until in-memory state fits total_budget."""
+        total = sum(s.nbytes for s in self._sessions.values())
+        for session_id, session in sorted(self._sessions.items(), key=lambda item: item[1].last_access):
+            if total <= self.total_budget:
+                break
+            if session_id != keep:
+                total -= session.nbytes
+                self._spill(session_id)
+
+    def stats(self):
+        with self._lock:
+            sizes = [s.nbytes for s in self._sessions.values()]
+            spilled = (sum(1 for e in os.scandir(self.spill_dir) if e.name.endswith('.pkl'))
+                       if os.path.isdir(self.spill_dir) else 0)
+        return {
+            'sessions': len(sizes),
+            'spilled': spilled,
+            'memory_bytes': sum(sizes),
+            'largest_session_bytes': max(sizes, default=0),
+            'session_budget': self.session_budget,
+            'total_budget': self.total_budget,
+            'spills': self.spills,
+            'restores': self.restores,
+            'evictions': self.evictions,
+            'trimmed_rows': self.trimmed_rows,
+        }
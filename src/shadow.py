@@ -0,0 +1,80 @@
+"""Shadow scoring: run a candidate model on live traffic off the request path."""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+class ShadowScorer:
+    """Scores each live request with a candidate model on a background thread.
+
+    The live path only pays for a queue submit. Requests are dropped (and
+    counted) rather than queued once `max_pending` candidate jobs are waiting,
+    so a slow candidate can never build up memory or delay users.
+    """
+
+    def __init__(self, candidate, classes, max_workers=1, max_pending=100, latency_window=1000):
+        self.candidate = candidate
+        self.classes = list(classes)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='shadow')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.n = 0
+        self.agree = 0
+        self.dropped = 0
+        self.errors = 0
+        # Rows: live prediction, columns: candidate prediction
+        self.confusion = np.zeros((len(self.classes), len(self.classes)), dtype=np.int64)
+        self.live_latency = deque(maxlen=latency_window)
+        self.candidate_latency = deque(maxlen=latency_window)
+
+    def submit(self, X, live_pred, live_latency):
+        """Queues X for candidate scoring; live_pred is the encoded live label."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending += 1
+        self._executor.submit(self._score, X, int(live_pred), live_latency)
+
+    def _score(self, X, live_pred, live_latency):
+        try:
+            start = time.perf_counter()
+            cand_pred = int(self.candidate.predict(X)[0])
+            cand_latency = time.perf_counter() - start
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                self.errors += 1
+            return
+        with self._lock:
+            self._pending -= 1
+            self.n += 1
+            self.agree += cand_pred == live_pred
+            self.confusion[live_pred, cand_pred] += 1
+            self.live_latency.append(live_latency)
+            self.candidate_latency.append(cand_latency)
+
+    def summary(self):
+        """Returns agreement, latency and confusion statistics so far."""
+        with self._lock:
+            live = np.array(self.live_latency) * 1000
+            cand = np.array(self.candidate_latency) * 1000
+            confusion = pd.DataFrame(self.confusion.copy(), index=self.classes, columns=self.classes)
+            stats = {
+                'requests': self.n,
+                'agreement': self.agree / self.n if self.n else None,
+                'dropped': self.dropped,
+                'errors': self.errors,
+            }
+        for name, lat in (('live', live), ('candidate', cand)):
+            stats[f'{name}_ms_mean'] = float(lat.mean()) if len(lat) else None
+            stats[f'{name}_ms_p95'] = float(np.percentile(lat, 95)) if len(lat) else None
+        stats['confusion'] = confusion
+        return stats
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
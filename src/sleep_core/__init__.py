@@ -0,0 +1,17 @@
+"""Headless scoring core shared by the dashboard, the app, batch jobs and CLIs.
+
+    from sleep_core import load_artifacts, encode, analyze
+    model, le, occupation_encoder = load_artifacts()
+    X = encode('Male', 30, 'Engineer', 6.5, 6, 45, 5, 'Normal', 72, 8000, 120, 80, occupation_encoder)
+    result = analyze(model, le, X, user_data)
+
+Importing the package loads no UI libraries (Streamlit, Plotly), and numpy,
+pandas and joblib are imported on first use, so workers and CLIs import it
+in milliseconds.
+"""
+from .encoding import BMI_CODES, encode, encode_batch, split_blood_pressure
+from .scoring import sleep_score
+from .rules import RISK_LEVELS, risk_level, validate_override, validate_overrides, recommend
+from .model import MODELS_DIR, load_artifacts, load_feature_profile, predict, predict_codes
+from .report import report
+from .pipeline import analyze
@@ -0,0 +1,76 @@
+"""Patient inputs -> the model's feature frame."""
+
+BMI_CODES = {'Normal': 0, 'Overweight': 1, 'Obese': 2}
+
+
+def encode(gender, age, occupation, sleep_duration, quality_of_sleep, physical_activity, stress_level, bmi_category, heart_rate, daily_steps, bp_systolic, bp_diastolic, occupation_encoder=None, trend_features=None, sleep_metrics=None):
+    """Encodes one patient into a single-row DataFrame for the model.
+
+    sleep_metrics (stage percentages and sleep architecture from a
+    hypnogram, see src/hypnogram.py, and the night's HRV, see src/hrv.py)
+    and trend_features (multi-night trends, see src/trend_features.py) add
+    columns for models trained with them, in that order.
+    """
+    import pandas as pd
+    from hypnogram import SLEEP_METRIC_FEATURES
+    from hrv import HRV_FEATURES
+
+    gender_val = 0 if gender == 'Male' else 1
+    bmi_val = BMI_CODES.get(bmi_category, 0)
+
+    # Encode occupation if encoder is available (unseen occupations go to its OTHER bucket)
+    occupation_val = 0  # Default
+    if occupation_encoder is not None:
+        occupation_val = occupation_encoder.encode(occupation)
+
+    input_data = pd.DataFrame({
+        'Gender': [gender_val],
+        'Age': [age],
+        'Occupation': [occupation_val],
+        'Sleep Duration': [sleep_duration],
+        'Quality of Sleep': [quality_of_sleep],
+        'Physical Activity Level': [physical_activity],
+        'Stress Level': [stress_level],
+        'BMI Category': [bmi_val],
+        'Heart Rate': [heart_rate],
+        'Daily Steps': [daily_steps],
+        'BP_Systolic': [bp_systolic],
+        'BP_Diastolic': [bp_diastolic]
+    })
+    sleep_metrics = sleep_metrics or {}
+    for name in SLEEP_METRIC_FEATURES + HRV_FEATURES:
+        if name in sleep_metrics:
+            input_data[name] = [sleep_metrics[name]]
+    for name, value in (trend_features or {}).items():
+        input_data[name] = [value]
+    return input_data
+
+
+def encode_batch(raw, occupation_encoder=None):
+    """Vectorized encode for many patients at once.
+
+    raw has the dataset's column names, with blood pressure already split
+    into BP_Systolic/BP_Diastolic. Encodes exactly as encode does.
+    """
+    import numpy as np
+    import pandas as pd
+
+    out = pd.DataFrame({
+        'Gender': np.where(raw['Gender'] == 'Male', 0, 1),
+        'Age': raw['Age'].to_numpy(),
+        'Occupation': 0,
+    }, index=raw.index)
+    if occupation_encoder is not None:
+        out['Occupation'] = occupation_encoder.transform(raw['Occupation'])
+    for col in ['Sleep Duration', 'Quality of Sleep', 'Physical Activity Level', 'Stress Level']:
+        out[col] = raw[col].to_numpy()
+    out['BMI Category'] = raw['BMI Category'].map(BMI_CODES).fillna(0).astype(int)
+    for col in ['Heart Rate', 'Daily Steps', 'BP_Systolic', 'BP_Diastolic']:
+        out[col] = raw[col].to_numpy()
+    return out.reset_index(drop=True)
+
+
+def split_blood_pressure(raw):
+    """Splits the dataset's 'Blood Pressure' ('126/83') into BP_Systolic/BP_Diastolic."""
+    bp = raw['Blood Pressure'].str.split('/', expand=True).astype(int)
+    return raw.assign(BP_Systolic=bp[0], BP_Diastolic=bp[1])
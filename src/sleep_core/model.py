@@ -0,0 +1,72 @@
+"""Model artifacts and prediction."""
+import os
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'models')
+
+
+def load_artifacts(models_dir=MODELS_DIR, version=None):
+    """Loads the trained model, label encoder and occupation encoder (None if not trained).
+
+    Prefers the active bundle under models_dir/bundles (see src/model_bundle.py),
+    or bundle `version` when given, which is verified as it loads; falls back
+    to the loose pickles.
+    """
+    import joblib
+    from category_encoder import load_category_encoder
+    from model_bundle import current_version, load_bundle
+
+    bundles_dir = os.path.join(models_dir, 'bundles')
+    if version or current_version(bundles_dir):
+        bundle = load_bundle(version, bundles_dir=bundles_dir)
+        return bundle.model, bundle.label_encoder, bundle.occupation_encoder
+
+    model_path = os.path.join(models_dir, 'sleep_model_fast.pkl')
+    le_path = os.path.join(models_dir, 'label_encoder.pkl')
+    occupation_encoder_path = os.path.join(models_dir, 'occupation_encoder.pkl')
+
+    if not os.path.exists(model_path):
+        return None, None, None
+
+    model = joblib.load(model_path)
+    le = joblib.load(le_path)
+
+    # Load occupation encoder if exists
+    occupation_encoder = None
+    if os.path.exists(occupation_encoder_path):
+        occupation_encoder = load_category_encoder(occupation_encoder_path)
+
+    return model, le, occupation_encoder
+
+
+def load_feature_profile(models_dir=MODELS_DIR, version=None):
+    """Loads the training feature histograms used for drift monitoring (None if absent).
+
+    Taken from the same place load_artifacts takes the model from.
+    """
+    import joblib
+    from model_bundle import current_version, load_bundle
+
+    bundles_dir = os.path.join(models_dir, 'bundles')
+    if version or current_version(bundles_dir):
+        return load_bundle(version, bundles_dir=bundles_dir, only=('feature_profile',)).feature_profile
+    profile_path = os.path.join(models_dir, 'feature_profile.pkl')
+    if not os.path.exists(profile_path):
+        return None
+    return joblib.load(profile_path)
+
+
+def predict_codes(model, X, early_exit=None):
+    """Returns (encoded labels, trees used per row or None).
+
+    early_exit, an EarlyExitForest over model (see src/early_exit.py), stops
+    evaluating trees once each row's vote is settled.
+    """
+    if early_exit is not None:
+        return early_exit.predict(X)
+    return model.predict(X), None
+
+
+def predict(model, le, X, early_exit=None):
+    """Returns (disorder labels, trees used per row or None)."""
+    codes, used = predict_codes(model, X, early_exit)
+    return le.inverse_transform(codes), used
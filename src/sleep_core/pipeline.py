@@ -0,0 +1,44 @@
+"""Full single-patient analysis: predict, override, risk, recommendations, report."""
+import time
+import datetime
+from .model import predict_codes
+from .rules import risk_level, validate_override, recommend
+from .report import report
+
+
+def analyze(model, le, X, user_data, early_exit=None, on_progress=None, on_predict=None):
+    """Analyzes one encoded patient (X from encode) given its raw user_data.
+
+    user_data uses the report's keys ('Sleep Duration', 'Quality of Sleep',
+    'Stress Level', 'Physical Activity', 'BMI', 'Heart Rate', ...).
+    on_progress(fraction, message) is called between stages and
+    on_predict(encoded labels, latency in seconds) right after the model runs.
+    """
+    progress = on_progress or (lambda fraction, message: None)
+    progress(0.1, 'Running model...')
+    start = time.perf_counter()
+    codes, used = predict_codes(model, X, early_exit)
+    if on_predict:
+        on_predict(codes, time.perf_counter() - start)
+
+    prediction_label = validate_override(
+        le.inverse_transform(codes)[0], user_data['Sleep Duration'],
+        user_data['Stress Level'], user_data['Quality of Sleep'], user_data['Heart Rate']
+    )
+    risk_val = risk_level(prediction_label)
+
+    progress(0.6, 'Generating recommendations...')
+    recs = recommend(
+        user_data['Sleep Duration'], user_data['Quality of Sleep'], user_data['Stress Level'],
+        user_data['Physical Activity'], user_data['BMI'], user_data['Heart Rate']
+    )
+
+    progress(0.8, 'Writing report...')
+    return {
+        'timestamp': datetime.datetime.now(),
+        'prediction': prediction_label,
+        'risk': risk_val,
+        'recommendations': recs,
+        'report': report(user_data, prediction_label, risk_val, recs),
+        'trees_used': int(used[0]) if used is not None else None,
+    }
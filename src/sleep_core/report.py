@@ -0,0 +1,12 @@
+"""Clinical report for one analysis (templates live in src/reports.py)."""
+
+
+def report(user_data, prediction_label, risk_val, recommendations, fmt='txt'):
+    """Renders the report as text ('txt'), HTML ('html') or PDF bytes ('pdf')."""
+    from reports import RENDERERS
+    return RENDERERS[fmt]({
+        'user_data': user_data,
+        'prediction': prediction_label,
+        'risk': risk_val,
+        'recommendations': recommendations,
+    })
@@ -0,0 +1,70 @@
+"""Rule layer on top of the model: clinical overrides, risk levels and recommendations."""
+
+# Risk score shown for each final diagnosis
+RISK_LEVELS = {'Healthy': 15, 'Insomnia': 65, 'Sleep Apnea': 92}
+
+
+def risk_level(prediction_label):
+    return RISK_LEVELS.get(prediction_label, 0)
+
+
+def validate_override(prediction_label, sleep_duration, stress_level, quality_of_sleep, heart_rate):
+    """Validation Layer - Overrides the model if obvious issues are detected."""
+    if sleep_duration < 5:
+        return 'Insomnia'
+    if sleep_duration > 10:
+        return 'Sleep Apnea'
+    if stress_level >= 9 and quality_of_sleep <= 3:
+        return 'Insomnia'
+    if (heart_rate > 100 or heart_rate < 50) and prediction_label == 'Healthy':
+        return 'Sleep Apnea'
+    return prediction_label
+
+
+def validate_overrides(prediction_labels, sleep_duration, stress_level, quality_of_sleep, heart_rate):
+    """validate_override for arrays of patients (same rules, same order of precedence)."""
+    import numpy as np
+
+    labels = np.asarray(prediction_labels, dtype=object)
+    sleep_duration, stress_level = np.asarray(sleep_duration), np.asarray(stress_level)
+    quality_of_sleep, heart_rate = np.asarray(quality_of_sleep), np.asarray(heart_rate)
+    return np.select(
+        [sleep_duration < 5, sleep_duration > 10, (stress_level >= 9) & (quality_of_sleep <= 3),
+         ((heart_rate > 100) | (heart_rate < 50)) & (labels == 'Healthy')],
+        ['Insomnia', 'Sleep Apnea', 'Insomnia', 'Sleep Apnea'], labels)
+
+
+def recommend(duration, quality, stress, activity, bmi, heart_rate):
+    """Generates personalized recommendations based on health metrics."""
+    recommendations = []
+
+    # Sleep Duration
+    if duration < 6.0:
+        recommendations.append("Increase Sleep Duration: Aim for at least 7 hours. Consistent lack of sleep increases health risks.")
+    elif duration > 9.0:
+        recommendations.append("Regulate Sleep Pattern: Oversleeping can indicate underlying issues. Try to stick to a consistent 7-8 hour schedule.")
+
+    # Sleep Quality
+    if quality < 6:
+        recommendations.append("Improve Sleep Hygiene: Low sleep quality detected. Avoid screens before bed, keep your room cool, and limit caffeine.")
+
+    # Stress
+    if stress > 6:
+        recommendations.append("Manage Stress: High stress negatively impacts sleep. Consider meditation, deep breathing, or yoga.")
+
+    # Physical Activity
+    if activity < 30:
+        recommendations.append("Get Moving: Regular physical activity (30+ mins/day) promotes deeper sleep.")
+
+    # BMI
+    if bmi != 'Normal':
+        recommendations.append("Watch Your Weight: Maintaining a healthy weight reduces the risk of sleep apnea and insomnia.")
+
+    # Heart Rate
+    if heart_rate > 80:
+        recommendations.append("Monitor Heart Rate: Resting heart rate is slightly high. Regular cardio and stress reduction can help.")
+
+    if not recommendations:
+        recommendations.append("Excellent Habits: Your metrics suggest good sleep health. Keep it up!")
+
+    return recommendations
@@ -0,0 +1,26 @@
+"""Sleep Score (0-100) from the patient's sleep, stress, activity and heart-rate inputs."""
+
+
+def sleep_score(duration, quality, stress, activity, heart_rate):
+    """Sleep Score (0-100). Works on single values or numpy arrays of patients."""
+    import numpy as np
+
+    # Duration (30 points)
+    in_range = (duration >= 7) & (duration <= 9)
+    near_range = ((duration >= 6) & (duration < 7)) | ((duration > 9) & (duration <= 10))
+    score = np.where(in_range, 30, np.where(near_range, 20, 10))
+
+    # Quality (25 points)
+    score = score + (quality / 10) * 25
+
+    # Stress (20 points)
+    score = score + ((10 - stress) / 10) * 20
+
+    # Activity (15 points)
+    score = score + np.where(activity >= 30, 15, (activity / 30) * 15)
+
+    # Heart Rate (10 points)
+    hr_points = np.where((heart_rate >= 60) & (heart_rate <= 80), 10,
+                         np.maximum(0, 10 - np.abs(heart_rate - 70) / 5))
+    score = np.minimum(100, np.round(score + hr_points)).astype(int)
+    return int(score) if score.ndim == 0 else score
@@ -0,0 +1,159 @@
+"""1D-CNN sleep-stage classifier over 30-second epochs, trained and served on CPU.
+
+Train on the epoch arrays written by preprocessing.py:
+    python3 src/sleep_stager.py train --tflite
+Summarize a night (one .npz of epochs) for the disorder classifier:
+    python3 src/sleep_stager.py summarize data/processed/epochs/SC4001.npz
+"""
+import os
+# Serving hosts have no GPU; keep TensorFlow from probing for one
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '-1')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+import glob
+import argparse
+import numpy as np
+import tensorflow as tf
+from preprocessing import STAGES
+from hypnogram import STAGE_FEATURES
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EPOCHS_DIR = os.path.join(BASE_DIR, 'data', 'processed', 'epochs')
+MODEL_PATH = os.path.join(BASE_DIR, 'models', 'sleep_stager.keras')
+
+
+def build_model(epoch_len, n_channels, n_stages=len(STAGES)):
+    """Small 1D-CNN: a wide strided first layer, then two narrow conv blocks."""
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(epoch_len, n_channels)),
+        tf.keras.layers.Conv1D(32, 50, strides=6, activation='relu'),
+        tf.keras.layers.MaxPooling1D(8),
+        tf.keras.layers.Dropout(0.3),
+        tf.keras.layers.Conv1D(64, 8, padding='same', activation='relu'),
+        tf.keras.layers.Conv1D(64, 8, padding='same', activation='relu'),
+        tf.keras.layers.MaxPooling1D(4),
+        tf.keras.layers.GlobalAveragePooling1D(),
+        tf.keras.layers.Dense(64, activation='relu'),
+        tf.keras.layers.Dropout(0.3),
+        tf.keras.layers.Dense(n_stages, activation='softmax'),
+    ])
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def load_nights(epochs_dir=EPOCHS_DIR):
+    """Returns a list of (X, y) epoch arrays, one per night."""
+    paths = sorted(glob.glob(os.path.join(epochs_dir, '*.npz')))
+    if not paths:
+        raise FileNotFoundError(f"No epoch files in {epochs_dir}; run src/preprocessing.py first")
+    nights = []
+    for path in paths:
+        data = np.load(path)
+        nights.append((data['X'], data['y']))
+    return nights
+
+
+def train_stager(epochs_dir=EPOCHS_DIR, model_path=MODEL_PATH, epochs=20, batch_size=128, tflite=False):
+    """Trains on all nights but the last 20%, which are held out whole."""
+    nights = load_nights(epochs_dir)
+    n_val = max(1, len(nights) // 5) if len(nights) > 1 else 0
+    train_nights = nights[:len(nights) - n_val]
+    X = np.concatenate([x for x, _ in train_nights])
+    y = np.concatenate([y for _, y in train_nights])
+    val = None
+    if n_val:
+        val = (np.concatenate([x for x, _ in nights[-n_val:]]), np.concatenate([y for _, y in nights[-n_val:]]))
+
+    # Stages are heavily imbalanced (N2 dominates, N1 is rare)
+    counts = np.bincount(y, minlength=len(STAGES))
+    class_weight = {i: len(y) / (len(STAGES) * c) for i, c in enumerate(counts) if c}
+
+    print(f"Training on {len(X)} epochs from {len(train_nights)} nights...")
+    model = build_model(X.shape[1], X.shape[2])
+    model.fit(X, y, validation_data=val, epochs=epochs, batch_size=batch_size,
+              class_weight=class_weight, verbose=2)
+    if val is not None:
+        loss, acc = model.evaluate(*val, batch_size=batch_size, verbose=0)
+        print(f"Held-out nights accuracy: {acc:.3f}")
+
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    model.save(model_path)
+    print(f"Saved model to {model_path}")
+    if tflite:
+        export_tflite(model, os.path.splitext(model_path)[0] + '.tflite')
+    return model
+
+
+def export_tflite(model, path):
+    """Exports a compact, dynamic-range quantized TFLite model."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    print(f"Saved TFLite model to {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+
+
+class SleepStager:
+    """Batched CPU inference over a whole night of epochs.
+
+    Loads either the Keras model or its TFLite export. A night (~1000
+    epochs) is scored in a handful of large batches rather than one call
+    per epoch.
+    """
+
+    def __init__(self, path=MODEL_PATH, batch_size=512):
+        self.batch_size = batch_size
+        self.interpreter = None
+        if path.endswith('.tflite'):
+            self.interpreter = tf.lite.Interpreter(model_path=path)
+        else:
+            self.model = tf.keras.models.load_model(path)
+
+    def predict_proba(self, epochs):
+        epochs = np.asarray(epochs, dtype=np.float32)
+        if self.interpreter is None:
+            return np.concatenate([
+                self.model(epochs[i:i + self.batch_size], training=False).numpy()
+                for i in range(0, len(epochs), self.batch_size)
+            ])
+        # TFLite: resize the input to the whole night and run a single invoke
+        inp = self.interpreter.get_input_details()[0]
+        out = self.interpreter.get_output_details()[0]
+        self.interpreter.resize_tensor_input(inp['index'], epochs.shape)
+        self.interpreter.allocate_tensors()
+        self.interpreter.set_tensor(inp['index'], epochs)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(out['index'])
+
+    def predict_night(self, epochs):
+        """Returns one stage index (see preprocessing.STAGES) per epoch."""
+        return self.predict_proba(epochs).argmax(axis=1)
+
+
+def stage_summary(stages):
+    """Percentage of the night's epochs spent in each stage."""
+    stages = np.asarray(stages)
+    counts = np.bincount(stages, minlength=len(STAGES))
+    pct = 100.0 * counts / max(len(stages), 1)
+    return dict(zip(STAGE_FEATURES, pct.round(2)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train or run the sleep-stage model.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_train = sub.add_parser('train', help="Train on epoch arrays from preprocessing.py")
+    p_train.add_argument('--data', default=EPOCHS_DIR)
+    p_train.add_argument('--out', default=MODEL_PATH)
+    p_train.add_argument('--epochs', type=int, default=20)
+    p_train.add_argument('--tflite', action='store_true', help="Also export a quantized .tflite model")
+    p_sum = sub.add_parser('summarize', help="Stage a night (.npz with X) and print its summary")
+    p_sum.add_argument('night')
+    p_sum.add_argument('--model', default=MODEL_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        train_stager(args.data, args.out, epochs=args.epochs, tflite=args.tflite)
+    else:
+        stages = SleepStager(args.model).predict_night(np.load(args.night)['X'])
+        for name, value in stage_summary(stages).items():
+            print(f"{name}: {value:.1f}%")
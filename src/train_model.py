@@ -2,71 +2,112 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report
+from sklearn.metrics import accuracy_score, classification_report, f1_score
 from sklearn.preprocessing import LabelEncoder
-import joblib
 import os
+import argparse
+from trend_features import add_trend_features
+from drift import build_feature_profile
+from data_loader import load_dataset
+from category_encoder import CategoryEncoder, as_category_encoder
+from model_bundle import write_bundle, activate, current_version, dump_atomic, BUNDLES_DIR
 
-def train():
-    # Define paths
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_path = os.path.join(base_dir, 'data', 'raw', 'Sleep_health_and_lifestyle_dataset.csv')
-    model_path = os.path.join(base_dir, 'models', 'sleep_model_fast.pkl')
-    le_path = os.path.join(base_dir, 'models', 'label_encoder.pkl')
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, 'data', 'raw', 'Sleep_health_and_lifestyle_dataset.csv')
+# Occupations with fewer training rows share the encoder's OTHER bucket
+RARE_OCCUPATION_COUNT = 5
+# Forest settings for full training (and the out-of-fold evaluation in evaluation.py)
+MODEL_PARAMS = {'n_estimators': 100, 'random_state': 42}
+
+def load_training_data(data_path=DATA_PATH, le=None, occupation_encoder=None):
+    """Loads the dataset and applies the training preprocessing.
 
+    Returns the feature matrix X, encoded target y, and the fitted target
+    and occupation encoders. Passing the deployed encoders reuses them
+    instead of fitting new ones (unseen occupations go to the OTHER bucket).
+    """
     print(f"Loading data from {data_path}...")
-    df = pd.read_csv(data_path)
+    quarantine_path = os.path.join(BASE_DIR, 'data', 'quarantine', os.path.basename(data_path) + '.rejected.csv')
+    df, quarantined = load_dataset(data_path, quarantine_path=quarantine_path)
+    if len(quarantined):
+        print(f"Quarantined {len(quarantined)} invalid rows to {quarantine_path}")
 
     # 1. Data Preprocessing
     
-    # Drop Person ID
-    if 'Person ID' in df.columns:
-        df = df.drop(columns=['Person ID'])
-
     # Handle Gender: Convert to 0/1
     gender_map = {'Male': 0, 'Female': 1}
-    df['Gender'] = df['Gender'].map(gender_map)
+    df['Gender'] = df['Gender'].map(gender_map).astype('float32')
     df['Gender'] = df['Gender'].fillna(0) 
 
-    # Handle Occupation: Label Encoding
-    from sklearn.preprocessing import LabelEncoder
+    # Handle Occupation: indexed encoding, rare and unseen occupations share one bucket
     if 'Occupation' in df.columns:
-        occupation_encoder = LabelEncoder()
-        df['Occupation'] = occupation_encoder.fit_transform(df['Occupation'].fillna('Other'))
-        # Save occupation encoder for later use
-        occupation_encoder_path = os.path.join(base_dir, 'models', 'occupation_encoder.pkl')
-        joblib.dump(occupation_encoder, occupation_encoder_path)
+        occupations = df['Occupation'].astype(object).fillna('Other')
+        if occupation_encoder is None:
+            occupation_encoder = CategoryEncoder(min_count=RARE_OCCUPATION_COUNT).fit(occupations)
+        occupation_encoder = as_category_encoder(occupation_encoder)
+        df['Occupation'] = occupation_encoder.transform(occupations)
         print(f"Occupation classes: {occupation_encoder.classes_}")
 
     # Handle BMI Category: 0=Normal, 1=Overweight, 2=Obese
     bmi_map = {'Normal': 0, 'Normal Weight': 0, 'Overweight': 1, 'Obese': 2}
-    df['BMI Category'] = df['BMI Category'].map(bmi_map)
-    
-    # Handle Blood Pressure: Split '126/83'
-    df[['BP_Systolic', 'BP_Diastolic']] = df['Blood Pressure'].str.split('/', expand=True).astype(int)
-    df = df.drop(columns=['Blood Pressure'])
-
-    # Target Variable: Sleep Disorder
-    # Replace NaN/None with 'Healthy'
-    df['Sleep Disorder'] = df['Sleep Disorder'].fillna('Healthy')
-    df['Sleep Disorder'] = df['Sleep Disorder'].replace('None', 'Healthy')
+    df['BMI Category'] = df['BMI Category'].map(bmi_map).astype('int8')
     
+    # Blood Pressure ('126/83') is already split into BP_Systolic/BP_Diastolic by the loader
+
+    # Longitudinal data (one row per person per night): append rolling trend
+    # features after the snapshot columns, matching sleep_core.encode's order
+    if 'Night' in df.columns and 'Person ID' in df.columns:
+        df = add_trend_features(df, user_col='Person ID', night_col='Night')
+        df = df.drop(columns=['Night'])
+
+    # Drop Person ID
+    if 'Person ID' in df.columns:
+        df = df.drop(columns=['Person ID'])
+
+    # Target Variable: Sleep Disorder (missing/None already mapped to 'Healthy' by the loader)
     # Encode Target
-    le = LabelEncoder()
-    df['Sleep Disorder'] = le.fit_transform(df['Sleep Disorder'])
+    if le is None:
+        le = LabelEncoder()
+        df['Sleep Disorder'] = le.fit_transform(df['Sleep Disorder'])
+    else:
+        codes = pd.Categorical(df['Sleep Disorder'], categories=le.classes_).codes
+        if (codes < 0).any():
+            raise ValueError(f"Unknown target labels: {sorted(set(df['Sleep Disorder'][codes < 0]))}")
+        df['Sleep Disorder'] = codes.astype('int64')
     
     print("Target Classes:", le.classes_)
 
-    # 2. Model Training
     X = df.drop(columns=['Sleep Disorder'])
     y = df['Sleep Disorder']
-    
+    return X, y, le, occupation_encoder
+
+def split_data(X, y):
+    """The fixed train/test split every model in this project is evaluated on."""
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+def train(candidate=False, data_path=DATA_PATH):
+    """Trains the forest; candidate=True writes a shadow model and leaves the live files alone."""
+    # Define paths
+    model_name = 'sleep_model_candidate.pkl' if candidate else 'sleep_model_fast.pkl'
+    model_path = os.path.join(BASE_DIR, 'models', model_name)
+    le_path = os.path.join(BASE_DIR, 'models', 'label_encoder.pkl')
+    occupation_encoder_path = os.path.join(BASE_DIR, 'models', 'occupation_encoder.pkl')
+    profile_path = os.path.join(BASE_DIR, 'models', 'feature_profile.pkl')
+
+    le = occupation_encoder = None
+    if candidate:
+        # Shadow scoring feeds a candidate the rows encoded for the live model, so it is trained on the same codes
+        from sleep_core import load_artifacts
+        _, le, occupation_encoder = load_artifacts()
+    X, y, le, occupation_encoder = load_training_data(data_path, le, occupation_encoder)
+
+    # 2. Model Training
     print("Features:", X.columns.tolist())
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = split_data(X, y)
 
     print("Training Random Forest Classifier...")
-    rf = RandomForestClassifier(n_estimators=100, random_state=42)
+    rf = RandomForestClassifier(**MODEL_PARAMS)
     rf.fit(X_train, y_train)
 
     # Evaluation
@@ -76,9 +117,115 @@ def train():
 
     # 3. Saving
     print(f"Saving model to {model_path}...")
-    joblib.dump(rf, model_path)
-    joblib.dump(le, le_path)
+    dump_atomic(rf, model_path)
+    if not candidate:
+        # A candidate is scored with the live encoders, so only a full deploy writes them
+        dump_atomic(le, le_path)
+        if occupation_encoder is not None:
+            dump_atomic(occupation_encoder, occupation_encoder_path)
+        # Training input histograms, the reference for serving-time drift checks
+        profile = build_feature_profile(X_train)
+        dump_atomic(profile, profile_path)
+        version = write_bundle(rf, le, occupation_encoder, profile, evaluate(rf, X_test, y_test),
+                               MODEL_PARAMS, data_path)
+        print(f"Active bundle: {activate(version)}")
     print("Done.")
 
+def evaluate(model, X, y):
+    y_pred = model.predict(X)
+    return {'accuracy': accuracy_score(y, y_pred), 'macro_f1': f1_score(y, y_pred, average='macro')}
+
+def update(new_data_path, n_new_trees=20, retire=0, holdout=0.2, tolerance=0.01,
+           candidate=False, reference_path=DATA_PATH):
+    """Incrementally updates the deployed forest with newly accumulated data.
+
+    Adds n_new_trees fitted on the new rows (warm_start) and retires the
+    `retire` oldest trees. The latest `holdout` share of the new rows (file
+    order = arrival order) is held out, together with the fixed test split
+    of reference_path. The update is saved only if accuracy and macro F1 on
+    both stay within tolerance of the deployed forest.
+    """
+    from sleep_core import load_artifacts, load_feature_profile
+
+    out_path = os.path.join(BASE_DIR, 'models', 'sleep_model_candidate.pkl' if candidate else 'sleep_model_fast.pkl')
+    # The active bundle when there is one (it may have been rolled back), else the loose files;
+    # pinned so every artifact of the update comes from the same bundle
+    version = current_version(BUNDLES_DIR)
+    deployed, le, occupation_encoder = load_artifacts(version=version)
+    if n_new_trees < 1:
+        raise ValueError(f"--new-trees must be at least 1, got {n_new_trees}")
+    if not 0 <= retire < len(deployed.estimators_):
+        raise ValueError(f"--retire must be between 0 and {len(deployed.estimators_) - 1} "
+                         f"(the deployed forest has {len(deployed.estimators_)} trees), got {retire}")
+
+    X_new, y_new, _, _ = load_training_data(new_data_path, le, occupation_encoder)
+    features = list(deployed.feature_names_in_)
+    missing = set(features) - set(X_new.columns)
+    if missing:
+        raise ValueError(f"New data lacks model features: {sorted(missing)}")
+    X_new = X_new[features]
+    n_fit = int(len(X_new) * (1 - holdout))
+    X_fit, y_fit = X_new.iloc[:n_fit], y_new.iloc[:n_fit]
+    # Existing trees vote over every class, so the new trees must see them all
+    absent = set(range(len(le.classes_))) - set(y_fit)
+    if absent:
+        raise ValueError(f"New data has no {list(le.classes_[sorted(absent)])} rows; "
+                         "accumulate more data or run a full retrain")
+
+    X_ref, y_ref, _, _ = load_training_data(reference_path, le, occupation_encoder)
+    _, X_ref_test, _, y_ref_test = split_data(X_ref[features], y_ref)
+    windows = {'new data (held out)': (X_new.iloc[n_fit:], y_new.iloc[n_fit:]),
+               'reference test split': (X_ref_test, y_ref_test)}
+
+    print(f"Warm-starting {n_new_trees} trees on {n_fit} new rows...")
+    rf, _, _ = load_artifacts(version=version)
+    rf.set_params(warm_start=True, n_estimators=len(rf.estimators_) + n_new_trees)
+    rf.fit(X_fit, y_fit)
+    if retire:
+        rf.estimators_ = rf.estimators_[retire:]
+        rf.n_estimators = len(rf.estimators_)
+    rf.set_params(warm_start=False)
+    print(f"Forest now has {rf.n_estimators} trees ({retire} oldest retired)")
+
+    passed = True
+    for name, (X_eval, y_eval) in windows.items():
+        if not len(X_eval):
+            continue
+        before, after = evaluate(deployed, X_eval, y_eval), evaluate(rf, X_eval, y_eval)
+        for metric in before:
+            ok = after[metric] >= before[metric] - tolerance
+            passed &= ok
+            print(f"{name:<22} {metric:<9} deployed {before[metric]:.3f} -> updated {after[metric]:.3f}"
+                  f"{'' if ok else '  REGRESSION'}")
+
+    if not passed:
+        print("Metrics did not hold; keeping the deployed model.")
+        return None
+    print(f"Saving updated model to {out_path}...")
+    dump_atomic(rf, out_path)
+    if not candidate:
+        # The update keeps the drift reference of the forest it extends
+        profile = load_feature_profile(version=version)
+        version = write_bundle(rf, le, occupation_encoder, profile, evaluate(rf, X_ref_test, y_ref_test),
+                               rf.get_params(), new_data_path)
+        print(f"Active bundle: {activate(version)}")
+    return rf
+
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the sleep disorder classifier.")
+    parser.add_argument('--candidate', action='store_true',
+                        help="Save as models/sleep_model_candidate.pkl for shadow scoring instead of deploying")
+    parser.add_argument('--data', default=DATA_PATH,
+                        help="Training data, CSV or Parquet (default: the bundled CSV)")
+    parser.add_argument('--incremental', metavar='NEW_DATA',
+                        help="Add trees trained on NEW_DATA to the deployed forest instead of retraining")
+    parser.add_argument('--new-trees', type=int, default=20, help="Trees to add in --incremental mode")
+    parser.add_argument('--retire', type=int, default=0, help="Oldest trees to drop in --incremental mode")
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help="Allowed accuracy/macro-F1 drop before an incremental update is rejected")
+    args = parser.parse_args()
+    if args.incremental:
+        update(args.incremental, args.new_trees, args.retire, tolerance=args.tolerance,
+               candidate=args.candidate, reference_path=args.data)
+    else:
+        train(candidate=args.candidate, data_path=args.data)
@@ -0,0 +1,178 @@
+"""Rolling multi-night trend features, maintained incrementally per user."""
+import numpy as np
+from scipy.signal import lfilter
+
+# Nightly signals tracked per user: feature prefix -> input column
+TREND_SIGNALS = {
+    'Sleep': 'Sleep Duration',
+    'HR': 'Heart Rate',
+    'Steps': 'Daily Steps',
+}
+WINDOWS = (7, 30)
+
+# Sleep debt: hours below target accumulate, decaying by DEBT_DECAY per night
+TARGET_SLEEP_HOURS = 8.0
+DEBT_DECAY = 0.9
+
+
+def trend_feature_names(windows=WINDOWS):
+    """Returns the trend feature columns in a fixed order."""
+    names = []
+    for w in windows:
+        for prefix in TREND_SIGNALS:
+            names += [f'{prefix}_Mean_{w}', f'{prefix}_Var_{w}']
+        names += [f'HR_Slope_{w}', f'Sleep_Debt_{w}']
+    names.append('Sleep_Debt')
+    return names
+
+
+TREND_FEATURE_NAMES = trend_feature_names()
+
+
+class RollingWindow:
+    """Fixed-size window over one nightly signal with O(1) mean, variance and slope."""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = np.zeros(size)
+        self.nights = np.zeros(size)
+        self.count = 0
+        self.pos = 0
+        self._reset_sums()
+
+    def _reset_sums(self):
+        v = self.values[:self.count]
+        t = self.nights[:self.count]
+        self.sum = v.sum()
+        self.sum_sq = (v * v).sum()
+        self.sum_t = t.sum()
+        self.sum_tt = (t * t).sum()
+        self.sum_tv = (t * v).sum()
+
+    def push(self, night, value):
+        """Adds one night, evicting the oldest once the window is full."""
+        if self.count == self.size:
+            old_v, old_t = self.values[self.pos], self.nights[self.pos]
+            self.sum -= old_v
+            self.sum_sq -= old_v * old_v
+            self.sum_t -= old_t
+            self.sum_tt -= old_t * old_t
+            self.sum_tv -= old_t * old_v
+        else:
+            self.count += 1
+
+        self.values[self.pos] = value
+        self.nights[self.pos] = night
+        self.sum += value
+        self.sum_sq += value * value
+        self.sum_t += night
+        self.sum_tt += night * night
+        self.sum_tv += night * value
+        self.pos = (self.pos + 1) % self.size
+
+        # Re-sum once per full rotation so add/subtract rounding never builds up
+        if self.pos == 0 and self.count == self.size:
+            self._reset_sums()
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def var(self):
+        if not self.count:
+            return 0.0
+        m = self.sum / self.count
+        return max(0.0, self.sum_sq / self.count - m * m)
+
+    def slope(self):
+        """Least-squares slope of the signal per night across the window."""
+        n = self.count
+        denom = n * self.sum_tt - self.sum_t * self.sum_t
+        if n < 2 or denom <= 0:
+            return 0.0
+        return (n * self.sum_tv - self.sum_t * self.sum) / denom
+
+
+class TrendTracker:
+    """Incremental trend state for a single user, updated once per night."""
+
+    def __init__(self, windows=WINDOWS):
+        self.windows = tuple(windows)
+        self.nights = 0
+        self.sleep_debt = 0.0
+        self._signals = {
+            (prefix, w): RollingWindow(w)
+            for prefix in list(TREND_SIGNALS) + ['Deficit'] for w in self.windows
+        }
+
+    def update(self, sleep_duration, heart_rate, daily_steps):
+        """Folds one night into the rolling state and returns the new features."""
+        deficit = max(0.0, TARGET_SLEEP_HOURS - sleep_duration)
+        values = {'Sleep': sleep_duration, 'HR': heart_rate, 'Steps': daily_steps, 'Deficit': deficit}
+        for (prefix, _), window in self._signals.items():
+            window.push(self.nights, values[prefix])
+        self.sleep_debt = self.sleep_debt * DEBT_DECAY + deficit
+        self.nights += 1
+        return self.features()
+
+    def features(self):
+        features = {}
+        for w in self.windows:
+            for prefix in TREND_SIGNALS:
+                window = self._signals[(prefix, w)]
+                features[f'{prefix}_Mean_{w}'] = window.mean()
+                features[f'{prefix}_Var_{w}'] = window.var()
+            features[f'HR_Slope_{w}'] = self._signals[('HR', w)].slope()
+            features[f'Sleep_Debt_{w}'] = self._signals[('Deficit', w)].sum
+        features['Sleep_Debt'] = self.sleep_debt
+        return features
+
+
+class TrendFeatureStore:
+    """Holds one TrendTracker per user."""
+
+    def __init__(self, windows=WINDOWS):
+        self.windows = windows
+        self.trackers = {}
+
+    def update(self, user_id, sleep_duration, heart_rate, daily_steps):
+        tracker = self.trackers.get(user_id)
+        if tracker is None:
+            tracker = self.trackers[user_id] = TrendTracker(self.windows)
+        return tracker.update(sleep_duration, heart_rate, daily_steps)
+
+    def features(self, user_id):
+        tracker = self.trackers.get(user_id)
+        return tracker.features() if tracker is not None else None
+
+
+def add_trend_features(df, user_col, night_col, windows=WINDOWS):
+    """Adds the trend features to a nightly history table in one vectorized pass.
+
+    Produces the same values TrendTracker would after replaying each user's
+    nights in order, so models trained on these columns can be served from
+    the incremental store.
+    """
+    df = df.sort_values([user_col, night_col], kind='stable').copy()
+    groups = df.groupby(user_col, sort=False)
+    night = groups.cumcount().astype(float)
+    deficit = (TARGET_SLEEP_HOURS - df['Sleep Duration']).clip(lower=0)
+
+    def rolling(series, w):
+        return series.groupby(df[user_col], sort=False).rolling(w, min_periods=1)
+
+    for w in windows:
+        for prefix, col in TREND_SIGNALS.items():
+            values = df[col].astype(float)
+            df[f'{prefix}_Mean_{w}'] = rolling(values, w).mean().droplevel(0)
+            df[f'{prefix}_Var_{w}'] = rolling(values, w).var(ddof=0).droplevel(0).fillna(0.0)
+
+        hr = df['Heart Rate'].astype(float)
+        cov = rolling(night * hr, w).mean().droplevel(0) - rolling(night, w).mean().droplevel(0) * rolling(hr, w).mean().droplevel(0)
+        var_t = rolling(night, w).var(ddof=0).droplevel(0)
+        df[f'HR_Slope_{w}'] = (cov / var_t).where(var_t > 0, 0.0)
+        df[f'Sleep_Debt_{w}'] = rolling(deficit, w).sum().droplevel(0)
+
+    df['Sleep_Debt'] = deficit.groupby(df[user_col], sort=False).transform(
+        lambda d: lfilter([1.0], [1.0, -DEBT_DECAY], d.to_numpy())
+    )
+    return df
@@ -0,0 +1,405 @@
+"""Offline watch-sync simulator and replay harness for load-testing ingestion.
+
+N virtual watches (Samsung, Apple, Fitbit, Garmin) stream per-minute samples
+(heart rate, steps, sleep stage) at `speedup` times real time to a local
+ingestion service, over a localhost TCP socket or a file-drop directory.
+Each day a watch completes is summarized into the model's inputs (sleep
+duration and quality from the night's hypnogram, resting heart rate, daily
+steps) and scored in micro-batches. The harness reports the lag from the
+emission of a day's last sample to its updated prediction:
+
+    python3 src/watch_sim.py --devices 1000,5000,10000 --speedup 2880
+    python3 src/watch_sim.py --transport files --replay recordings.csv
+
+Days are synthetic (a hypnogram from hypnogram.synthetic_night followed by
+daytime activity) or replayed from a recorded CSV with columns Recording,
+Minute (0-1439, from bedtime), Heart Rate, Steps and Stage (0-4 in bed, -1
+otherwise). Watches come online staggered over the first day, so days
+complete at a steady rate. Demographics come from the bundled CSV. The
+emitter runs in its own process, so it does not compete with ingestion for
+the interpreter. Nothing leaves the machine.
+"""
+import os
+import time
+import queue
+import socket
+import struct
+import argparse
+import threading
+import multiprocessing
+import numpy as np
+import pandas as pd
+from hypnogram import synthetic_night, night_metrics, objective_inputs, SLEEP_METRIC_FEATURES
+from train_model import BASE_DIR, DATA_PATH
+from model_router import ModelRouter
+from sleep_core import MODELS_DIR, encode_batch, split_blood_pressure, load_artifacts, predict_codes
+
+DROP_DIR = os.path.join(BASE_DIR, 'data', 'watch_drop')
+DAY_MINUTES = 1440
+DEVICES = ('Samsung Galaxy Watch', 'Apple Watch', 'Fitbit', 'Garmin')
+SAMPLE_DTYPE = np.dtype([('device', '<u4'), ('minute', '<u4'), ('emitted', '<f8'),
+                         ('heart_rate', 'u1'), ('steps', '<u2'), ('stage', 'i1')])
+STREAM_FIELDS = ('heart_rate', 'steps', 'stage')
+# Heart rate offset from resting by sleep stage (W, N1, N2, N3, REM)
+STAGE_HR = np.array([6, 1, 0, -4, 3])
+
+
+# --- Streams ---
+def synthetic_day(rng):
+    """One simulated day of per-minute samples, starting at bedtime."""
+    night = synthetic_night(rng, n_epochs=int(rng.integers(840, 1080)))[::2]
+    stage = np.full(DAY_MINUTES, -1, dtype=np.int8)
+    stage[:len(night)] = night
+    awake = stage < 0
+
+    target = rng.integers(3000, 12000)
+    active = awake & (rng.random(DAY_MINUTES) < 0.25)
+    steps = np.where(active, rng.poisson(target / max(active.sum(), 1), DAY_MINUTES), 0)
+
+    resting = rng.integers(58, 80)
+    hr = np.where(awake, resting + 8 + np.minimum(steps // 8, 40), resting + STAGE_HR[np.maximum(stage, 0)])
+    hr = hr + rng.normal(0, 2, DAY_MINUTES)
+    return {'heart_rate': np.clip(np.rint(hr), 30, 220).astype(np.uint8),
+            'steps': steps.astype(np.uint16), 'stage': stage}
+
+
+def synthetic_pool(n_days, seed=42):
+    """n_days synthetic days as (n_days, DAY_MINUTES) arrays per stream field."""
+    rng = np.random.default_rng(seed)
+    days = [synthetic_day(rng) for _ in range(n_days)]
+    return {k: np.stack([d[k] for d in days]) for k in STREAM_FIELDS}
+
+
+def load_recordings(path):
+    """Recorded days from a per-minute CSV, in the same layout as synthetic_pool."""
+    raw = pd.read_csv(path)
+    recordings = raw['Recording'].unique()
+    index = pd.MultiIndex.from_product([recordings, range(DAY_MINUTES)], names=['Recording', 'Minute'])
+    full = raw.set_index(['Recording', 'Minute']).reindex(index)
+    # Gaps: carry heart rate forward, no steps, not in bed
+    hr = full['Heart Rate'].groupby(level=0).ffill().groupby(level=0).bfill().fillna(0)
+    shape = (len(recordings), DAY_MINUTES)
+    return {
+        'heart_rate': hr.to_numpy().reshape(shape).astype(np.uint8),
+        'steps': full['Steps'].fillna(0).to_numpy().reshape(shape).astype(np.uint16),
+        'stage': full['Stage'].fillna(-1).to_numpy().reshape(shape).astype(np.int8),
+    }
+
+
+def summarize_days(heart_rate, steps, stage):
+    """Model inputs for whole days ((n, DAY_MINUTES) arrays): one row per day.
+
+    Sleep Duration and Quality of Sleep come from the night's hypnogram
+    (see hypnogram.objective_inputs), Heart Rate is the mean while in bed
+    and Daily Steps the day's total. The night's architecture metrics are
+    included for models trained with them.
+    """
+    metrics = night_metrics(np.repeat(stage, 2, axis=1))  # 1-minute samples -> 30 s epochs
+    in_bed = stage >= 0
+    resting = (heart_rate * in_bed).sum(axis=1) / np.maximum(in_bed.sum(axis=1), 1)
+    summary = objective_inputs(metrics)
+    summary['Heart Rate'] = np.rint(resting).astype(int)
+    summary['Daily Steps'] = steps.sum(axis=1, dtype=np.int64)
+    return pd.concat([summary, metrics[SLEEP_METRIC_FEATURES]], axis=1)
+
+
+def load_profiles(n_devices, data_path=DATA_PATH, seed=42):
+    """Patient demographics for each virtual watch, sampled from the dataset, plus its Device family."""
+    patients = split_blood_pressure(pd.read_csv(data_path))
+    rows = np.random.default_rng(seed).integers(0, len(patients), n_devices)
+    profiles = patients.iloc[rows].reset_index(drop=True)
+    profiles['Device'] = np.asarray(DEVICES)[np.arange(n_devices) % len(DEVICES)]
+    return profiles
+
+
+# --- Transports ---
+class SocketTransport:
+    """Sample batches as length-prefixed frames over one localhost TCP connection."""
+
+    def __init__(self, host='127.0.0.1'):
+        self._server = socket.create_server((host, 0))
+        self.address = self._server.getsockname()
+        self._conn = None
+        self._thread = None
+
+    # Ingestion side
+    def start(self, ingest):
+        self._thread = threading.Thread(target=self._receive, args=(ingest,), daemon=True)
+        self._thread.start()
+
+    def _receive(self, ingest):
+        conn, _ = self._server.accept()
+        with conn, conn.makefile('rb') as stream:
+            while True:
+                header = stream.read(4)
+                size = struct.unpack('<I', header)[0] if len(header) == 4 else 0
+                if not size:
+                    break
+                ingest(np.frombuffer(stream.read(size), dtype=SAMPLE_DTYPE))
+        self._server.close()
+
+    def join(self):
+        self._thread.join()
+
+    # Emitter side
+    def open(self):
+        self._server.close()  # The emitter's copy of the listening socket
+        self._conn = socket.create_connection(self.address)
+
+    def send(self, batch):
+        self._conn.sendall(struct.pack('<I', batch.nbytes) + batch.tobytes())
+
+    def close(self):
+        self._conn.sendall(struct.pack('<I', 0))
+        self._conn.close()
+
+
+class FileDropTransport:
+    """Sample batches written as numbered files into a drop directory and polled."""
+
+    END = 'end'
+
+    def __init__(self, drop_dir, poll_seconds=0.005):
+        self.drop_dir = drop_dir
+        self.poll_seconds = poll_seconds
+        self._seq = 0
+        self._thread = None
+        os.makedirs(drop_dir, exist_ok=True)
+        for name in os.listdir(drop_dir):  # Leftovers from an interrupted run
+            if name.endswith(('.bin', '.tmp')) or name == self.END:
+                os.remove(os.path.join(drop_dir, name))
+
+    def start(self, ingest):
+        self._thread = threading.Thread(target=self._receive, args=(ingest,), daemon=True)
+        self._thread.start()
+
+    def _receive(self, ingest):
+        while True:
+            names = sorted(os.listdir(self.drop_dir))
+            batches = [n for n in names if n.endswith('.bin')]
+            for name in batches:
+                path = os.path.join(self.drop_dir, name)
+                ingest(np.fromfile(path, dtype=SAMPLE_DTYPE))
+                os.remove(path)
+            if not batches:
+                if self.END in names:
+                    os.remove(os.path.join(self.drop_dir, self.END))
+                    return
+                time.sleep(self.poll_seconds)
+
+    def join(self):
+        self._thread.join()
+
+    def open(self):
+        pass
+
+    def send(self, batch):
+        path = os.path.join(self.drop_dir, f'{self._seq:012d}.bin')
+        batch.tofile(path + '.tmp')
+        os.replace(path + '.tmp', path)  # The reader never sees a partial batch
+        self._seq += 1
+
+    def close(self):
+        open(os.path.join(self.drop_dir, self.END), 'w').close()
+
+
+# --- Emitter ---
+def emit(transport, pool, n_devices, days, speedup, seed, lateness):
+    """Replays pool days for n_devices watches, one batch per simulated minute.
+
+    Watch d comes online at a random minute of the first day and then sends
+    `days` full days; each day replays a different pool entry. The worst
+    delay behind schedule (seconds) is written to `lateness`.
+    """
+    transport.open()
+    offsets = np.random.default_rng(seed).integers(0, DAY_MINUTES, n_devices)
+    devices = np.arange(n_devices)
+    total = days * DAY_MINUTES
+    tick = 60.0 / speedup
+    start = time.time()
+    for t in range(total + DAY_MINUTES):
+        i = t - offsets
+        live = (i >= 0) & (i < total)
+        dev, i = devices[live], i[live]
+        minute = i % DAY_MINUTES
+        day = (dev * 7919 + i // DAY_MINUTES) % len(pool['stage'])
+        batch = np.empty(len(dev), dtype=SAMPLE_DTYPE)
+        batch['device'], batch['minute'] = dev, minute
+        for k in STREAM_FIELDS:
+            batch[k] = pool[k][day, minute]
+        batch['emitted'] = time.time()
+        if len(batch):
+            transport.send(batch)
+        wait = start + (t + 1) * tick - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        else:
+            lateness.value = max(lateness.value, -wait)
+    transport.close()
+
+
+# --- Ingestion and scoring ---
+class Scorer:
+    """Scores completed days on a background thread in micro-batches of up to max_batch.
+
+    route(device family) returns that family's (model, label encoder,
+    occupation encoder), e.g. from a ModelRouter.
+    """
+
+    def __init__(self, route, profiles, max_batch=1024):
+        self.route = route
+        self.profiles = profiles
+        self.max_batch = max_batch
+        self.latest = np.full(len(profiles), None, dtype=object)  # Latest prediction per watch
+        self.lags = []
+        self.max_queued = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, devices, summary, emitted):
+        self._queue.put((devices, summary, emitted))
+        self.max_queued = max(self.max_queued, self._queue.qsize())
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            work, rows, stop = [item], len(item[0]), False
+            while rows < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                work.append(item)
+                rows += len(item[0])
+            devices, summaries, emitted = zip(*work)
+            self._score(np.concatenate(devices), pd.concat(summaries, ignore_index=True), np.concatenate(emitted))
+            if stop:
+                return
+
+    def _score(self, devices, summary, emitted):
+        raw = self.profiles.iloc[devices].reset_index(drop=True)
+        raw = raw.assign(**{col: summary[col].to_numpy() for col in
+                            ('Sleep Duration', 'Quality of Sleep', 'Heart Rate', 'Daily Steps')})
+        for family, rows in raw.groupby('Device').indices.items():
+            model, le, occupation_encoder = self.route(family)
+            X = encode_batch(raw.iloc[rows], occupation_encoder)
+            for col in model.feature_names_in_:
+                if col not in X:  # Hypnogram features, for models trained with them
+                    X[col] = summary[col].to_numpy()[rows] if col in summary else np.nan
+            codes, _ = predict_codes(model, X[list(model.feature_names_in_)])
+            self.latest[devices[rows]] = le.inverse_transform(codes)
+        self.lags.extend(time.time() - emitted)
+
+    def join(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class Ingestor:
+    """Folds per-minute samples into per-watch day buffers; hands each completed day to the scorer."""
+
+    def __init__(self, n_devices, scorer):
+        self.scorer = scorer
+        self.buffers = {
+            'heart_rate': np.zeros((n_devices, DAY_MINUTES), dtype=np.uint8),
+            'steps': np.zeros((n_devices, DAY_MINUTES), dtype=np.uint16),
+            'stage': np.full((n_devices, DAY_MINUTES), -1, dtype=np.int8),
+        }
+        self.samples = 0
+        self.days = 0
+
+    def ingest(self, batch):
+        devices, minute = batch['device'], batch['minute']
+        for k in STREAM_FIELDS:
+            self.buffers[k][devices, minute] = batch[k]
+        self.samples += len(batch)
+        last = minute == DAY_MINUTES - 1
+        if last.any():
+            done = devices[last]
+            summary = summarize_days(*(self.buffers[k][done] for k in STREAM_FIELDS))
+            self.days += len(done)
+            self.scorer.submit(done, summary, batch['emitted'][last])
+
+
+def run(n_devices, pool, route, days=1, speedup=2880, transport='socket',
+        drop_dir=DROP_DIR, max_batch=1024, seed=42, slo_ms=1000, data_path=DATA_PATH):
+    """Runs one load test and returns its throughput and lag statistics.
+
+    The service kept up if 95% of predictions landed within slo_ms of their
+    day's last sample and the emitter never fell more than slo_ms behind
+    schedule (a full socket or a slow reader holds it back).
+    """
+    profiles = load_profiles(n_devices, data_path, seed)
+    channel = SocketTransport() if transport == 'socket' else FileDropTransport(drop_dir)
+    context = multiprocessing.get_context('fork')
+    lateness = context.Value('d', 0.0)
+    emitter = context.Process(target=emit, args=(channel, pool, n_devices, days, speedup, seed, lateness))
+
+    start = time.time()
+    emitter.start()  # Before any threads exist in this process
+    scorer = Scorer(route, profiles, max_batch)
+    ingestor = Ingestor(n_devices, scorer)
+    channel.start(ingestor.ingest)
+    emitter.join()
+    channel.join()
+    scorer.join()
+    elapsed = time.time() - start
+
+    lags = np.array(scorer.lags) * 1000
+    behind_ms = lateness.value * 1000
+    return {
+        'devices': n_devices,
+        'transport': transport,
+        'samples': ingestor.samples,
+        'samples_per_sec': ingestor.samples / elapsed,
+        'predictions': len(lags),
+        'lag_ms_p50': float(np.percentile(lags, 50)) if len(lags) else None,
+        'lag_ms_p95': float(np.percentile(lags, 95)) if len(lags) else None,
+        'lag_ms_p99': float(np.percentile(lags, 99)) if len(lags) else None,
+        'lag_ms_max': float(lags.max()) if len(lags) else None,
+        'max_queued': scorer.max_queued,
+        'emitter_behind_ms': behind_ms,
+        'kept_up': len(lags) > 0 and np.percentile(lags, 95) <= slo_ms and behind_ms <= slo_ms,
+        'seconds': elapsed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay per-minute watch streams through ingestion and scoring.")
+    parser.add_argument('--devices', default='1000', help="Virtual watches; a comma list runs one test per count")
+    parser.add_argument('--days', type=int, default=1, help="Full days each watch sends")
+    parser.add_argument('--speedup', type=float, default=2880, help="Simulated minutes per real minute")
+    parser.add_argument('--transport', choices=['socket', 'files'], default='socket')
+    parser.add_argument('--drop-dir', default=DROP_DIR, help="Directory for --transport files")
+    parser.add_argument('--replay', help="Recorded per-minute CSV to replay instead of synthetic days")
+    parser.add_argument('--pool', type=int, default=64, help="Distinct synthetic days to cycle through")
+    parser.add_argument('--max-batch', type=int, default=1024, help="Largest scoring micro-batch")
+    parser.add_argument('--slo-ms', type=float, default=1000, help="Prediction lag (p95) the service must meet")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    registry_path = os.path.join(MODELS_DIR, 'tenants.json')
+    if os.path.exists(registry_path):  # Per-device models, as the dashboard serves them
+        router = ModelRouter.from_file(registry_path)
+        route = lambda family: router.route(device=family)
+    else:
+        artifacts = load_artifacts()
+        if artifacts[0] is None:
+            raise SystemExit("No trained model found; run src/train_model.py first")
+        route = lambda family: artifacts
+    pool = load_recordings(args.replay) if args.replay else synthetic_pool(args.pool, args.seed)
+    print(f"Replaying {len(pool['stage'])} {'recorded' if args.replay else 'synthetic'} days "
+          f"at {args.speedup:g}x over {args.transport} ({60 / args.speedup * 1000:.1f} ms per simulated minute)")
+    for n in (int(x) for x in args.devices.split(',')):
+        stats = run(n, pool, route, args.days, args.speedup, args.transport,
+                    args.drop_dir, args.max_batch, args.seed, args.slo_ms)
+        print(f"{n:>7} watches | {stats['samples_per_sec']:>9.0f} samples/s | {stats['predictions']:>6} predictions | "
+              f"lag p50 {stats['lag_ms_p50'] or 0:.1f} / p95 {stats['lag_ms_p95'] or 0:.1f} / "
+              f"max {stats['lag_ms_max'] or 0:.1f} ms | emitter behind {stats['emitter_behind_ms']:.0f} ms | "
+              f"{'kept up' if stats['kept_up'] else 'FELL BEHIND'}")
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from binned_forest import BinnedForest
+
+
+@pytest.fixture(scope='module')
+def forest():
+    """A small forest on integer-valued features, trained with missing values."""
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 20, size=(400, 4)).astype(float)
+    y = (X[:, 0] + X[:, 1] > 20).astype(int) + (X[:, 2] > 15)
+    X[rng.random(X.shape) < 0.1] = np.nan
+    return RandomForestClassifier(n_estimators=15, random_state=0).fit(X, y)
+
+
+def eval_rows(forest):
+    """Rows with missing values and rows sitting exactly on split thresholds."""
+    rng = np.random.default_rng(1)
+    X = rng.integers(0, 20, size=(300, 4)).astype(float)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    X[0] = np.nan
+    on_threshold = []
+    for t in (est.tree_ for est in forest.estimators_):
+        # An infinite threshold splits missing from present values
+        for node in np.flatnonzero((t.children_left != -1) & np.isfinite(t.threshold)):
+            row = rng.integers(0, 20, size=4).astype(float)
+            row[t.feature[node]] = t.threshold[node]
+            on_threshold.append(row)
+    return np.vstack([X, on_threshold])
+
+
+def test_predict_proba_matches_sklearn(forest):
+    X = eval_rows(forest)
+    binned = BinnedForest.from_sklearn(forest)
+    assert np.isnan(X).any()
+    assert max(est.tree_.n_leaves for est in forest.estimators_) > 64  # Multi-word leaf masks
+    assert np.array_equal(binned.predict_proba(X), forest.predict_proba(X))
+
+
+def test_single_rows_and_saved_tables(forest, tmp_path):
+    X = eval_rows(forest)[:50]
+    path = tmp_path / 'binned.npz'
+    BinnedForest.from_sklearn(forest).save(path)
+    binned = BinnedForest.load(path)
+    for i in range(len(X)):
+        assert np.array_equal(binned.predict_proba(X[i:i + 1]), forest.predict_proba(X[i:i + 1]))
@@ -0,0 +1,132 @@
+import os
+import json
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+from model_bundle import (KEY_ENV, BundleError, write_bundle, load_bundle, verify_bundle, activate, rollback,
+                          prune, read_registry, current_version)
+
+UNPICKLED = []
+
+
+def _record():
+    UNPICKLED.append(True)
+    return 'tampered'
+
+
+class Payload:
+    """Pickles to a call of _record, so unpickling it is observable."""
+
+    def __reduce__(self):
+        return _record, ()
+
+
+@pytest.fixture(autouse=True)
+def no_key(monkeypatch):
+    monkeypatch.delenv(KEY_ENV, raising=False)
+    UNPICKLED.clear()
+
+
+def model(seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(60, 3)), columns=['a', 'b', 'c'])
+    y = rng.integers(0, 3, size=60)
+    le = LabelEncoder().fit(['Healthy', 'Insomnia', 'Sleep Apnea'])
+    return RandomForestClassifier(n_estimators=2, random_state=seed).fit(X, y), le
+
+
+def bundle(tmp_path, seed=0, **kwargs):
+    rf, le = model(seed)
+    return write_bundle(rf, le, feature_profile={'seed': seed}, bundles_dir=str(tmp_path), **kwargs)
+
+
+def test_round_trip(tmp_path):
+    version = bundle(tmp_path)
+    loaded = load_bundle(version, str(tmp_path))
+    assert loaded.version == version
+    assert list(loaded.model.feature_names_in_) == ['a', 'b', 'c']
+    assert loaded.feature_profile == {'seed': 0}
+    assert loaded.occupation_encoder is None
+
+
+def test_flipped_byte_is_rejected(tmp_path):
+    version = bundle(tmp_path)
+    path = os.path.join(tmp_path, version, 'model.pkl')
+    data = bytearray(open(path, 'rb').read())
+    data[len(data) // 2] ^= 0xFF
+    open(path, 'wb').write(data)
+    with pytest.raises(BundleError, match='Checksum mismatch'):
+        verify_bundle(version, str(tmp_path))
+    with pytest.raises(BundleError, match='Checksum mismatch'):
+        load_bundle(version, str(tmp_path))
+
+
+def test_replaced_file_is_rejected_before_unpickling(tmp_path):
+    version = bundle(tmp_path)
+    # The profile is loaded before the model would be, so a late check would run this payload
+    with open(os.path.join(tmp_path, version, 'feature_profile.pkl'), 'wb') as f:
+        pickle.dump(Payload(), f)
+    with pytest.raises(BundleError):
+        load_bundle(version, str(tmp_path))
+    with pytest.raises(BundleError):
+        load_bundle(version, str(tmp_path), only=('feature_profile',))
+    assert not UNPICKLED
+
+
+def test_signature_checked_when_key_is_set(tmp_path, monkeypatch):
+    signed = bundle(tmp_path, seed=0, key='right key')
+    unsigned = bundle(tmp_path, seed=1)
+    monkeypatch.setenv(KEY_ENV, 'right key')
+    assert load_bundle(signed, str(tmp_path)).version == signed
+    with pytest.raises(BundleError, match='signature'):
+        load_bundle(unsigned, str(tmp_path))
+    monkeypatch.setenv(KEY_ENV, 'wrong key')
+    with pytest.raises(BundleError, match='signature'):
+        load_bundle(signed, str(tmp_path))
+    with pytest.raises(BundleError, match='signature'):
+        activate(signed, str(tmp_path))
+
+
+def test_edited_manifest_fails_signature(tmp_path, monkeypatch):
+    version = bundle(tmp_path, key='right key')
+    path = os.path.join(tmp_path, version, 'manifest.json')
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest['n_estimators'] += 1
+    with open(path, 'w') as f:
+        json.dump(manifest, f)
+    monkeypatch.setenv(KEY_ENV, 'right key')
+    with pytest.raises(BundleError, match='signature'):
+        load_bundle(version, str(tmp_path))
+
+
+def test_activate_rollback_prune(tmp_path):
+    d = str(tmp_path)
+    versions = [bundle(tmp_path, seed) for seed in range(4)]
+    staged = bundle(tmp_path, seed=9)  # Written but never activated
+    assert current_version(d) is None
+    with pytest.raises(BundleError):
+        rollback(d)
+
+    for version in versions[:3]:
+        activate(version, d, keep=2)
+    # The oldest activated bundle is pruned; the staged one is left alone
+    assert read_registry(d) == {'current': versions[2], 'history': versions[1:3]}
+    assert not os.path.exists(os.path.join(d, versions[0]))
+    assert os.path.isdir(os.path.join(d, staged))
+
+    assert rollback(d) == versions[1]
+    assert load_bundle(bundles_dir=d).version == versions[1]
+    assert read_registry(d) == {'current': versions[1], 'history': versions[1:2]}
+    with pytest.raises(BundleError):
+        rollback(d)
+
+    activate(versions[3], d, keep=2)
+    activate(versions[1], d, keep=2)  # Re-activating moves it to the end of the history
+    assert read_registry(d) == {'current': versions[1], 'history': [versions[3], versions[1]]}
+    assert prune(d, keep=1) == [versions[3]]
+    # Rolled-back-from bundles leave the history but stay on disk
+    assert sorted(n for n in os.listdir(d) if n != 'registry.json') == sorted([versions[1], versions[2], staged])